@@ -5,6 +5,7 @@ from karakter import models
 from karakter.hashers import hash_device_id
 from fakts import models as fakts_models
 from fakts import logic, builders, base_models, enums
+from fakts.services import challenges
 import kante
 
 
@@ -117,6 +118,7 @@ def accept_composition_device_code(info: Info, input: AcceptCompositionDeviceCod
             config=config,
             manifest=client_manifest,
             composition=composition,
+            logo=builders.fetch_logo(client_manifest),
         )
         
         
@@ -127,6 +129,7 @@ def accept_composition_device_code(info: Info, input: AcceptCompositionDeviceCod
         
     device_code.composition = composition
     device_code.save()
+    challenges.notify_challenge("composition", device_code.pk)
 
     return composition
 
@@ -140,16 +143,13 @@ class DeclineCompositionDeviceCodeInput:
 
 def decline_composition_device_code(info: Info, input: DeclineCompositionDeviceCodeInput) -> types.ManagementCompositionDeviceCode:
     """
-    Decline an invite to join an organization.
+    Decline a pending composition device code.
 
-    Marks the invite as declined.
+    Marks the device code as denied and wakes the app waiting on its challenge.
     """
-    try:
-        invite = fakts_models.CompositionDeviceCode.objects.get(token=input.device_code)
-    except fakts_models.CompositionDeviceCode.DoesNotExist:
-        raise Exception("Invalid invite token")
-
-    invite.declined = True
-    invite.save()
+    device_code = fakts_models.CompositionDeviceCode.objects.get(id=input.device_code)
+    device_code.denied = True
+    device_code.save()
+    challenges.notify_challenge("composition", device_code.pk)
 
-    return invite
+    return device_code
@@ -1,9 +1,9 @@
 from kante import Info
 import strawberry
 from api.management import types
-from karakter import models
 from fakts import models as fakts_models
 from fakts import logic
+from fakts.services import challenges
 import kante
 
 
@@ -50,20 +50,13 @@ class DeclineDeviceCodeInput:
 
 def decline_device_code(info: Info, input: DeclineDeviceCodeInput) -> types.ManagementDeviceCode:
     """
-    Decline an invite to join an organization.
+    Decline a pending device code.
 
-    Marks the invite as declined.
+    Marks the device code as denied and wakes the app waiting on its challenge.
     """
-    try:
-        invite = models.Invite.objects.get(token=input.token)
-    except models.Invite.DoesNotExist:
-        raise Exception("Invalid invite token")
-
-    # Check if invite is still pending
-    if invite.status != models.Invite.Status.PENDING:
-        raise Exception(f"This invite has already been {invite.status}")
-
-    user = info.context.request.user
-    invite.decline(user)
+    device_code = fakts_models.DeviceCode.objects.get(id=input.device_code)
+    device_code.denied = True
+    device_code.save()
+    challenges.notify_challenge("client", device_code.pk)
 
-    return invite
+    return device_code
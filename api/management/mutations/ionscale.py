@@ -4,6 +4,7 @@ from api.management import types, enums
 import kante
 from fakts import models as fakts_models
 from ionscale.repo import get_ionscale_repo
+from ionscale.inventory import get_machine_inventory
 from ionscale import base_models as ionscale_models
 from ionscale.manager import sync
 from karakter import models as karakter_models
@@ -116,6 +117,8 @@ def create_ionscale_auth_key(info: Info, input: CreateIonscaleAuthKeyInput) -> t
         pre_authorized=True,
         tags=input.tags
     )
+    # a machine is about to join with this key
+    get_machine_inventory().invalidate(layer.tailnet_name)
 
     key = fakts_models.IonscaleAuthKey.objects.create(
         layer=layer,
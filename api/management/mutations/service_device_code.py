@@ -5,6 +5,7 @@ from karakter import models
 from karakter.hashers import hash_device_id
 from fakts import models as fakts_models
 from fakts import logic
+from fakts.services import challenges
 import kante
 
 
@@ -96,6 +97,7 @@ def accept_service_device_code(info: Info, input: AcceptServiceDeviceCodeInput)
 
     device_code.instance = instance
     device_code.save()
+    challenges.notify_challenge("service", device_code.pk)
 
     return instance
 
@@ -109,20 +111,13 @@ class DeclineServiceDeviceCodeInput:
 
 def decline_service_device_code(info: Info, input: DeclineServiceDeviceCodeInput) -> types.ManagementServiceDeviceCode:
     """
-    Decline an invite to join an organization.
+    Decline a pending service device code.
 
-    Marks the invite as declined.
+    Marks the device code as denied and wakes the service waiting on its challenge.
     """
-    try:
-        invite = models.Invite.objects.get(token=input.token)
-    except models.Invite.DoesNotExist:
-        raise Exception("Invalid invite token")
-
-    # Check if invite is still pending
-    if invite.status != models.Invite.Status.PENDING:
-        raise Exception(f"This invite has already been {invite.status}")
-
-    user = info.context.request.user
-    invite.decline(user)
+    device_code = fakts_models.ServiceDeviceCode.objects.get(id=input.device_code)
+    device_code.denied = True
+    device_code.save()
+    challenges.notify_challenge("service", device_code.pk)
 
-    return invite
+    return device_code
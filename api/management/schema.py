@@ -1,4 +1,4 @@
-from fakts.logic import find_instance_for_requirement_and_composition
+from fakts.logic import find_instances_for_requirements
 import strawberry
 import strawberry_django
 from kante.types import Info
@@ -112,35 +112,28 @@ class Query:
         if not manifest.requirements:
             return types.ValidationResult(valid=True, mappings=[], reason="Manifest has no requirements")
 
+        resolved = find_instances_for_requirements(manifest.requirements, user, composition=composition_obj)
+
         for req in manifest.requirements:
-            try:
-                instance = find_instance_for_requirement_and_composition(req, user, composition=composition_obj)
-                if instance:
-                    mappings.append(
-                        types.PotentialMapping(
-                            service_instance=instance,
-                            key=req.key,
-                            reason=None,
-                        )
-                    )
-                else:
-                    mappings.append(
-                        types.PotentialMapping(
-                            service_instance=None,
-                            key=req.key,
-                            reason=f"No suitable instance found for service {req.service}.",
-                        )
+            instance = resolved[req.key]
+            if instance:
+                mappings.append(
+                    types.PotentialMapping(
+                        service_instance=instance,
+                        key=req.key,
+                        reason=None,
                     )
-                    if not req.optional:
-                        errors.append(f"No suitable instance found for service {req.service}.")
-            except Exception as e:
+                )
+            else:
                 mappings.append(
                     types.PotentialMapping(
                         service_instance=None,
                         key=req.key,
-                        reason=str(e),
+                        reason=f"No suitable instance found for service {req.service}.",
                     )
                 )
+                if not req.optional:
+                    errors.append(f"No suitable instance found for service {req.service}.")
 
         return types.ValidationResult(
             valid=len(errors) == 0,
@@ -177,8 +170,8 @@ class Query:
 
     @kante.django_field()
     def machine(self, info: Info, id: strawberry.ID) -> types.ManagementMachine:
-        from ionscale.repo import get_ionscale_repo
-        machine = get_ionscale_repo().get_machine(str(id))
+        from ionscale.inventory import get_machine_inventory
+        machine = get_machine_inventory().machine(str(id))
 
         if machine.tailnet:
             try:
@@ -1,6 +1,6 @@
 import datetime
 from typing import List, Optional, cast
-from karakter.datalayer import get_current_datalayer
+from karakter import presign
 import strawberry
 import strawberry_django
 from kante.types import Info
@@ -16,7 +16,7 @@ from karakter import filters as karakter_filters
 from strawberry.experimental import pydantic
 from authapp.models import OAuth2Client
 from ionscale.base_models import Machine
-from ionscale.repo import get_ionscale_repo
+from ionscale.inventory import get_machine_inventory
 
 
 def build_prescoper(field="organization"):
@@ -53,9 +53,10 @@ class ManagementMediaStore:
     key: str
 
     @strawberry_django.field()
-    def presigned_url(self, info: Info, host: str | None = None) -> str:
-        datalayer = get_current_datalayer()
-        return cast(models.MediaStore, self).get_presigned_url(info, datalayer=datalayer, host=host)
+    async def presigned_url(self, info: Info, host: str | None = None) -> str:
+        # signed together with every other MediaStore of the response
+        store = cast(models.MediaStore, self)
+        return await presign.aload(store.bucket, store.key, host)
 
 
 @strawberry_django.type(
@@ -784,7 +785,7 @@ class ManagementLayer:
     @strawberry.field(description="The machines associated with this layer (only works for IonscaleLayers)")
     def machines(self, info: Info) -> List[ManagementMachine]:
         if hasattr(self, "tailnet_name"):
-             machines = get_ionscale_repo().list_machines(self.tailnet_name)
+             machines = get_machine_inventory().machines(self.tailnet_name)
              return [ManagementMachine(instance=m, tailnet=self.tailnet_name, layer_id=self.id) for m in machines]
         return []
 
@@ -792,7 +793,7 @@ class ManagementLayer:
     def machine(self, info: Info, id: str) -> Optional[ManagementMachine]:
         if hasattr(self, "tailnet_name"):
              try:
-                machine = get_ionscale_repo().get_machine(str(id))
+                machine = get_machine_inventory().machine(str(id))
                 return ManagementMachine(instance=machine, tailnet=self.tailnet_name, layer_id=self.id)
              except Exception:
                  return None
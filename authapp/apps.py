@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuthAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "authapp"
+
+    def ready(self):
+        # Register the auth-context cache invalidation receivers.
+        from authapp import signals  # noqa: F401
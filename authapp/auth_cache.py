@@ -0,0 +1,277 @@
+"""Caches for authenticating GraphQL operations.
+
+Every GraphQL operation verifies its bearer JWT and expands it into
+``(user, client, organization, membership)``. A long-lived client sends the
+same token over and over, so both steps are cached per token until its
+``exp``:
+
+* verified claims live in a per-process LRU only (verification is CPU work,
+  and the lookup happens synchronously inside authentikate);
+* the expanded context lives in a per-process LRU and, with
+  ``AUTHAPP_AUTH_CONTEXT_SHARED_CACHE``, in the Django cache as well, so other
+  workers skip the expansion too.
+
+Entries are keyed by the SHA-256 of the raw token rather than its ``jti``, so a
+hit always means the exact same (already verified) bytes. Each context entry
+records the *generation* of the user, client, organization and membership it
+was built from. The signals in :mod:`authapp.signals` bump those generations
+(in the Django cache, after commit), which makes every process treat dependent
+entries as stale. A generation that is missing from the cache (never set,
+evicted or culled) is created afresh, so it never matches a recorded one.
+
+That only works when the Django cache is shared by every process:
+``AUTHAPP_SHARED_GENERATIONS`` is on with the ``redis`` cache backend, and
+without it expanded contexts are not cached at all (a bump in one process
+would never reach the others). Verified tokens depend on no database state
+and are always cached.
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Callable, Hashable, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from authentikate.base_models import StaticToken
+
+
+class ExpiringLRU:
+    """A small thread-safe LRU whose entries also expire at an absolute time.
+
+    ``maxsize`` is a callable so the bound follows the (overridable) settings.
+    """
+
+    def __init__(self, maxsize: Callable[[], int]):
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float) -> None:
+        maxsize = self.maxsize()
+        if maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> None:
+        with self._lock:
+            for key in [key for key, (_, value) in self._data.items() if predicate(value)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def token_hash(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _maxsize() -> int:
+    return getattr(settings, "AUTHAPP_AUTH_CONTEXT_CACHE_SIZE", 0)
+
+
+def cache_size() -> int:
+    """Entries per process in the auth caches (``AUTHAPP_AUTH_CONTEXT_CACHE_SIZE``)."""
+    return _maxsize()
+
+
+verified_tokens = ExpiringLRU(_maxsize)
+contexts = ExpiringLRU(_maxsize)
+
+# per-process LRUs whose entries depend on generations, with how to get an entry's keys
+_dependents: list[tuple[ExpiringLRU, Callable[[Any], list[str]]]] = [(contexts, lambda entry: entry[1])]
+
+
+def register_dependent(lru: ExpiringLRU, keys_of: Callable[[Any], list[str]]) -> None:
+    """Have :func:`bump_generation` also drop the entries of ``lru`` built from a bumped generation."""
+    _dependents.append((lru, keys_of))
+
+
+def clear() -> None:
+    """Drop every entry held by this process."""
+    verified_tokens.clear()
+    contexts.clear()
+
+
+class VerifiedTokens(Mapping):
+    """``static_tokens`` stand-in that also answers from the verified-token LRU.
+
+    authentikate checks ``settings.static_tokens`` before decoding a token;
+    serving cached verifications from there skips the signature check for
+    tokens this process has already verified.
+    """
+
+    def __init__(self, static_tokens: Mapping):
+        self.static_tokens = static_tokens
+
+    def __getitem__(self, raw: str):
+        if raw in self.static_tokens:
+            return self.static_tokens[raw]
+        token = verified_tokens.get(token_hash(raw))
+        if token is None:
+            raise KeyError(raw)
+        return token
+
+    def __contains__(self, raw: object) -> bool:
+        return raw in self.static_tokens or (isinstance(raw, str) and verified_tokens.get(token_hash(raw)) is not None)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.static_tokens)
+
+    def __len__(self) -> int:
+        return len(self.static_tokens)
+
+
+def _cacheable(token) -> bool:
+    # static tokens share a placeholder ``raw``, so they cannot be keyed by it
+    return not isinstance(token, StaticToken)
+
+
+def remember_verified(token) -> None:
+    """Cache a verified token until it expires."""
+    if not _cacheable(token):
+        return
+    verified_tokens.set(token_hash(token.raw), token, token.exp.timestamp())
+
+
+# --- generations ---------------------------------------------------------
+#
+# Generations are keyed by what the token itself names (user id, OAuth2
+# client_id, organization slug), so the keys are known *before* the context is
+# loaded: reading them first means a change committed mid-load leaves the new
+# entry already stale instead of caching old rows under new generations.
+
+
+def generation_key(kind: str, natural_key) -> str:
+    return f"authapp:gen:{kind}:{natural_key}"
+
+
+def generation_keys(sub, client_id, active_org) -> list[str]:
+    """Generation keys of everything a token for ``sub`` / ``client_id`` / ``active_org`` depends on."""
+    return [
+        generation_key("user", sub),
+        generation_key("client", client_id),
+        generation_key("organization", active_org),
+        generation_key("membership", f"{sub}:{active_org}"),
+    ]
+
+
+def context_generation_keys(token) -> list[str]:
+    return generation_keys(token.sub, token.client_id, token.active_org)
+
+
+def bump_generation(kind: str, natural_key) -> None:
+    """Mark every cached context built from ``kind``/``natural_key`` as stale once the transaction commits."""
+    key = generation_key(kind, natural_key)
+
+    def _bump() -> None:
+        cache.set(key, uuid.uuid4().hex, None)
+        for lru, keys_of in _dependents:
+            lru.discard_where(lambda entry: key in keys_of(entry))
+
+    transaction.on_commit(_bump)
+
+
+def get_generations(keys: list[str]) -> list[Optional[str]]:
+    """Current generations of ``keys`` (one cache round trip when all of them exist).
+
+    Missing generations are created with ``cache.add`` (the first writer wins),
+    so an evicted key reads as a new generation. ``None`` is only returned when
+    the cache can't hold the key at all; treat it as stale.
+    """
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        found.update(cache.get_many(missing))
+    return [found.get(key) for key in keys]
+
+
+async def aget_generations(token) -> list[Optional[str]]:
+    """Current generations of everything ``token`` expands to."""
+    # cache round trips never touch the ORM, so keep them off the thread-sensitive executor
+    return await sync_to_async(get_generations, thread_sensitive=False)(context_generation_keys(token))
+
+
+def is_current(recorded: list[Optional[str]], current: list[Optional[str]]) -> bool:
+    """Whether an entry recorded under ``recorded`` generations is still valid."""
+    return None not in current and recorded == current
+
+
+def shared_generations() -> bool:
+    """Whether generation bumps reach every process (the Django cache is shared)."""
+    return getattr(settings, "AUTHAPP_SHARED_GENERATIONS", False)
+
+
+# --- expanded contexts ---------------------------------------------------
+
+
+def _shared_key(digest: str) -> str:
+    return f"authapp:ctx:{digest}"
+
+
+def _shared_enabled() -> bool:
+    return getattr(settings, "AUTHAPP_AUTH_CONTEXT_SHARED_CACHE", False)
+
+
+async def aget_context(token) -> Optional[tuple]:
+    """Return the cached ``(user, client, organization, membership)`` for ``token``, if still current."""
+    if _maxsize() <= 0 or not shared_generations() or not _cacheable(token):
+        return None
+
+    digest = token_hash(token.raw)
+    entry = contexts.get(digest)
+
+    if entry is None and _shared_enabled():
+        entry = await sync_to_async(cache.get, thread_sensitive=False)(_shared_key(digest))
+        if entry is not None:
+            contexts.set(digest, entry, token.exp.timestamp())
+
+    if entry is None:
+        return None
+
+    context, _, generations = entry
+    if not is_current(generations, await aget_generations(token)):
+        return None
+    return context
+
+
+async def aset_context(token, context: tuple, generations: list[Optional[str]]) -> None:
+    """Cache an expanded context under the generations read *before* it was loaded."""
+    if _maxsize() <= 0 or not shared_generations() or not _cacheable(token) or None in generations:
+        return
+
+    entry = (context, context_generation_keys(token), generations)
+    expires_at = token.exp.timestamp()
+    contexts.set(token_hash(token.raw), entry, expires_at)
+
+    if _shared_enabled():
+        timeout = max(int(expires_at - time.time()), 1)
+        await sync_to_async(cache.set, thread_sensitive=False)(_shared_key(token_hash(token.raw)), entry, timeout)
@@ -0,0 +1,145 @@
+"""Precomputed token-claims profiles.
+
+Everything :class:`authapp.token_generators.MyJWTBearerTokenGenerator` puts into
+an access token apart from ``scope`` only depends on the OAuth2 client and the
+membership the token is issued for: the user's id and username, the
+organization slug, the membership's roles and the app / release / device / role
+of the fakts client behind the OAuth2 client. That *profile* is loaded with a
+single query and kept in the Django cache, so a storm of ``client_credentials``
+requests from restarting agents costs cache round trips instead of a handful of
+lazy loads per token.
+
+Profiles are cached per ``(OAuth2Client, membership)`` for
+``AUTHAPP_CLAIMS_PROFILE_TTL`` seconds and stamped with the *versions* of both
+that were current before they were loaded. The receivers in
+:mod:`authapp.signals` bump those versions after commit whenever roles, the
+user, the organization or the client bindings change, which turns every
+dependent profile into a miss. An evicted version reads as a new one
+(:func:`authapp.auth_cache.get_generations`), so eviction is a miss as well.
+
+Version bumps only reach every process through a shared cache
+(``AUTHAPP_SHARED_GENERATIONS``, the redis backend). With per-process locmem
+other workers would keep issuing tokens with removed roles, so profiles are
+not cached there.
+"""
+
+import uuid
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Subquery
+
+from authapp.auth_cache import get_generations, is_current, shared_generations
+from authapp.models import OAuth2Client
+from karakter.models import Membership
+
+
+def _ttl() -> int:
+    if not shared_generations():
+        return 0
+    return getattr(settings, "AUTHAPP_CLAIMS_PROFILE_TTL", 0)
+
+
+def _version_key(kind: str, pk) -> str:
+    return f"authapp:claims:v:{kind}:{pk}"
+
+
+def _profile_key(client_pk, membership_pk) -> str:
+    return f"authapp:claims:{client_pk}:{membership_pk or '-'}"
+
+
+def _bump(kind: str, pks) -> None:
+    keys = [_version_key(kind, pk) for pk in pks if pk]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def invalidate_clients(client_pks) -> None:
+    """Make the profiles of the OAuth2 clients ``client_pks`` stale once the transaction commits."""
+    _bump("client", client_pks)
+
+
+def invalidate_memberships(membership_pks) -> None:
+    """Make the profiles of the memberships ``membership_pks`` stale once the transaction commits.
+
+    OAuth2 clients without a membership of their own resolve it through their
+    fakts client, so their profiles are versioned by the client alone and are
+    invalidated here as well.
+    """
+    membership_pks = [pk for pk in membership_pks if pk]
+    if not membership_pks:
+        return
+
+    _bump("membership", membership_pks)
+    _bump("client", OAuth2Client.objects.filter(membership__isnull=True, client__membership__in=membership_pks).values_list("pk", flat=True))
+
+
+def load_claims_profile(client: OAuth2Client, membership_pk: Optional[int]) -> Optional[dict]:
+    """Load the claims profile in one query.
+
+    Without a ``membership_pk`` the membership is the one of the fakts client
+    bound to ``client``. Returns None when there is no such membership.
+    """
+    from fakts.models import Client
+
+    memberships = Membership.objects.filter(pk=membership_pk) if membership_pk else Membership.objects.filter(clients__oauth2_client_id=client.pk)
+    fakts_client = Client.objects.filter(oauth2_client_id=client.pk).values
+
+    rows = list(
+        memberships.annotate(
+            client_app=Subquery(fakts_client("release__app__identifier")[:1]),
+            client_release=Subquery(fakts_client("release__version")[:1]),
+            client_device=Subquery(fakts_client("node__node_id")[:1]),
+            client_role=Subquery(fakts_client("role")[:1]),
+        )
+        .order_by("roles__id")
+        .values("pk", "user_id", "user__username", "organization__slug", "roles__id", "roles__identifier", "client_app", "client_release", "client_device", "client_role")
+    )
+    if not rows:
+        return None
+
+    row = rows[0]
+    return {
+        "membership": row["pk"],
+        "roles": [r["roles__identifier"] for r in rows if r["roles__id"] is not None and r["pk"] == row["pk"]],
+        "nickname": row["user__username"],
+        "preferred_username": row["user__username"],
+        "sub": str(row["user_id"]),
+        "active_org": row["organization__slug"],
+        "client_app": row["client_app"],
+        "client_release": row["client_release"],
+        "client_device": row["client_device"],
+        "client_role": row["client_role"],
+    }
+
+
+def get_claims_profile(client: OAuth2Client, membership: Optional[Membership] = None) -> Optional[dict]:
+    """Return the (cached) claims profile for tokens of ``client`` issued to ``membership``.
+
+    ``membership`` defaults to the client's own membership (``client_credentials``).
+    """
+    membership_pk = membership.pk if membership is not None else client.membership_id
+    if _ttl() <= 0:
+        return load_claims_profile(client, membership_pk)
+
+    version_keys = [_version_key("client", client.pk)]
+    if membership_pk:
+        version_keys.append(_version_key("membership", membership_pk))
+    profile_key = _profile_key(client.pk, membership_pk)
+    found = cache.get_many([profile_key, *version_keys])
+    missing = [key for key in version_keys if key not in found]
+    if missing:
+        found.update(zip(missing, get_generations(missing)))
+    versions = [found.get(key) for key in version_keys]
+
+    entry = found.get(profile_key)
+    if entry is not None and is_current(entry["versions"], versions):
+        return entry["profile"]
+
+    # versions were read *before* the load, so a change committed meanwhile leaves this entry stale
+    profile = load_claims_profile(client, membership_pk)
+    if profile is not None and None not in versions:
+        cache.set(profile_key, {"profile": profile, "versions": versions}, _ttl())
+    return profile
@@ -1,10 +1,15 @@
-from typing import cast
+from typing import Optional, cast
+from authentikate.base_models import AuthentikateSettings
 from authentikate.strawberry.extension import AuthentikateExtension, UserModel, JWTToken
 from karakter.models import User, Organization, Membership
 from fakts.models import Client
+from authapp import auth_cache
 from authapp.models import OAuth2Client
 
 
+_settings: Optional[tuple[AuthentikateSettings, AuthentikateSettings]] = None
+
+
 async def expand_user_from_token(token: str):
     """Expand the user from the token"""
     # Implement your logic to expand the user from the token
@@ -15,13 +20,52 @@ class AuthAppExtension(AuthentikateExtension):
     """This is the extension class for directly authenticating users and
     clients from the token or header. It sets the user and client in the"""
 
+    def get_settings(self) -> AuthentikateSettings:
+        """Authentikate settings whose ``static_tokens`` also answer from the
+        verified-token cache (see :mod:`authapp.auth_cache`)."""
+        global _settings
+        base = super().get_settings()
+        if _settings is None or _settings[0] is not base:
+            _settings = (base, base.model_copy(update={"static_tokens": auth_cache.VerifiedTokens(base.static_tokens)}))
+        return _settings[1]
+
     async def aexpand_token_context(self, token: JWTToken) -> tuple[User, Client, Organization, Membership]:
         """Expand the full auth context for a token using this project's models.
 
         authentikate (v2) drives ``on_operation`` through this single method
         rather than the per-entity ``aexpand_*`` helpers, so we compose them
         here to keep authentication backed by the karakter/fakts models.
+
+        Expanded contexts are cached per token until it expires and dropped as
+        soon as the user, client, organization or membership changes.
         """
+        auth_cache.remember_verified(token)
+
+        context = await auth_cache.aget_context(token)
+        if context is not None:
+            return context
+
+        generations = await auth_cache.aget_generations(token)
+        context = await self.aload_token_context(token)
+        await auth_cache.aset_context(token, context, generations)
+        return context
+
+    async def aload_token_context(self, token: JWTToken) -> tuple[User, Client, Organization, Membership]:
+        """Load the auth context from the database, in a single joined query
+        when the token's user owns its client (the common case)."""
+        client = (
+            await Client.objects.select_related("oauth2_client", "membership__user", "membership__organization")
+            .filter(
+                oauth2_client__client_id=token.client_id,
+                membership__user_id=token.sub,
+                membership__organization__slug=token.active_org,
+            )
+            .afirst()
+        )
+        if client is not None:
+            membership = client.membership
+            return (membership.user, client, membership.organization, membership)
+
         organization = await self.aexpand_organization_from_token(token)
         user = await self.aexpand_user_from_token(token)
         client = await self.aexpand_client_from_token(token)
@@ -1,9 +1,15 @@
+import logging
+
 from authlib.oauth2.rfc6749 import grants
-from .models import OAuth2Token, AuthorizationCode
+from .models import OAuth2Token, AuthorizationCode, token_digest
+from .revocation import revoke
+from .token_generators import jwk
 from authlib.oidc.core import grants as oidcgrants, UserInfo
 from karakter.models import Membership
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 
 class ClientCredentialsGrant(grants.ClientCredentialsGrant):
     TOKEN_ENDPOINT_AUTH_METHODS = ["client_secret_basic", "client_secret_post"]
@@ -20,7 +26,8 @@ class OpenIDCode(oidcgrants.OpenIDCode):
     def get_jwt_config(self, grant, client):
         # Implement key rotation and retrieval as needed
         return {
-            "key": settings.PRIVATE_KEY,
+            # the imported key, so the PEM isn't parsed again for every id_token
+            "key": jwk,
             "alg": "RS256",
             "iss": settings.OIDC_ISSUER,
             "exp": 3600,
@@ -44,11 +51,10 @@ class AuthorizationCodeGrant(grants.AuthorizationCodeGrant):
     TOKEN_ENDPOINT_AUTH_METHODS = ["client_secret_basic", "client_secret_post"]
 
     def query_authorization_code(self, code, client):
-        print("Querying authorization code:", code, "for client:", client.client_id)  # Debug log
         try:
             item = AuthorizationCode.objects.get(code=code, client_id=client.client_id)
         except AuthorizationCode.DoesNotExist:
-            print("Authorization code not found:", code)  # Debug log
+            logger.debug("Unknown authorization code for client %s", client.client_id)
             return None
 
         if not item.is_expired():
@@ -81,9 +87,8 @@ class RefreshTokenGrant(grants.RefreshTokenGrant):
     TOKEN_ENDPOINT_AUTH_METHODS = ["client_secret_basic", "client_secret_post"]
 
     def authenticate_refresh_token(self, refresh_token):
-        print("Authenticating refresh token:", refresh_token)
         try:
-            item = OAuth2Token.objects.get(refresh_token=refresh_token)
+            item = OAuth2Token.objects.get(refresh_token_digest=token_digest(refresh_token))
             if item.is_refresh_token_active():
                 return item
         except OAuth2Token.DoesNotExist:
@@ -95,3 +100,6 @@ class RefreshTokenGrant(grants.RefreshTokenGrant):
     def revoke_old_credential(self, credential: OAuth2Token):
         credential.revoked = True
         credential.save()
+        # the rotated-out access token may not be stored, so revoke it by jti
+        # (the save drops its cached introspection answers, see authapp.signals)
+        revoke(credential.access_token_jti, credential.get_expires_at())
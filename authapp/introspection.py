@@ -0,0 +1,235 @@
+"""Token introspection (RFC 7662) answered from a cache of token state.
+
+Resource servers ask whether a token is still active at high rates, often for
+the same few tokens. The state of an active token (its claims, expiry and the
+rows it depends on) is therefore cached per token digest in a per-process LRU
+and in the Django cache for ``AUTHAPP_INTROSPECTION_CACHE_TTL`` seconds (at
+most until the token expires). Only misses go to the database, and a batch of
+misses is resolved with a fixed number of queries.
+
+Cached states never outlive the facts they were built from:
+
+* every state records the generations of its user, client, organization and
+  membership (see :mod:`authapp.auth_cache`), which the model signals bump;
+* access tokens are checked against the revocation list by ``jti`` and, when
+  they are stored (``AUTHAPP_ACCESS_TOKEN_STORAGE = "persist"``), must have an
+  unrevoked ``OAuth2Token`` row;
+* stored tokens carry a generation of their own (per access and refresh token
+  digest) that is bumped whenever their row is revoked or deleted.
+
+Generations only invalidate across processes with a shared cache, so states
+are only cached with ``AUTHAPP_SHARED_GENERATIONS``. Inactive answers are not
+cached.
+"""
+
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from authapp import auth_cache
+from authapp.models import REFRESH_TOKEN_LIFETIME, OAuth2Client, OAuth2Token, token_digest
+from authapp.revocation import revoked_jtis
+from authapp.token_generators import decode_access_token
+from karakter.models import Membership
+
+INACTIVE = {"active": False}
+
+states = auth_cache.ExpiringLRU(auth_cache.cache_size)
+auth_cache.register_dependent(states, lambda state: state["keys"])
+
+
+def _ttl() -> int:
+    if not auth_cache.shared_generations():
+        return 0
+    return getattr(settings, "AUTHAPP_INTROSPECTION_CACHE_TTL", 0)
+
+
+def _shared_key(digest: str) -> str:
+    return f"authapp:introspect:{digest}"
+
+
+def refresh_generation_key(digest: str) -> str:
+    return auth_cache.generation_key("refresh", digest)
+
+
+def access_generation_key(digest: str) -> str:
+    return auth_cache.generation_key("access", digest)
+
+
+def _access_token_states(claims_by_digest: dict[str, dict]) -> dict[str, dict]:
+    """States of verified, unexpired access tokens whose client and membership still exist."""
+    if not claims_by_digest:
+        return {}
+
+    claims = claims_by_digest.values()
+    # read before the rows, so a change racing the load leaves the state stale rather than wrong
+    keys_by_digest = {
+        digest: [access_generation_key(digest), *auth_cache.generation_keys(c["sub"], c["client_id"], c.get("active_org"))]
+        for digest, c in claims_by_digest.items()
+    }
+    all_keys = sorted({key for keys in keys_by_digest.values() for key in keys})
+    generations = dict(zip(all_keys, auth_cache.get_generations(all_keys)))
+
+    memberships = Q()
+    for c in claims:
+        memberships |= Q(user_id=c["sub"], organization__slug=c.get("active_org"))
+    existing = {(str(user_id), slug) for user_id, slug in Membership.objects.filter(memberships).values_list("user_id", "organization__slug")}
+    clients = set(OAuth2Client.objects.filter(client_id__in={c["client_id"] for c in claims}).values_list("client_id", flat=True))
+    stored = None
+    if settings.AUTHAPP_ACCESS_TOKEN_STORAGE == "persist":
+        stored = set(OAuth2Token.objects.filter(access_token_digest__in=list(claims_by_digest), revoked=False).values_list("access_token_digest", flat=True))
+
+    found = {}
+    for digest, c in claims_by_digest.items():
+        if (str(c["sub"]), c.get("active_org")) not in existing or c["client_id"] not in clients:
+            continue
+        if stored is not None and digest not in stored:
+            continue
+
+        response = {
+            "active": True,
+            "token_type": "access_token",
+            "scope": c.get("scope") or "",
+            "client_id": c["client_id"],
+            "username": c.get("preferred_username"),
+            "sub": c["sub"],
+            "iss": c["iss"],
+            "aud": c.get("aud"),
+            "exp": c["exp"],
+            "iat": c.get("iat"),
+            "jti": c.get("jti"),
+            "active_org": c.get("active_org"),
+            "roles": c.get("roles", []),
+        }
+        keys = keys_by_digest[digest]
+        found[digest] = {"response": response, "exp": c["exp"], "jti": c.get("jti"), "keys": keys, "generations": [generations[key] for key in keys]}
+    return found
+
+
+def _refresh_token_states(digests: list[str]) -> dict[str, dict]:
+    """States of active refresh tokens among ``digests``."""
+    if not digests:
+        return {}
+
+    refresh_generations = dict(zip(digests, auth_cache.get_generations([refresh_generation_key(d) for d in digests])))
+    tokens = OAuth2Token.objects.select_related("user__user", "user__organization").filter(refresh_token_digest__in=digests, revoked=False)
+    clients = set(OAuth2Client.objects.filter(client_id__in={t.client_id for t in tokens}).values_list("client_id", flat=True))
+
+    active = [token for token in tokens if token.is_refresh_token_active() and token.client_id in clients]
+    keys_by_digest = {
+        token.refresh_token_digest: [
+            refresh_generation_key(token.refresh_token_digest),
+            *auth_cache.generation_keys(str(token.user.user_id), token.client_id, token.user.organization.slug),
+        ]
+        for token in active
+    }
+    generation_keys = sorted({key for keys in keys_by_digest.values() for key in keys[1:]})
+    generations = {**dict(zip(generation_keys, auth_cache.get_generations(generation_keys))), **{refresh_generation_key(d): g for d, g in refresh_generations.items()}}
+
+    found = {}
+    for token in active:
+        membership = token.user
+        sub, active_org = str(membership.user_id), membership.organization.slug
+        exp = token.issued_at + REFRESH_TOKEN_LIFETIME
+        response = {
+            "active": True,
+            "token_type": "refresh_token",
+            "scope": token.scope,
+            "client_id": token.client_id,
+            "username": membership.user.username,
+            "sub": sub,
+            "iss": settings.OIDC_ISSUER,
+            "exp": exp,
+            "iat": token.issued_at,
+            "active_org": active_org,
+        }
+        keys = keys_by_digest[token.refresh_token_digest]
+        found[token.refresh_token_digest] = {"response": response, "exp": exp, "jti": None, "keys": keys, "generations": [generations[key] for key in keys]}
+    return found
+
+
+def load_states(tokens: dict[str, str]) -> dict[str, dict]:
+    """Build the states of the active tokens in ``{digest: raw token}``."""
+    now = time.time()
+    access, refresh = {}, []
+    for digest, raw in tokens.items():
+        if raw.count(".") == 2:
+            claims = decode_access_token(raw)
+            if claims is not None and claims.get("exp", 0) > now:
+                access[digest] = claims
+        else:
+            refresh.append(digest)
+
+    return {**_access_token_states(access), **_refresh_token_states(refresh)}
+
+
+def _cached_states(digests: list[str]) -> dict[str, dict]:
+    found = {}
+    for digest in digests:
+        state = states.get(digest)
+        if state is not None:
+            found[digest] = state
+
+    missing = [digest for digest in digests if digest not in found]
+    if missing:
+        shared = cache.get_many([_shared_key(digest) for digest in missing])
+        for digest in missing:
+            state = shared.get(_shared_key(digest))
+            if state is not None:
+                states.set(digest, state, state["exp"])
+                found[digest] = state
+    return found
+
+
+def _store(states_by_digest: dict[str, dict]) -> None:
+    now = time.time()
+    shared = {}
+    for digest, state in states_by_digest.items():
+        if None in state["generations"]:
+            continue
+        expires_at = min(state["exp"], now + _ttl())
+        states.set(digest, state, expires_at)
+        shared[_shared_key(digest)] = state
+    if shared:
+        # states carry their exp, so outliving the token in the cache is harmless
+        cache.set_many(shared, _ttl())
+
+
+def introspect(tokens: list[str]) -> list[dict]:
+    """Introspection responses for ``tokens``, in order."""
+    if not tokens:
+        return []
+
+    digests = [token_digest(token) for token in tokens]
+    cached = _cached_states(digests) if _ttl() > 0 else {}
+
+    misses = {digest: token for digest, token in zip(digests, tokens) if digest not in cached}
+    loaded = load_states(misses) if misses else {}
+    if _ttl() > 0:
+        _store(loaded)
+
+    found = {**cached, **loaded}
+    keys = sorted({key for state in found.values() for key in state["keys"]})
+    current = dict(zip(keys, auth_cache.get_generations(keys))) if keys else {}
+    revoked = revoked_jtis() if any(state["jti"] for state in found.values()) else {}
+    now = time.time()
+
+    responses = []
+    for digest in digests:
+        state = found.get(digest)
+        if (
+            state is None
+            or state["exp"] <= now
+            or (state["jti"] and state["jti"] in revoked)
+            or not auth_cache.is_current(state["generations"], [current.get(key) for key in state["keys"]])
+        ):
+            responses.append(dict(INACTIVE))
+            continue
+        responses.append(dict(state["response"]))
+    return responses
+
+
+def introspect_token(token: str) -> dict:
+    """Introspection response for a single token."""
+    return introspect([token])[0]
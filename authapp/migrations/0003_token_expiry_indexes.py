@@ -0,0 +1,24 @@
+# Generated by Django 6.0.6 on 2026-10-18 12:23
+
+import authapp.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='authorizationcode',
+            name='auth_time',
+            field=models.IntegerField(db_index=True, default=authapp.models.now_timestamp),
+        ),
+        migrations.AlterField(
+            model_name='oauth2token',
+            name='issued_at',
+            field=models.IntegerField(db_index=True, default=authapp.models.now_timestamp),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.6 on 2026-10-18 12:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0003_token_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedAccessToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=64, unique=True)),
+                ('expires_at', models.IntegerField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='oauth2token',
+            name='access_token_jti',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='oauth2token',
+            name='access_token',
+            field=models.CharField(max_length=10000, null=True, unique=True),
+        ),
+    ]
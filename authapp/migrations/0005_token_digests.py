@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0004_stateless_access_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oauth2token',
+            name='access_token_digest',
+            field=models.CharField(max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='oauth2token',
+            name='refresh_token_digest',
+            field=models.CharField(db_index=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+import hashlib
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode()).hexdigest() if token else None
+
+
+def fill_token_digests(apps, schema_editor):
+    OAuth2Token = apps.get_model('authapp', 'OAuth2Token')
+
+    batch = []
+    for token in OAuth2Token.objects.only('pk', 'access_token', 'refresh_token').iterator(chunk_size=BATCH_SIZE):
+        token.access_token_digest = _digest(token.access_token)
+        token.refresh_token_digest = _digest(token.refresh_token)
+        batch.append(token)
+        if len(batch) >= BATCH_SIZE:
+            OAuth2Token.objects.bulk_update(batch, ['access_token_digest', 'refresh_token_digest'])
+            batch = []
+    OAuth2Token.objects.bulk_update(batch, ['access_token_digest', 'refresh_token_digest'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0005_token_digests'),
+    ]
+
+    operations = [
+        # the plaintext cannot be recovered from a digest
+        migrations.RunPython(fill_token_digests, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authapp', '0006_fill_token_digests'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='oauth2token',
+            name='access_token',
+        ),
+        migrations.RemoveField(
+            model_name='oauth2token',
+            name='refresh_token',
+        ),
+    ]
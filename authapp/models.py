@@ -1,3 +1,4 @@
+import hashlib
 import time
 from django.db import models
 from django.contrib.auth import get_user_model
@@ -10,6 +11,10 @@ from karakter.models import Membership
 User = get_user_model()
 
 
+# Clients whose scope includes this may introspect tokens (authapp.views.introspect).
+INTROSPECTION_SCOPE = "introspection"
+
+
 def scope_to_list(scope):
     """Convert a space-separated scope string to a list."""
     if not scope:
@@ -40,10 +45,21 @@ def generate_client_secret() -> str:
     return secrets.token_urlsafe(32)
 
 
+# Refresh tokens outlive their access token by this many seconds (30 days).
+REFRESH_TOKEN_LIFETIME = 2592000
+# Authorization codes must be exchanged within this many seconds (10 minutes).
+AUTHORIZATION_CODE_LIFETIME = 600
+
+
 def now_timestamp():
     return int(time.time())
 
 
+def token_digest(token: str) -> str:
+    """The fixed-width SHA-256 hex digest under which a token is stored."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 class OAuth2Client(models.Model, ClientMixin):
     membership = models.ForeignKey(Membership, on_delete=models.CASCADE, related_name="oauth2_clients", null=True, blank=True)
     client_id = models.CharField(max_length=48, unique=True)
@@ -92,6 +108,10 @@ class OAuth2Client(models.Model, ClientMixin):
         allowed = set(scope_to_list(self.scope))
         return list_to_scope([s for s in scope.split() if s in allowed])
 
+    def can_introspect(self) -> bool:
+        """Whether this client may use the introspection endpoints (it has the ``introspection`` scope)."""
+        return INTROSPECTION_SCOPE in scope_to_list(self.scope)
+
     def check_redirect_uri(self, redirect_uri):
         return True  # TODO: implement proper check when
         return redirect_uri in self.redirect_uris
@@ -100,7 +120,7 @@ class OAuth2Client(models.Model, ClientMixin):
         return self.client_secret == client_secret
 
     def check_endpoint_auth_method(self, method, endpoint):
-        if endpoint == "token":
+        if endpoint in ("token", "introspection"):
             if method == "client_secret_basic":
                 return True
             if method == "client_secret_post":
@@ -138,11 +158,15 @@ class OAuth2Token(models.Model, TokenMixin):
     user = models.ForeignKey(Membership, on_delete=models.CASCADE)  # membership
     client_id = models.CharField(max_length=48, db_index=True)
     token_type = models.CharField(max_length=40)
-    access_token = models.CharField(max_length=10000, unique=True, null=False)
-    refresh_token = models.CharField(max_length=10000, db_index=True)
+    # Tokens are only stored (and looked up) by their SHA-256, see token_digest.
+    # NULL for tokens issued with AUTHAPP_ACCESS_TOKEN_STORAGE = "stateless"
+    access_token_digest = models.CharField(max_length=64, unique=True, null=True)
+    access_token_jti = models.CharField(max_length=64, null=True, blank=True)
+    # NULL for tokens issued without a refresh token
+    refresh_token_digest = models.CharField(max_length=64, db_index=True, null=True)
     scope = models.TextField(default="")
     revoked = models.BooleanField(default=False)
-    issued_at = models.IntegerField(null=False, default=now_timestamp)
+    issued_at = models.IntegerField(null=False, default=now_timestamp, db_index=True)
     expires_in = models.IntegerField(null=False, default=0)
 
     def check_client(self, client):
@@ -170,9 +194,7 @@ class OAuth2Token(models.Model, TokenMixin):
     def is_refresh_token_active(self) -> bool:
         if self.revoked:
             return False
-        # Assuming refresh tokens expire in 30 days (2592000 seconds)
-        refresh_token_lifetime = 2592000
-        if self.issued_at + refresh_token_lifetime < now_timestamp():
+        if self.issued_at + REFRESH_TOKEN_LIFETIME < now_timestamp():
             return False
         return True
 
@@ -186,6 +208,17 @@ class OAuth2Token(models.Model, TokenMixin):
         return getattr(self, key, default)
 
 
+class RevokedAccessToken(models.Model):
+    """An access token revoked before its expiry, by ``jti``.
+
+    Rows are only needed until the token would have expired anyway, so the
+    list stays small (see :mod:`authapp.revocation`).
+    """
+
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.IntegerField(db_index=True)
+
+
 class AuthorizationCode(models.Model, AuthorizationCodeMixin):
     membership = models.ForeignKey(Membership, on_delete=models.CASCADE)
     client_id = models.CharField(max_length=48, db_index=True)
@@ -193,7 +226,7 @@ class AuthorizationCode(models.Model, AuthorizationCodeMixin):
     redirect_uri = models.TextField(default="", null=True)
     response_type = models.TextField(default="")
     scope = models.TextField(default="", null=True)
-    auth_time = models.IntegerField(null=False, default=now_timestamp)
+    auth_time = models.IntegerField(null=False, default=now_timestamp, db_index=True)
 
     # add nonce
     nonce = models.CharField(max_length=120, default="", null=True)
@@ -208,8 +241,7 @@ class AuthorizationCode(models.Model, AuthorizationCodeMixin):
         return str(self.membership.id)
 
     def is_expired(self):
-        # Authorization code is valid for 10 minutes
-        expiration_time = self.auth_time + 600
+        expiration_time = self.auth_time + AUTHORIZATION_CODE_LIFETIME
         return now_timestamp() > expiration_time
 
     def get_redirect_uri(self):
@@ -0,0 +1,67 @@
+"""Revocation list for access tokens.
+
+With ``AUTHAPP_ACCESS_TOKEN_STORAGE = "stateless"`` access tokens are never
+written to the database, so there is no ``OAuth2Token`` row to flag when one
+must stop working early (e.g. when its refresh token is rotated). Instead the
+token's ``jti`` goes onto a revocation list until the token would have expired
+anyway. The list only ever holds unexpired entries, so the whole set of
+``jti`` values is cached as one entry and checked without a query.
+
+A revocation drops that entry once it commits. Only a shared (redis) cache
+carries the drop to every process; with a per-process cache the entry is kept
+for at most ``LOCAL_TTL`` seconds, so other processes pick up a revocation
+within that bound.
+"""
+
+import json
+from base64 import urlsafe_b64decode
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+from authapp.auth_cache import shared_generations
+from authapp.models import RevokedAccessToken, now_timestamp
+
+_CACHE_KEY = "authapp:revoked"
+SHARED_TTL = 3600
+LOCAL_TTL = 5
+
+
+def access_token_jti(access_token: str) -> Optional[str]:
+    """The ``jti`` claim of one of our JWT access tokens (no signature check)."""
+    try:
+        payload = access_token.split(".")[1]
+        return json.loads(urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["jti"]
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def revoke(jti: Optional[str], expires_at: int) -> None:
+    """Put ``jti`` on the revocation list until ``expires_at`` (epoch seconds)."""
+    if not jti or expires_at < now_timestamp():
+        return
+
+    RevokedAccessToken.objects.get_or_create(jti=jti, defaults={"expires_at": expires_at})
+    transaction.on_commit(lambda: cache.delete(_CACHE_KEY))
+
+
+def revoked_jtis() -> dict[str, int]:
+    """The current revocation list as ``{jti: expires_at}``."""
+    now = now_timestamp()
+    revoked = cache.get(_CACHE_KEY)
+    if revoked is None:
+        revoked = dict(RevokedAccessToken.objects.filter(expires_at__gte=now).values_list("jti", "expires_at"))
+        cache.set(_CACHE_KEY, revoked, cache_ttl(revoked, now))
+    return revoked
+
+
+def cache_ttl(revoked: dict[str, int], now: int) -> int:
+    """How long the list may be cached: until its earliest expiry, and briefly unless the cache is shared."""
+    ttl = SHARED_TTL if shared_generations() else LOCAL_TTL
+    # bounded by the earliest expiry, so expired entries fall out on their own
+    return max(min(min(revoked.values(), default=now + ttl) - now, ttl), 1)
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    return bool(jti) and jti in revoked_jtis()
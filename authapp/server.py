@@ -9,22 +9,49 @@ generator used to produce JWT bearer tokens. Other modules should import
 ``server.create_token_response``) to handle protocol endpoints.
 """
 
+from typing import Optional
 from django.conf import settings
 from authlib.integrations.django_oauth2 import AuthorizationServer, BearerTokenValidator, ResourceProtector
-from .models import OAuth2Client, OAuth2Token
+from karakter.models import Membership
+from .models import OAuth2Client, OAuth2Token, token_digest
 from .grants import ClientCredentialsGrant, AuthorizationCodeGrant, OpenIDCode, RefreshTokenGrant
+from .revocation import access_token_jti, is_revoked
 from .token_generators import MyJWTBearerTokenGenerator
 from authlib.oidc.core import UserInfo
-from .token_generators import jwk_dict
+from .token_generators import decode_access_token, jwk_dict
 from authlib.oidc.core.userinfo import UserInfoEndpoint
 
 
 from authlib.oauth2.rfc9068 import JWTBearerTokenValidator
 
+
+class LokAuthorizationServer(AuthorizationServer):
+    def save_token(self, token, request):
+        """Persist an issued token.
+
+        Only the SHA-256 digests of the access and refresh token are stored.
+        With ``AUTHAPP_ACCESS_TOKEN_STORAGE = "stateless"`` only refresh tokens
+        are stored (without the access token, which stays verifiable through
+        its signature); tokens without a refresh token, like
+        client_credentials tokens, are not written at all. The access token's
+        ``jti`` is kept so rotating the refresh token can revoke it.
+        """
+        stateless = settings.AUTHAPP_ACCESS_TOKEN_STORAGE == "stateless"
+        refresh_token = token.get("refresh_token")
+        if stateless and not refresh_token:
+            return None
+
+        stored = {key: value for key, value in token.items() if key not in ("access_token", "refresh_token")}
+        stored["access_token_digest"] = None if stateless else token_digest(token["access_token"])
+        stored["access_token_jti"] = access_token_jti(token["access_token"])
+        stored["refresh_token_digest"] = token_digest(refresh_token) if refresh_token else None
+        return super().save_token(stored, request)
+
+
 # The AuthorizationServer is backed by the project's OAuth2Client and
 # OAuth2Token models; these model classes implement the storage hooks
 # required by authlib's integration layer.
-server = AuthorizationServer(OAuth2Client, OAuth2Token)
+server = LokAuthorizationServer(OAuth2Client, OAuth2Token)
 
 # Register the project's supported grants. Add other grants here as
 # needed (authorization_code, refresh_token, etc.).
@@ -51,14 +78,44 @@ class MyUserInfoEndpoint(UserInfoEndpoint):
 
 class MyBearerTokenValidator(JWTBearerTokenValidator):
     def authenticate_token(self, token_string):
-        return OAuth2Token.objects.get(access_token=token_string)
+        return OAuth2Token.objects.get(access_token_digest=token_digest(token_string))
 
     def get_jwks(self) -> None:
         return jwk_dict
 
 
+def load_stateless_token(token_string: str) -> Optional[OAuth2Token]:
+    """Verify one of our JWT access tokens and return it as an unsaved OAuth2Token.
+
+    Returns None for invalid signatures, foreign issuers, revoked tokens and
+    memberships that no longer exist. Expiry and scope are left to the
+    validator, exactly as for stored tokens.
+    """
+    claims = decode_access_token(token_string)
+    if claims is None or is_revoked(claims.get("jti")):
+        return None
+
+    membership = Membership.objects.select_related("user", "organization").filter(user_id=claims.get("sub"), organization__slug=claims.get("active_org")).first()
+    if membership is None:
+        return None
+
+    return OAuth2Token(
+        user=membership,
+        client_id=claims["client_id"],
+        token_type="Bearer",
+        access_token_digest=token_digest(token_string),
+        access_token_jti=claims["jti"],
+        scope=claims.get("scope") or "",
+        issued_at=claims["iat"],
+        expires_in=claims["exp"] - claims["iat"],
+    )
+
+
 class Oauth2TokenValidator(BearerTokenValidator):
-    pass
+    def authenticate_token(self, token_string):
+        if settings.AUTHAPP_ACCESS_TOKEN_STORAGE == "stateless":
+            return load_stateless_token(token_string)
+        return OAuth2Token.objects.filter(access_token_digest=token_digest(token_string)).first()
 
 
 class RefreshTokenGenerator:
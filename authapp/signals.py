@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from authapp import claims_profile
+from authapp.auth_cache import bump_generation
+from authapp.models import OAuth2Client, OAuth2Token
+from fakts.models import App, Client, Device, Release
+from karakter.models import Membership, Organization, Role
+
+User = get_user_model()
+
+# Client fields only written by status reports. Saves restricted to these keep
+# cached auth contexts (which may then carry a slightly stale status).
+STATUS_ONLY_CLIENT_FIELDS = {"functional", "last_reported_at"}
+
+
+def _invalidate_profiles_of_clients(clients) -> None:
+    claims_profile.invalidate_clients(clients.values_list("oauth2_client_id", flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_context_on_user_change(sender, instance, update_fields=None, **kwargs):
+    bump_generation("user", instance.pk)
+
+    if update_fields is None or "username" in update_fields:
+        claims_profile.invalidate_memberships(Membership.objects.filter(user_id=instance.pk).values_list("pk", flat=True))
+
+
+@receiver(pre_save, sender=Organization)
+def invalidate_auth_context_on_organization_rename(sender, instance, **kwargs):
+    if not instance.pk:
+        return
+
+    old_slug = Organization.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+    if old_slug and old_slug != instance.slug:
+        bump_generation("organization", old_slug)
+        claims_profile.invalidate_memberships(Membership.objects.filter(organization_id=instance.pk).values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def invalidate_auth_context_on_organization_change(sender, instance, **kwargs):
+    bump_generation("organization", instance.slug)
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def invalidate_auth_context_on_membership_change(sender, instance, **kwargs):
+    slug = Organization.objects.filter(pk=instance.organization_id).values_list("slug", flat=True).first()
+    if slug:
+        bump_generation("membership", f"{instance.user_id}:{slug}")
+
+    claims_profile.invalidate_memberships([instance.pk])
+
+
+@receiver(m2m_changed, sender=Membership.roles.through)
+def invalidate_claims_profile_on_roles_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # a clear has no pk_set, so look the affected rows up before they are gone
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if reverse:
+        # ``role.memberships.add(...)``: instance is the Role
+        claims_profile.invalidate_memberships(pk_set if pk_set else instance.memberships.values_list("pk", flat=True))
+    else:
+        claims_profile.invalidate_memberships([instance.pk])
+
+
+@receiver(post_save, sender=Role)
+@receiver(pre_delete, sender=Role)
+def invalidate_claims_profile_on_role_change(sender, instance, created=False, **kwargs):
+    if created:
+        return
+
+    claims_profile.invalidate_memberships(instance.memberships.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=OAuth2Token)
+@receiver(post_delete, sender=OAuth2Token)
+def invalidate_introspection_on_token_revocation(sender, instance, created=False, **kwargs):
+    # a new row changes nothing that was cached; a revocation or deletion ends the token
+    if created or (kwargs["signal"] is post_save and not instance.revoked):
+        return
+
+    if instance.access_token_digest:
+        bump_generation("access", instance.access_token_digest)
+    if instance.refresh_token_digest:
+        bump_generation("refresh", instance.refresh_token_digest)
+
+
+@receiver(post_save, sender=OAuth2Client)
+@receiver(post_delete, sender=OAuth2Client)
+def invalidate_auth_context_on_oauth2_client_change(sender, instance, **kwargs):
+    bump_generation("client", instance.client_id)
+    claims_profile.invalidate_clients([instance.pk])
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_auth_context_on_client_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= STATUS_ONLY_CLIENT_FIELDS:
+        return
+
+    claims_profile.invalidate_clients([instance.oauth2_client_id])
+
+    client_id = OAuth2Client.objects.filter(pk=instance.oauth2_client_id).values_list("client_id", flat=True).first()
+    if client_id:
+        bump_generation("client", client_id)
+
+
+@receiver(post_save, sender=Device)
+def invalidate_claims_profile_on_device_change(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_profiles_of_clients(Client.objects.filter(node=instance))
+
+
+@receiver(post_save, sender=Release)
+def invalidate_claims_profile_on_release_change(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_profiles_of_clients(Client.objects.filter(release=instance))
+
+
+@receiver(post_save, sender=App)
+def invalidate_claims_profile_on_app_change(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_profiles_of_clients(Client.objects.filter(release__app=instance))
@@ -18,12 +18,15 @@ Notes:
 
 from authlib.oauth2.rfc9068 import JWTBearerTokenGenerator
 from authlib.oauth2.rfc6749.errors import InvalidClientError
-from joserfc.jwk import RSAKey
+from joserfc import jwt
+from joserfc.errors import JoseError
+from joserfc.jwk import KeySet, RSAKey
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 from django.conf import settings
 from typing import Any, Optional
-from django.core.exceptions import ObjectDoesNotExist
+
+from authapp.claims_profile import get_claims_profile
 
 # Load RSA private key (used for signing). The settings.PRIVATE_KEY must
 # contain the PEM-encoded private key string.
@@ -35,6 +38,22 @@ private_key = serialization.load_pem_private_key(settings.PRIVATE_KEY.encode("ut
 # separately from settings.PUBLIC_KEY in authapp/views.py.
 jwk = RSAKey.import_key(settings.PRIVATE_KEY)
 jwk_dict = jwk.as_dict(private=True, kid=settings.KEY_ID, use="sig")  # signing key — MUST include private material
+# Imported once: importing a private RSA JWK validates the key, which costs
+# far more than signing a token with it.
+signing_key_set = KeySet.import_key_set({"keys": [jwk_dict]})
+
+
+def decode_access_token(token_string: str) -> Optional[dict]:
+    """Claims of an access token issued by this server, or None if its
+    signature or issuer don't check out. Expiry is left to the caller."""
+    try:
+        claims = jwt.decode(token_string, jwk).claims
+    except (JoseError, ValueError):
+        return None
+
+    if claims.get("iss") != settings.OIDC_ISSUER:
+        return None
+    return claims
 
 
 class MyJWTBearerTokenGenerator(JWTBearerTokenGenerator):
@@ -44,44 +63,30 @@ class MyJWTBearerTokenGenerator(JWTBearerTokenGenerator):
     a small set of hooks used during token creation.
     """
 
-    def get_jwks(self) -> dict:
+    def get_jwks(self) -> KeySet:
         """Return the JWK set used to sign issued access tokens.
 
         authlib signs with the key returned here. Returning a JWK *set*
-        (``{"keys": [...]}``) rather than a bare key lets joserfc stamp the
-        key's ``kid`` into the JWT header, which consumers require to select
-        the verification key.
+        rather than a bare key lets joserfc stamp the key's ``kid`` into the
+        JWT header, which consumers require to select the verification key.
 
         Returns:
-            dict: a JWKS dict containing the (private) signing key.
+            KeySet: the already imported set containing the (private) signing key.
         """
-        return {"keys": [jwk_dict]}
-
-    def _get_fakts_client(self, client: Any) -> Any | None:
-        try:
-            return client.client
-        except ObjectDoesNotExist:
-            return None
-
-    def _get_membership(self, client: Any, user: Any) -> Any:
-        if user:
-            return user
-
-        try:
-            return client.resolve_membership()
-        except ObjectDoesNotExist as exc:
-            raise InvalidClientError(
-                description="Client is no longer attached to an organization membership."
-            ) from exc
+        return signing_key_set
 
     def get_extra_claims(self, client: Any, grant_type: Any, user: Any, scope: Optional[str]) -> dict:
         """Construct application-specific claims to include in the JWT.
 
         Behavior and assumptions:
-        - If ``user`` is falsy (client credentials flows), the method
-          attempts to use ``client.user`` as a fallback.
+        - ``user`` is the membership the token is issued for. If it is
+          falsy (client credentials flows), the client's own membership
+          is used.
         - If ``scope`` is falsy, the client's stored scope is used.
-        - Raises ValueError when required contextual data is missing.
+        - Raises InvalidClientError when the client has no membership.
+
+        Everything but the scope comes from the precomputed claims profile
+        of (client, membership), see :mod:`authapp.claims_profile`.
 
         Returns a dict with keys:
         - roles: list of role identifiers the user has in the client's
@@ -91,28 +96,21 @@ class MyJWTBearerTokenGenerator(JWTBearerTokenGenerator):
         - scope: the resolved scope string
         - active_org: the client's organization slug
         """
-        membership = self._get_membership(client, user)
+        profile = get_claims_profile(client, user or None)
+        if profile is None:
+            raise InvalidClientError(
+                description="Client is no longer attached to an organization membership."
+            )
 
         if not scope:
             # fall back to the client's configured scope
             scope = client.scope
 
-        fakts_client = self._get_fakts_client(client)
-
         # TODO: Implement correct scoping rules; for now expose roles and
         # some basic user identifiers used by resource servers.
-        return {
-            "roles": [role.identifier for role in membership.roles.all()],
-            "nickname": membership.user.username,
-            "preferred_username": membership.user.username,
-            "sub": str(membership.user.id),
-            "scope": scope,
-            "active_org": membership.organization.slug,
-            "client_app": fakts_client.release.app.identifier if fakts_client and fakts_client.release and fakts_client.release.app else None,
-            "client_release": fakts_client.release.version if fakts_client and fakts_client.release else None,
-            "client_device": fakts_client.node.node_id if fakts_client and fakts_client.node else None,
-            "client_role": fakts_client.role if fakts_client else None,
-        }
+        claims = {key: value for key, value in profile.items() if key != "membership"}
+        claims["scope"] = scope
+        return claims
 
     def get_audiences(self, client: Any, user: Any, scope: Optional[str]) -> str | list[str]:
         """Return the audience claim(s) for the token.
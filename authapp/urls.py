@@ -1,10 +1,12 @@
 # authapp/urls.py
 from django.urls import path
-from .views import home_view, issue_token, jwks, user_info
+from .views import home_view, introspect, introspect_batch, issue_token, jwks, user_info
 
 urlpatterns = [
     path("home/", home_view, name="home"),
     path("token/", issue_token, name="token"),  # Token endpoint
+    path("introspect/", introspect, name="introspect"),  # Token introspection (RFC 7662)
+    path("introspect/batch/", introspect_batch, name="introspect_batch"),
     path("jwks/", jwks, name="jwks"),  # JWKS endpoint
     path("user_info/", user_info, name="user_info"),  # User Info endpoint
 ]
@@ -25,11 +25,14 @@ from django.contrib.auth.views import LoginView
 from django.urls import reverse_lazy, reverse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
+from authapp.introspection import introspect as introspect_tokens
 from authapp.server import server, resource_protector
 from authlib.oauth2 import OAuth2Error
+from authlib.oauth2.rfc6749.errors import UnauthorizedClientError
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from joserfc.jwk import RSAKey
+from lok_server import discovery
 
 
 # Generate a JWK representation from the private key. We expose the
@@ -38,16 +41,16 @@ jwk = RSAKey.import_key(settings.PUBLIC_KEY)
 jwk_dict = jwk.as_dict(private=False, kid=settings.KEY_ID, use="sig")  # published JWKS — public key only
 
 @csrf_exempt
-def jwks(request: HttpRequest) -> JsonResponse:
+def jwks(request: HttpRequest) -> HttpResponse:
     """EXPOSE JWKS."""
-    return JsonResponse({"keys": [jwk_dict]})
+    return discovery.serve("jwks", lambda request: {"keys": [jwk_dict]}, request)
 
 
 @csrf_exempt
 @resource_protector("profile")
 def user_info(request: HttpRequest) -> JsonResponse:
     membership = request.oauth_token.user  # type: ignore
-    x =  JsonResponse(
+    return JsonResponse(
         {
             "sub": str(membership.user.id),
             "name": membership.user.username,
@@ -59,15 +62,16 @@ def user_info(request: HttpRequest) -> JsonResponse:
             "active_org": membership.organization.slug,
         }
     )
-    print(x.content)
-    
-    return x
 
 
 # use ``server.create_token_response`` to handle token endpoint
 @csrf_exempt
-def open_id_configuration(request: HttpRequest) -> JsonResponse:
-    """OpenID Configuration."""
+def open_id_configuration(request: HttpRequest) -> HttpResponse:
+    """OpenID Configuration (built once per host, see lok_server.discovery)."""
+    return discovery.serve("openid-configuration", _open_id_configuration, request)
+
+
+def _open_id_configuration(request: HttpRequest) -> dict:
     issuer = settings.OIDC_ISSUER
     # construct metadata
     metadata = {
@@ -85,8 +89,13 @@ def open_id_configuration(request: HttpRequest) -> JsonResponse:
             "client_secret_post",
         ],
         "grant_types_supported": ["authorization_code", "client_credentials", "refresh_token"],
+        "introspection_endpoint": request.build_absolute_uri(reverse("introspect")),
+        "introspection_endpoint_auth_methods_supported": [
+            "client_secret_basic",
+            "client_secret_post",
+        ],
     }
-    return JsonResponse(metadata)
+    return metadata
 
 
 @csrf_exempt
@@ -110,14 +119,70 @@ def issue_token(request: HttpRequest) -> HttpResponse | tuple:
     Returns:
         HttpResponse produced by the AuthorizationServer token handler.
     """
-    print(request)
-    print(request.POST)
     try:
         return server.create_token_response(request)
     except OAuth2Error as error:
         return server.handle_response(*error())
 
 
+def _authenticate_introspection_client(request: HttpRequest) -> None:
+    """Authenticate the client calling an introspection endpoint.
+
+    Only clients with the ``introspection`` scope may introspect: answers
+    carry the username, organization and roles behind any token.
+
+    Raises:
+        OAuth2Error: if the client credentials are missing or invalid, or the
+            client is not allowed to introspect.
+    """
+    client = server.authenticate_client(server.create_oauth2_request(request), ["client_secret_basic", "client_secret_post"], endpoint="introspection")
+    if not client.can_introspect():
+        raise UnauthorizedClientError(description="This client may not introspect tokens")
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def introspect(request: HttpRequest) -> HttpResponse:
+    """Token introspection endpoint (RFC 7662, POST only).
+
+    Clients with the ``introspection`` scope may introspect tokens,
+    authenticating like they do at the token endpoint. Unknown, expired and revoked tokens all
+    answer ``{"active": false}``. Answers come from
+    :mod:`authapp.introspection`, which caches the state of active tokens.
+    """
+    try:
+        _authenticate_introspection_client(request)
+    except OAuth2Error as error:
+        return server.handle_response(*error())
+
+    token = request.POST.get("token")
+    if not token:
+        return JsonResponse({"error": "invalid_request", "error_description": "Missing token"}, status=400)
+    return JsonResponse(introspect_tokens([token])[0])
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def introspect_batch(request: HttpRequest) -> HttpResponse:
+    """Introspect several tokens in one request.
+
+    Takes the ``token`` form field repeatedly (at most
+    ``AUTHAPP_INTROSPECTION_MAX_BATCH`` times) and answers
+    ``{"results": [...]}`` with one RFC 7662 response per token, in order.
+    """
+    try:
+        _authenticate_introspection_client(request)
+    except OAuth2Error as error:
+        return server.handle_response(*error())
+
+    tokens = request.POST.getlist("token")
+    if not tokens:
+        return JsonResponse({"error": "invalid_request", "error_description": "Missing token"}, status=400)
+    if len(tokens) > settings.AUTHAPP_INTROSPECTION_MAX_BATCH:
+        return JsonResponse({"error": "invalid_request", "error_description": f"At most {settings.AUTHAPP_INTROSPECTION_MAX_BATCH} tokens per request"}, status=400)
+    return JsonResponse({"results": introspect_tokens(tokens)})
+
+
 class CustomLoginView(LoginView):
     """Login view configured for the project's tailwind-based template.
 
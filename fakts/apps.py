@@ -7,3 +7,7 @@ class FaktsConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "fakts"
+
+    def ready(self):
+        # Register the claim-cache invalidation receivers.
+        from fakts import signals  # noqa: F401
@@ -201,6 +201,7 @@ class DeviceCodeChallengeRequest(BaseModel):
     contains the device code."""
 
     code: str
+    wait: float = Field(default=0, description="Seconds the server may hold the request open until the challenge resolves (long-poll). 0 answers immediately.")
 
 
 class ConfigurationRequest(BaseModel):
@@ -5,7 +5,7 @@ from kante.types import Info
 
 from fakts import enums, inputs, types
 from fakts.base_models import DevelopmentClientConfig, Manifest
-from fakts.services.clients import create_client
+from fakts.services.clients import create_client, fetch_logo
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +38,7 @@ def create_developmental_client(info: Info, input: inputs.DevelopmentClientInput
         user=info.context.request.user,
         organization=info.context.request.organization,
         composition=info.context.request.client.composition,
+        logo=fetch_logo(manifest),
     )
 
     return client
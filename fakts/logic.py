@@ -10,6 +10,7 @@ from the relevant ``fakts.services.*`` module in new code.
 from fakts.services.clients import (
     create_client,
     create_development_client,
+    fetch_logo,
     validate_redeem_token,
 )
 from fakts.services.compositions import (
@@ -27,6 +28,7 @@ from fakts.services.rendering import (
     create_linking_context,
     create_serverlinking_context,
     find_instance_for_requirement_and_composition,
+    find_instances_for_requirements,
     render_composition,
     render_server_fakts,
 )
@@ -46,7 +48,9 @@ __all__ = [
     "create_fake_linking_context",
     "create_linking_context",
     "create_serverlinking_context",
+    "fetch_logo",
     "find_instance_for_requirement_and_composition",
+    "find_instances_for_requirements",
     "hash_requirements",
     "render_composition",
     "render_server_fakts",
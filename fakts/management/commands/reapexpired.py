@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from fakts.services.reaper import EXPIRED, reap_expired
+
+
+class Command(BaseCommand):
+    help = "Deletes expired device codes, redeem tokens, authorization codes, OAuth2 tokens and invites in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows per delete batch (defaults to FAKTS_REAPER_BATCH_SIZE)")
+        parser.add_argument("--only", nargs="+", choices=sorted(EXPIRED), help="Only reap these kinds of rows")
+
+    def handle(self, *args, **options):
+        results = reap_expired(batch_size=options["batch_size"], only=options["only"])
+
+        for result in results:
+            self.stdout.write(f"{result.name}: deleted {result.deleted} in {result.batches} batches ({result.seconds:.3f}s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Reaped {sum(r.deleted for r in results)} expired rows"))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.6 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fakts', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='compositiondevicecode',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='devicecode',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='redeemtoken',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='servicedevicecode',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -341,7 +341,7 @@ class RedeemToken(models.Model):
     client = models.OneToOneField("Client", on_delete=models.CASCADE, related_name="redeemed_client", null=True)
     token = models.CharField(max_length=1000, unique=True, default=uuid.uuid4)
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(null=True)
+    expires_at = models.DateTimeField(null=True, db_index=True)
     manifest_hash = models.CharField(
         max_length=64,
         null=True,
@@ -414,7 +414,7 @@ class DeviceCode(models.Model):
     staging_logo = models.CharField(max_length=1000, null=True)
     staging_public = models.BooleanField(default=False)
     staging_redirect_uris = models.JSONField(default=list)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     denied = models.BooleanField(default=False)
     supported_layers = models.ManyToManyField(Layer, related_name="staging_device_codes")
 
@@ -431,7 +431,7 @@ class ServiceDeviceCode(models.Model):
     instance = models.ForeignKey(ServiceInstance, on_delete=models.CASCADE, null=True)
     staging_manifest = models.JSONField(default=dict)
     staging_aliases = models.JSONField(default=list)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     denied = models.BooleanField(default=False)
 
     @property
@@ -450,7 +450,7 @@ class CompositionDeviceCode(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, null=True)
     composition = models.ForeignKey(Composition, on_delete=models.CASCADE, null=True)
     manifest = models.JSONField(default=dict)
-    expires_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
     denied = models.BooleanField(default=False)
 
     @property
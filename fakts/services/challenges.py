@@ -0,0 +1,79 @@
+"""Long-poll wake-ups for the device-code challenge endpoints.
+
+Apps waiting on a device code may ask the challenge endpoints to hold the
+request open (``DeviceCodeChallengeRequest.wait``) instead of re-polling. The
+waiting request subscribes to a channel-layer group per device code; the
+accept/decline mutations publish to that group once their transaction has
+committed, which wakes the waiter so it can re-read the code and answer.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Literal
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+ChallengeKind = Literal["client", "service", "composition"]
+
+
+def challenge_group(kind: ChallengeKind, device_code_id) -> str:
+    """Channel-layer group that waiters on a device code subscribe to."""
+    return f"fakts_challenge_{kind}_{device_code_id}"
+
+
+def notify_challenge(kind: ChallengeKind, device_code_id) -> None:
+    """Wake every long-poll waiting on this device code once the transaction commits."""
+    layer = get_channel_layer()
+    if layer is None:
+        return
+
+    group = challenge_group(kind, device_code_id)
+
+    def _send() -> None:
+        try:
+            async_to_sync(layer.group_send)(group, {"type": "challenge.resolved"})
+        except Exception:
+            # waiters fall back to their timeout, so a lost wake-up only costs latency
+            logger.exception("Could not notify challenge waiters on %s", group)
+
+    transaction.on_commit(_send)
+
+
+@asynccontextmanager
+async def subscribe_challenge(kind: ChallengeKind, device_code_id) -> AsyncIterator[Callable[[float], Awaitable[bool]]]:
+    """Subscribe to wake-ups for a device code.
+
+    Yields a ``wait(timeout)`` coroutine function that returns True when a
+    notification arrived and False on timeout. Subscribe *before* re-reading the
+    device code, so a resolution that lands in between is not missed.
+    """
+    layer = get_channel_layer()
+
+    if layer is None:
+
+        async def _no_wait(timeout: float) -> bool:
+            return False
+
+        yield _no_wait
+        return
+
+    group = challenge_group(kind, device_code_id)
+    channel = await layer.new_channel()
+    await layer.group_add(group, channel)
+
+    async def _wait(timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(layer.receive(channel), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    try:
+        yield _wait
+    finally:
+        await layer.group_discard(group, channel)
@@ -0,0 +1,99 @@
+"""Cache of rendered claim answers for the ``/f/claim/`` endpoint.
+
+A claim answer only depends on the client (and its oauth2 client, scopes,
+mappings, instances and aliases) plus the request-derived part of the linking
+context. We therefore cache the rendered answer per client token, in one cache
+entry holding a ``{context_key: answer}`` dict so that a single ``delete``
+drops every host/port/scheme variant of a client's claim.
+
+Entries are invalidated by the model signals in :mod:`fakts.signals` once the
+surrounding transaction commits, and otherwise expire after
+``settings.FAKTS_CLAIM_CACHE_TTL`` seconds (``0`` disables the cache).
+Invalidations only reach every process through a shared cache
+(``FAKTS_SHARED_CACHE``, the redis backend); with per-process locmem entries
+expire after at most ``LOCAL_TTL`` seconds, so other workers stop serving a
+changed or deleted client's claim (and its old secret) within that bound.
+"""
+
+import hashlib
+from typing import Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from fakts import base_models
+from fakts.services import single_flight
+
+LOCAL_TTL = 5
+
+
+def _ttl() -> int:
+    ttl = getattr(settings, "FAKTS_CLAIM_CACHE_TTL", 0)
+    return ttl if getattr(settings, "FAKTS_SHARED_CACHE", False) else min(ttl, LOCAL_TTL)
+
+
+def claim_cache_key(token: str) -> str:
+    """Cache key for a client token (hashed, so plaintext tokens never reach the cache)."""
+    return "fakts:claim:" + hashlib.sha256(str(token).encode()).hexdigest()
+
+
+def context_key(linking_request: base_models.LinkingRequest, claim: base_models.ClaimRequest) -> str:
+    """The request-derived parts of a ``LinkingContext`` that change a claim answer."""
+    return f"{linking_request.host}|{linking_request.port}|{linking_request.base_url}|{linking_request.is_secure}|{claim.secure}"
+
+
+def get_claim(token: str, ctx_key: str) -> dict | None:
+    """Return the cached claim answer for ``token`` in ``ctx_key``, or None on a miss."""
+    if _ttl() <= 0:
+        return None
+
+    entry = cache.get(claim_cache_key(token))
+    if not entry:
+        return None
+    return entry.get(ctx_key)
+
+
+def set_claim(token: str, ctx_key: str, answer: dict) -> None:
+    """Store a rendered claim answer for ``token`` in ``ctx_key``."""
+    ttl = _ttl()
+    if ttl <= 0:
+        return
+
+    key = claim_cache_key(token)
+    entry = cache.get(key) or {}
+    entry[ctx_key] = answer
+    cache.set(key, entry, ttl)
+
+
+async def aget_claim(token: str, ctx_key: str) -> dict | None:
+    """Async :func:`get_claim`.
+
+    Cache lookups never touch the database, so they run off the thread-sensitive
+    executor and concurrent cache hits don't queue behind ORM work.
+    """
+    return await sync_to_async(get_claim, thread_sensitive=False)(token, ctx_key)
+
+
+async def aset_claim(token: str, ctx_key: str, answer: dict) -> None:
+    """Async :func:`set_claim`."""
+    await sync_to_async(set_claim, thread_sensitive=False)(token, ctx_key, answer)
+
+
+def invalidate_tokens(tokens: Iterable[str]) -> None:
+    """Drop the cached claims of ``tokens`` once the current transaction commits.
+
+    Claims published to other processes by :mod:`fakts.services.single_flight`
+    are dropped as well. Deferring to ``on_commit`` keeps a concurrent claim
+    from re-populating the cache with the pre-commit state.
+    """
+    tokens = [token for token in tokens if token]
+    if not tokens:
+        return
+
+    def _drop():
+        cache.delete_many([claim_cache_key(token) for token in tokens])
+        single_flight.invalidate_tokens("claim", tokens)
+
+    transaction.on_commit(_drop)
@@ -9,6 +9,7 @@ the historical ``logic`` <-> ``builders`` import cycle.
 import hashlib
 import json
 
+from asgiref.sync import sync_to_async
 from django.db import transaction
 from django.utils import timezone
 
@@ -30,6 +31,11 @@ class RedeemTokenManifestChanged(Exception):
     manifest while ``allow_reredeem`` is not set."""
 
 
+# ``logo`` argument for "the logo was not fetched": the stored logos are left
+# as they are (``None`` means the manifest has no logo).
+_NOT_FETCHED = object()
+
+
 def hash_manifest(manifest: Manifest) -> str:
     """Return a stable SHA-256 hash of a manifest for change detection."""
     return hashlib.sha256(
@@ -93,7 +99,23 @@ def create_development_client(
         )
 
 
-@transaction.atomic
+def fetch_logo(manifest: base_models.Manifest) -> karakter_models.MediaStore | None:
+    """Download the manifest's logo and upload it to the media bucket.
+
+    This is network I/O and must run *before* the transaction that writes the
+    client, so a slow logo host doesn't hold a database connection or row locks.
+    """
+    from fakts.utils import download_logo
+
+    if not manifest.logo:
+        return None
+
+    try:
+        return download_logo(manifest.logo)
+    except Exception as e:
+        raise ValueError(f"Could not download logo {e}")
+
+
 def create_client(
     manifest: base_models.Manifest,
     config: base_models.ClientConfig,
@@ -101,28 +123,39 @@ def create_client(
     organization: models.Organization,
     composition: models.Composition | None = None,
     declined_requirements: list[str] | None = None,
+    logo: karakter_models.MediaStore | None | object = _NOT_FETCHED,
 ) -> models.Client:
-    from fakts.utils import download_logo
+    """Create (or update) a client for ``manifest`` in one short transaction.
+
+    This never downloads anything: callers fetch the logo beforehand with
+    :func:`fetch_logo` (outside of any transaction) and pass it as ``logo``.
+    Without it the app's and release's stored logos are left untouched.
+    """
+    return _store_client(manifest, config, user, organization, composition=composition, declined_requirements=declined_requirements, logo=logo)
 
-    try:
-        logo = download_logo(manifest.logo) if manifest.logo else None
-    except Exception as e:
-        raise ValueError(f"Could not download logo {e}")
 
+@transaction.atomic
+def _store_client(
+    manifest: base_models.Manifest,
+    config: base_models.ClientConfig,
+    user: models.AbstractUser,
+    organization: models.Organization,
+    composition: models.Composition | None,
+    declined_requirements: list[str] | None,
+    logo: karakter_models.MediaStore | None | object,
+) -> models.Client:
     app, _ = models.App.objects.get_or_create(identifier=manifest.identifier)
-    if logo:
+    if logo is not _NOT_FETCHED and logo:
         app.logo = logo
         app.save()
 
-    release, _ = models.Release.objects.update_or_create(
-        app=app,
-        version=manifest.version,
-        defaults={
-            "logo": logo,
-            "scopes": manifest.scopes,
-            "requirements": manifest.model_dump()["requirements"],
-        },
-    )
+    defaults = {
+        "scopes": manifest.scopes,
+        "requirements": manifest.model_dump()["requirements"],
+    }
+    if logo is not _NOT_FETCHED:
+        defaults["logo"] = logo
+    release, _ = models.Release.objects.update_or_create(app=app, version=manifest.version, defaults=defaults)
 
     if manifest.node_id:
         node = models.Device.objects.get_or_create(organization=organization, node_id=hash_device_id(manifest.node_id, organization))[0]
@@ -143,7 +176,7 @@ def create_client(
 
 
 @transaction.atomic
-def validate_redeem_token(redeem_token: models.RedeemToken, manifest: Manifest, role: enums.ClientRoleVanilla = enums.ClientRoleVanilla.INTERFACE) -> models.RedeemToken:
+def validate_redeem_token(redeem_token: models.RedeemToken, manifest: Manifest, role: enums.ClientRoleVanilla = enums.ClientRoleVanilla.INTERFACE, logo: karakter_models.MediaStore | None | object = _NOT_FETCHED) -> models.RedeemToken:
     node_id = manifest.node_id
     composition = redeem_token.composition
     organization = redeem_token.composition.organization
@@ -183,6 +216,7 @@ def validate_redeem_token(redeem_token: models.RedeemToken, manifest: Manifest,
             user=user,
             organization=organization,
             composition=composition,
+            logo=logo,
         )
 
     redeem_token.client = client
@@ -190,12 +224,31 @@ def validate_redeem_token(redeem_token: models.RedeemToken, manifest: Manifest,
     return redeem_token
 
 
+def _redeem_may_create_client(token: str, manifest: Manifest) -> bool:
+    """Unlocked pre-check: False when the redeem will certainly return the existing client.
+
+    The locked transaction re-checks everything; this only decides whether the
+    logo is worth fetching up front.
+    """
+    valid_token = models.RedeemToken.objects.filter(token=token).values("client_id", "manifest_hash", "expires_at").first()
+    if valid_token is None or (valid_token["expires_at"] and valid_token["expires_at"] < timezone.now()):
+        return False
+    if valid_token["client_id"] and valid_token["manifest_hash"] in (None, hash_manifest(manifest)):
+        return False
+    return bool(manifest.logo)
+
+
 def redeem_token(token: str, manifest: Manifest, role: enums.ClientRoleVanilla = enums.ClientRoleVanilla.INTERFACE) -> models.Client:
     """Redeem a token into a client.
 
     Raises ``RedeemToken.DoesNotExist`` for an unknown token and
     :class:`RedeemTokenExpired` for an expired one (which is deleted).
+
+    The logo a new client needs is fetched before the token row is locked; the
+    locked transaction then only writes database state.
     """
+    logo = fetch_logo(manifest) if _redeem_may_create_client(token, manifest) else _NOT_FETCHED
+
     with transaction.atomic():
         # Lock the token row so simultaneous redeems of the same token serialize
         # instead of racing to create duplicate clients.
@@ -220,7 +273,7 @@ def redeem_token(token: str, manifest: Manifest, role: enums.ClientRoleVanilla =
                     )
                 # allow_reredeem is set and the manifest changed: re-validate to update the client.
 
-            valid_token = validate_redeem_token(redeem_token=valid_token, manifest=manifest, role=role)
+            valid_token = validate_redeem_token(redeem_token=valid_token, manifest=manifest, role=role, logo=logo)
             valid_token.manifest_hash = incoming_hash
             valid_token.save()
             return valid_token.client
@@ -232,12 +285,22 @@ def redeem_token(token: str, manifest: Manifest, role: enums.ClientRoleVanilla =
     raise RedeemTokenExpired("Redeem token expired")
 
 
+async def aredeem_token(token: str, manifest: Manifest, role: enums.ClientRoleVanilla = enums.ClientRoleVanilla.INTERFACE) -> models.Client:
+    """Async :func:`redeem_token`.
+
+    Redeeming holds a row lock inside a transaction, which the async ORM cannot
+    express, so the sync implementation runs on the ORM thread.
+    """
+    return await sync_to_async(redeem_token)(token, manifest, role=role)
+
+
 @transaction.atomic
 def report_client(claim: base_models.ReportRequest) -> models.Client:
     """Record a client's self-report (functional flag + per-requirement alias reports)."""
     client = models.Client.objects.get(token=claim.token)
     client.functional = claim.functional
-    client.save()
+    # restricted save: reports never change the client's claim answer
+    client.save(update_fields=["functional", "last_reported_at"])
 
     for req_key, alias_report in claim.alias_reports.items():
         alias = models.InstanceAlias.objects.get(id=alias_report.alias_id) if alias_report.alias_id else None
@@ -254,3 +317,8 @@ def report_client(claim: base_models.ReportRequest) -> models.Client:
         )
 
     return client
+
+
+async def areport_client(claim: base_models.ReportRequest) -> models.Client:
+    """Async :func:`report_client` (transactional, so it runs on the ORM thread)."""
+    return await sync_to_async(report_client)(claim)
@@ -3,15 +3,18 @@
 import datetime
 import logging
 
+from asgiref.sync import sync_to_async
 from django.db import transaction
 from django.utils import timezone
 
 from fakts import base_models, enums, models
-from fakts.services.clients import create_client
+from fakts.services.challenges import notify_challenge
+from fakts.services.clients import _NOT_FETCHED, create_client, fetch_logo
 from fakts.services.rendering import auto_compose
 from fakts.services.tokens import create_api_token, create_device_code
 from fakts.utils import download_logo
 from karakter.hashers import hash_device_id
+from karakter.models import MediaStore
 
 logger = logging.getLogger(__name__)
 
@@ -82,13 +85,66 @@ def start_composition_device_code(start_grant: base_models.CompositionStartReque
     )
 
 
-@transaction.atomic
+async def astart_device_code(start_grant: base_models.DeviceCodeStartRequest) -> models.DeviceCode:
+    """Async :func:`start_device_code` (the logo download is blocking I/O)."""
+    return await sync_to_async(start_device_code)(start_grant)
+
+
+async def astart_service_device_code(start_grant: base_models.ServiceDeviceCodeStartRequest) -> models.ServiceDeviceCode:
+    """Async :func:`start_service_device_code`."""
+    return await sync_to_async(start_service_device_code)(start_grant)
+
+
+async def astart_composition_device_code(start_grant: base_models.CompositionStartRequest) -> models.CompositionDeviceCode:
+    """Async :func:`start_composition_device_code`."""
+    return await sync_to_async(start_composition_device_code)(start_grant)
+
+
+def _existing_clients(device_code: models.DeviceCode, user: models.AbstractUser, organization: models.Organization, composition: models.Composition):
+    return models.Client.objects.filter(
+        release__app__identifier=device_code.staging_manifest["identifier"],
+        release__version=device_code.staging_manifest["version"],
+        kind=device_code.staging_kind,
+        tenant=user,
+        organization=organization,
+        composition=composition,
+        redirect_uris=(" ".join(device_code.staging_redirect_uris),),
+    )
+
+
 def validate_device_code(
     device_code: models.DeviceCode,
     user: models.AbstractUser,
     organization: models.Organization,
     composition: models.Composition,
     declined_requirements: list[str] | None = None,
+) -> models.DeviceCode:
+    """Accept a device code: create (or re-compose) its client and attach it.
+
+    A logo for a new client is fetched before the transaction that writes it.
+    """
+    manifest = device_code.manifest_as_model
+
+    if manifest.node_id:
+        node_filter = {"node__organization": organization, "node__node_id": hash_device_id(manifest.node_id, organization)}
+    else:
+        node_filter = {"node__isnull": True}
+
+    logo = _NOT_FETCHED
+    if not _existing_clients(device_code, user, organization, composition).filter(**node_filter).exists():
+        logo = fetch_logo(manifest)
+
+    return _validate_device_code(device_code, user, organization, composition, declined_requirements=declined_requirements, logo=logo)
+
+
+@transaction.atomic
+def _validate_device_code(
+    device_code: models.DeviceCode,
+    user: models.AbstractUser,
+    organization: models.Organization,
+    composition: models.Composition,
+    declined_requirements: list[str] | None,
+    logo: MediaStore | None | object,
 ) -> models.DeviceCode:
     manifest = device_code.manifest_as_model
 
@@ -98,18 +154,7 @@ def validate_device_code(
     else:
         node = None
 
-    redirect_uris = (" ".join(device_code.staging_redirect_uris),)
-
-    client = models.Client.objects.filter(
-        release__app__identifier=device_code.staging_manifest["identifier"],
-        release__version=device_code.staging_manifest["version"],
-        kind=device_code.staging_kind,
-        node=node,
-        tenant=user,
-        organization=organization,
-        composition=composition,
-        redirect_uris=redirect_uris,
-    ).first()
+    client = _existing_clients(device_code, user, organization, composition).filter(node=node).first()
 
     if not client:
         token = create_api_token()
@@ -136,6 +181,7 @@ def validate_device_code(
             organization=organization,
             composition=composition,
             declined_requirements=declined_requirements,
+            logo=logo,
         )
 
     else:
@@ -143,4 +189,5 @@ def validate_device_code(
 
     device_code.client = client
     device_code.save()
+    notify_challenge("client", device_code.pk)
     return device_code
@@ -0,0 +1,104 @@
+"""Poll pacing for the device-code challenge endpoints (RFC 8628 style).
+
+Pending challenge answers carry an ``interval``: the number of seconds a client
+should wait before polling again. It grows with the number of pending device
+codes of that kind (``FAKTS_DEVICE_CODE_POLL_INTERVAL`` per
+``FAKTS_DEVICE_CODE_BUSY_THRESHOLD`` pending codes, capped at
+``FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX``), so mass onboarding spreads its
+polling out.
+
+Every poll of a code is accounted in the Django cache, never in the database.
+A code polled well before its interval is up (counted from the last poll that
+was actually served) earns a strike; once it has more than
+``EARLY_POLLS_ALLOWED`` strikes in a row it is answered ``slow_down`` without a
+database lookup, and its own interval grows by ``SLOW_DOWN_STEP`` for the rest
+of its life (as RFC 8628 asks of clients). The first poll an interval after the
+last served one is always served, so at least one poll per interval reaches
+the database. Slowed-down answers keep ``status: pending`` so clients that
+don't know ``slow_down`` simply keep polling and still get their answer.
+"""
+
+import hashlib
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+SLOW_DOWN_STEP = 5
+# A poll counts as early before this share of the interval has passed (jitter).
+EARLY_FRACTION = 0.8
+EARLY_POLLS_ALLOWED = 1
+# How long the pending-code count behind the interval is reused.
+LOAD_TTL = 10
+
+
+@dataclass
+class Pace:
+    """The answer to one poll: the interval to advertise and whether to shed it."""
+
+    interval: int
+    slow_down: bool = False
+
+
+def _poll_key(kind: str, code: str) -> str:
+    return f"fakts:poll:{kind}:" + hashlib.sha256(str(code).encode()).hexdigest()
+
+
+def _load_key(kind: str) -> str:
+    return f"fakts:poll:pending:{kind}"
+
+
+def interval_for(pending: int) -> int:
+    """The poll interval while ``pending`` device codes of a kind await an answer."""
+    base = settings.FAKTS_DEVICE_CODE_POLL_INTERVAL
+    return min(base * (1 + pending // max(settings.FAKTS_DEVICE_CODE_BUSY_THRESHOLD, 1)), settings.FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX)
+
+
+def count_pending(queryset, result_attr: str) -> int:
+    """Pending (unexpired, unanswered) device codes of ``queryset``'s model."""
+    return queryset.model.objects.filter(expires_at__gt=timezone.now(), denied=False, **{f"{result_attr}__isnull": True}).count()
+
+
+def current_interval(kind: str, queryset, result_attr: str) -> int:
+    pending = cache.get(_load_key(kind))
+    if pending is None:
+        pending = count_pending(queryset, result_attr)
+        cache.set(_load_key(kind), pending, LOAD_TTL)
+    return interval_for(pending)
+
+
+async def acurrent_interval(kind: str, queryset, result_attr: str) -> int:
+    """Async :func:`current_interval`; only the occasional count runs on the ORM thread."""
+    pending = await sync_to_async(cache.get, thread_sensitive=False)(_load_key(kind))
+    if pending is None:
+        pending = await sync_to_async(count_pending)(queryset, result_attr)
+        await sync_to_async(cache.set, thread_sensitive=False)(_load_key(kind), pending, LOAD_TTL)
+    return interval_for(pending)
+
+
+def record_poll(kind: str, code: str, interval: int) -> Pace:
+    """Account a poll of ``code`` and decide whether it is answered ``slow_down``."""
+    key = _poll_key(kind, code)
+    now = time.time()
+    entry = cache.get(key) or {"served": 0.0, "interval": 0, "strikes": 0}
+    interval = max(interval, entry["interval"])
+
+    # early is measured from the last served poll, so shed polls never push it back
+    early = now - entry["served"] < interval * EARLY_FRACTION
+    strikes = entry["strikes"] + 1 if early else 0
+    slow_down = strikes > EARLY_POLLS_ALLOWED
+    if strikes == EARLY_POLLS_ALLOWED + 1:
+        # grow once per interval, not once per shed poll
+        interval = min(interval + SLOW_DOWN_STEP, settings.FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX)
+
+    served = entry["served"] if slow_down else now
+    # outlives any poll interval, but expires with abandoned codes
+    cache.set(key, {"served": served, "interval": interval, "strikes": strikes}, max(settings.FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX * 4, 600))
+    return Pace(interval=interval, slow_down=slow_down)
+
+
+async def arecord_poll(kind: str, code: str, interval: int) -> Pace:
+    return await sync_to_async(record_poll, thread_sensitive=False)(kind, code, interval)
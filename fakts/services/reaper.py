@@ -0,0 +1,119 @@
+"""Deletion of expired short-lived rows.
+
+Device codes, redeem tokens, authorization codes, OAuth2 tokens, revoked
+access-token entries and unaccepted invites are only useful until they expire, but
+nothing on the request path reliably removes them. :func:`reap_expired` deletes them in bounded batches (each batch
+in its own short transaction, so no long locks are held) and reports per model
+how many rows went and how long it took.
+
+It runs from the ``reapexpired`` management command or, with
+``FAKTS_REAPER_INTERVAL > 0``, periodically from a daemon thread started by the
+ASGI application (:func:`start_reaper`).
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+
+from authapp.models import AUTHORIZATION_CODE_LIFETIME, REFRESH_TOKEN_LIFETIME, AuthorizationCode, OAuth2Token, RevokedAccessToken, now_timestamp
+from fakts import models
+from karakter.models import Invite
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReapResult:
+    """What one reaper pass did for one model."""
+
+    name: str
+    deleted: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+
+
+def _expired_oauth2_tokens() -> QuerySet:
+    now = now_timestamp()
+    # revoked, or both the access token and its refresh token have expired
+    return OAuth2Token.objects.filter(Q(revoked=True) | (Q(issued_at__lt=now - REFRESH_TOKEN_LIFETIME) & Q(issued_at__lt=now - F("expires_in"))))
+
+
+# name -> queryset of rows that can go (evaluated lazily, at reap time)
+EXPIRED: dict[str, Callable[[], QuerySet]] = {
+    "device_codes": lambda: models.DeviceCode.objects.filter(expires_at__lt=timezone.now()),
+    "service_device_codes": lambda: models.ServiceDeviceCode.objects.filter(expires_at__lt=timezone.now()),
+    "composition_device_codes": lambda: models.CompositionDeviceCode.objects.filter(expires_at__lt=timezone.now()),
+    "redeem_tokens": lambda: models.RedeemToken.objects.filter(expires_at__lt=timezone.now()),
+    "authorization_codes": lambda: AuthorizationCode.objects.filter(auth_time__lt=now_timestamp() - AUTHORIZATION_CODE_LIFETIME),
+    "oauth2_tokens": _expired_oauth2_tokens,
+    "revoked_access_tokens": lambda: RevokedAccessToken.objects.filter(expires_at__lt=now_timestamp()),
+    # accepted invites stay: they are the provenance of memberships (Membership.created_through)
+    "invites": lambda: Invite.objects.filter(expires_at__lt=timezone.now()).exclude(status=Invite.Status.ACCEPTED),
+}
+
+
+def reap(name: str, expired: QuerySet, batch_size: int) -> ReapResult:
+    """Delete ``expired`` in batches of at most ``batch_size`` rows."""
+    result = ReapResult(name=name)
+    started = time.monotonic()
+
+    while True:
+        pks = list(expired.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic():
+            _, per_model = expired.model.objects.filter(pk__in=pks).delete()
+        result.deleted += per_model.get(expired.model._meta.label, 0)
+        result.batches += 1
+        if len(pks) < batch_size:
+            break
+
+    result.seconds = time.monotonic() - started
+    return result
+
+
+def reap_expired(batch_size: Optional[int] = None, only: Optional[list[str]] = None) -> list[ReapResult]:
+    """Run one reaper pass over every model in :data:`EXPIRED` (or just ``only``)."""
+    batch_size = batch_size or settings.FAKTS_REAPER_BATCH_SIZE
+    results = []
+
+    for name, expired in EXPIRED.items():
+        if only and name not in only:
+            continue
+        result = reap(name, expired(), batch_size)
+        logger.info("Reaped %d expired %s in %d batches (%.3fs)", result.deleted, result.name, result.batches, result.seconds)
+        results.append(result)
+
+    return results
+
+
+_thread: Optional[threading.Thread] = None
+
+
+def _run(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            reap_expired()
+        except Exception:
+            logger.exception("Reaping expired rows failed")
+        finally:
+            close_old_connections()
+
+
+def start_reaper() -> None:
+    """Start the periodic in-process reaper if ``FAKTS_REAPER_INTERVAL`` is set."""
+    global _thread
+    interval = settings.FAKTS_REAPER_INTERVAL
+    if interval <= 0 or (_thread and _thread.is_alive()):
+        return
+
+    _thread = threading.Thread(target=_run, args=(interval,), name="fakts-reaper", daemon=True)
+    _thread.start()
@@ -9,6 +9,7 @@ from typing import Dict
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch
 from django.http import HttpRequest
 
 from fakts import base_models, errors, models
@@ -23,9 +24,32 @@ from fakts.base_models import (
     InstanceClaim,
     SelfClaim,
 )
+from fakts.services import claim_cache
 from fakts.services.tokens import hash_requirements
 
 
+def claim_client_queryset():
+    """Clients with the whole claim graph loaded in a fixed number of queries.
+
+    One query for the client (joined with its oauth2 client, release and app),
+    one for its scopes, one for its mappings (joined with instance, release and
+    service) and one for the aliases of those instances — independent of how
+    many requirements the manifest maps.
+    """
+    return models.Client.objects.select_related("oauth2_client", "release__app").prefetch_related(
+        "scopes",
+        Prefetch(
+            "mappings",
+            queryset=models.ServiceInstanceMapping.objects.select_related("instance__release__service").prefetch_related("instance__aliases"),
+        ),
+    )
+
+
+def composition_claim_queryset():
+    """Compositions with their auth key, instances and clients preloaded (three queries)."""
+    return models.Composition.objects.select_related("auth_key").prefetch_related("instances", "clients")
+
+
 def render_server_fakts(composition: models.Composition, context: base_models.LinkingContext) -> CompositionClaimAnswer:
     self_claim = SelfClaim(
         deployment_name=context.deployment_name,
@@ -72,7 +96,7 @@ def render_composition(client: models.Client, context: base_models.LinkingContex
     auth_claim = AuthClaim(
         client_id=client.oauth2_client.client_id,
         client_secret=client.oauth2_client.client_secret,
-        scopes=client.scopes.values_list("identifier", flat=True),
+        scopes=[scope.identifier for scope in client.scopes.all()],
         client_token=client.token,
         report_url=f"{context.request.base_url}/f/report/",
         token_url=f"{context.request.base_url}/o/token/",
@@ -96,24 +120,46 @@ def render_composition(client: models.Client, context: base_models.LinkingContex
     return claim.model_dump()
 
 
-def find_instance_for_requirement_and_composition(requirement: base_models.Requirement, user: models.AbstractUser, composition: models.Composition) -> models.ServiceInstance | None:
-    instance = (
-        models.ServiceInstance.objects.filter(
-            release__service__identifier=requirement.service,
-            composition=composition,
-        )
-        .filter(
-            models.Q(allowed_users__isnull=True)
-            | models.Q(allowed_users=user) & (models.Q(denied_users__isnull=True) | ~models.Q(denied_users=user)) & (models.Q(allowed_groups__isnull=True) | models.Q(allowed_groups__in=user.groups.all())) & (models.Q(denied_groups__isnull=True) | ~models.Q(denied_groups__in=user.groups.all()))
-        )
-        .first()
+def _instances_available_to(user: models.AbstractUser, composition: models.Composition, services: list[str]):
+    return models.ServiceInstance.objects.filter(
+        release__service__identifier__in=services,
+        composition=composition,
+    ).filter(
+        models.Q(allowed_users__isnull=True)
+        | models.Q(allowed_users=user) & (models.Q(denied_users__isnull=True) | ~models.Q(denied_users=user)) & (models.Q(allowed_groups__isnull=True) | models.Q(allowed_groups__in=user.groups.all())) & (models.Q(denied_groups__isnull=True) | ~models.Q(denied_groups__in=user.groups.all()))
     )
 
-    return instance
+
+def find_instance_for_requirement_and_composition(requirement: base_models.Requirement, user: models.AbstractUser, composition: models.Composition) -> models.ServiceInstance | None:
+    return _instances_available_to(user, composition, [requirement.service]).first()
+
+
+def find_instances_for_requirements(requirements: list[base_models.Requirement], user: models.AbstractUser, composition: models.Composition) -> dict[str, models.ServiceInstance | None]:
+    """Resolve every requirement of a manifest in a single query.
+
+    Returns the winning instance per requirement key (None if there is none),
+    picking the same instance :func:`find_instance_for_requirement_and_composition`
+    would: the lowest-pk instance of the required service available to ``user``.
+    """
+    if not requirements:
+        return {}
+
+    services = sorted({req.service for req in requirements})
+    winners: dict[str, models.ServiceInstance] = {}
+    for instance in _instances_available_to(user, composition, services).select_related("release__service").order_by("pk"):
+        # the m2m joins can repeat an instance; the first row per service wins
+        winners.setdefault(instance.release.service.identifier, instance)
+
+    return {req.key: winners.get(req.service) for req in requirements}
 
 
 @transaction.atomic
 def auto_compose(client: models.Client, manifest: base_models.Manifest, user: models.AbstractUser, organization: models.Organization, device: models.Device | None = None, declined_requirements: list[str] | None = None) -> models.Client:
+    """Map the manifest's requirements onto instances of the client's composition.
+
+    Only the difference to the client's current mappings is written, with bulk
+    operations; a re-redeem that resolves to the same instances writes nothing.
+    """
     requirements = manifest.requirements
 
     if not requirements:
@@ -121,42 +167,56 @@ def auto_compose(client: models.Client, manifest: base_models.Manifest, user: mo
 
     declined = set(declined_requirements or [])
     statuses: dict[str, str] = {}
+    desired: dict[str, models.ServiceInstance] = {}
 
-    for old_mapping in client.mappings.all():
-        old_mapping.delete()
+    resolved = find_instances_for_requirements([req for req in requirements if not (req.optional and req.key in declined)], user, client.composition)
 
     for req in requirements:
         if req.optional and req.key in declined:
             statuses[req.key] = "denied"
             continue
 
-        try:
-            instance = find_instance_for_requirement_and_composition(req, user, composition=client.composition)
-
-            if instance is None:
-                raise errors.InstanceNotFound(f"No instance for {req.service} in this composition.")
-
-            models.ServiceInstanceMapping.objects.get_or_create(
-                client=client,
-                instance=instance,
-                key=req.key,
-            )
-            statuses[req.key] = "granted"
-
-        except Exception as e:
+        instance = resolved[req.key]
+        if instance is None:
             if req.optional:
                 statuses[req.key] = "unavailable"
-            else:
-                raise Exception(f"Unable to find instance for requirement {req.service}") from e
-
-    client.requirements_hash = hash_requirements(requirements)
-    client.statuses = statuses
-    client.save()
+                continue
+            raise Exception(f"Unable to find instance for requirement {req.service}") from errors.InstanceNotFound(f"No instance for {req.service} in this composition.")
+
+        desired[req.key] = instance
+        statuses[req.key] = "granted"
+
+    existing = {mapping.key: mapping for mapping in client.mappings.all()}
+
+    stale = [mapping.pk for key, mapping in existing.items() if key not in desired]
+    moved = []
+    for key, mapping in existing.items():
+        if key in desired and mapping.instance_id != desired[key].pk:
+            mapping.instance = desired[key]
+            moved.append(mapping)
+    added = [models.ServiceInstanceMapping(client=client, instance=instance, key=key) for key, instance in desired.items() if key not in existing]
+
+    if stale:
+        models.ServiceInstanceMapping.objects.filter(pk__in=stale).delete()
+    if moved:
+        models.ServiceInstanceMapping.objects.bulk_update(moved, ["instance"])
+    if added:
+        models.ServiceInstanceMapping.objects.bulk_create(added)
+    if moved or added:
+        # bulk_update/bulk_create bypass the model signals that drop cached claims
+        claim_cache.invalidate_tokens([client.token])
+
+    requirements_hash = hash_requirements(requirements)
+    if client.requirements_hash != requirements_hash or client.statuses != statuses:
+        client.requirements_hash = requirements_hash
+        client.statuses = statuses
+        client.save(update_fields=["requirements_hash", "statuses"])
 
     return client
 
 
-def create_linking_context(request: HttpRequest, client: models.Client, claim: base_models.ClaimRequest) -> base_models.LinkingContext:
+def create_linking_request(request: HttpRequest) -> base_models.LinkingRequest:
+    """The request-derived part of a linking context (host, port, base url, scheme)."""
     host_string = request.get_host().split(":")
     if len(host_string) == 2:
         host = host_string[0]
@@ -167,13 +227,17 @@ def create_linking_context(request: HttpRequest, client: models.Client, claim: b
 
     base_url = request.build_absolute_uri("/") + settings.MY_SCRIPT_NAME
 
+    return base_models.LinkingRequest(
+        host=host,
+        port=port,
+        base_url=base_url,
+        is_secure=request.is_secure(),
+    )
+
+
+def create_linking_context(request: HttpRequest, client: models.Client, claim: base_models.ClaimRequest, linking_request: base_models.LinkingRequest | None = None) -> base_models.LinkingContext:
     return base_models.LinkingContext(
-        request=base_models.LinkingRequest(
-            host=host,
-            port=port,
-            base_url=base_url,
-            is_secure=request.is_secure(),
-        ),
+        request=linking_request or create_linking_request(request),
         secure=claim.secure,
         manifest=base_models.Manifest(
             identifier=client.release.app.identifier,
@@ -192,23 +256,8 @@ def create_linking_context(request: HttpRequest, client: models.Client, claim: b
 
 
 def create_serverlinking_context(request: HttpRequest, composition: models.Composition, claim: base_models.ServerClaimRequest) -> base_models.LinkingContext:
-    host_string = request.get_host().split(":")
-    if len(host_string) == 2:
-        host = host_string[0]
-        port = host_string[1]
-    else:
-        host = host_string[0]
-        port = None
-
-    base_url = request.build_absolute_uri("/") + settings.MY_SCRIPT_NAME
-
     return base_models.ServerLinkingContext(
-        request=base_models.LinkingRequest(
-            host=host,
-            port=port,
-            base_url=base_url,
-            is_secure=request.is_secure(),
-        ),
+        request=create_linking_request(request),
     )
 
 
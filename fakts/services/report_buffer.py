@@ -0,0 +1,199 @@
+"""Buffered ingestion for the ``/f/report/`` endpoint.
+
+With ``FAKTS_REPORT_INGESTION = "buffered"`` the report view acknowledges a
+report without touching the database. Reports are coalesced per client token in
+process memory (the latest ``functional`` flag wins and alias reports are
+merged per requirement key) and written every ``FAKTS_REPORT_FLUSH_INTERVAL``
+seconds in a handful of bulk queries, instead of one transaction per report.
+
+Delivery is at-least-once: a failed flush puts its reports back into the
+buffer, and the buffer is flushed once more when the process exits. Reports for
+unknown tokens or aliases are dropped at flush time (and logged), since they
+can no longer be answered with an error. Unknown tokens are remembered in the
+negative cache (:mod:`fakts.services.token_filter`), so their next reports are
+rejected right away.
+"""
+
+import atexit
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from fakts import base_models, models
+from fakts.services import token_filter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingReport:
+    """Everything reported for one client token since the last flush."""
+
+    functional: bool
+    reported_at: datetime
+    alias_reports: dict[str, tuple[base_models.AliasReport, datetime]] = field(default_factory=dict)
+
+    def merge(self, report: base_models.ReportRequest, reported_at: datetime) -> None:
+        self.functional = report.functional
+        self.reported_at = reported_at
+        for key, alias_report in report.alias_reports.items():
+            self.alias_reports[key] = (alias_report, reported_at)
+
+
+def write_reports(pending: dict[str, PendingReport]) -> int:
+    """Persist coalesced reports with bulk queries. Returns the number of clients updated."""
+    clients = {client.token: client for client in models.Client.objects.filter(token__in=pending).only("id", "token")}
+    for token in pending.keys() - clients.keys():
+        logger.warning("Dropping buffered report for unknown client token")
+        token_filter.remember_unknown("client", token)
+
+    alias_ids = {alias_report.alias_id for token in clients for alias_report, _ in pending[token].alias_reports.values() if alias_report.alias_id and alias_report.alias_id.isdigit()}
+    known_aliases = {str(pk) for pk in models.InstanceAlias.objects.filter(id__in=alias_ids).values_list("id", flat=True)}
+
+    with transaction.atomic():
+        for token, client in clients.items():
+            client.functional = pending[token].functional
+            client.last_reported_at = pending[token].reported_at
+        models.Client.objects.bulk_update(clients.values(), ["functional", "last_reported_at"])
+
+        existing = {(used.client_id, used.key): used for used in models.UsedAlias.objects.filter(client__in=clients.values())}
+        updated, created = [], []
+        for token, client in clients.items():
+            for key, (alias_report, reported_at) in pending[token].alias_reports.items():
+                if alias_report.alias_id and alias_report.alias_id not in known_aliases:
+                    logger.warning("Dropping buffered alias report for unknown alias %s", alias_report.alias_id)
+                    continue
+
+                used = existing.get((client.pk, key)) or models.UsedAlias(client=client, key=key)
+                used.alias_id = alias_report.alias_id
+                used.valid = alias_report.valid
+                used.reason = alias_report.reason
+                used.used_at = reported_at
+                (updated if used.pk else created).append(used)
+
+        models.UsedAlias.objects.bulk_update(updated, ["alias", "valid", "reason", "used_at"])
+        reported = [used.used_at for used in created]
+        models.UsedAlias.objects.bulk_create(created)
+        # auto_now_add stamped the new rows with the flush time, not the report time
+        for used, used_at in zip(created, reported):
+            used.used_at = used_at
+        models.UsedAlias.objects.bulk_update(created, ["used_at"])
+
+    return len(clients)
+
+
+class ReportBuffer:
+    """Per-process buffer of client reports, flushed periodically by a daemon thread."""
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._pending: dict[str, PendingReport] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, report: base_models.ReportRequest) -> None:
+        """Queue a report; it is written with the next flush.
+
+        Alias reports whose ``alias_id`` can't be an alias primary key are
+        dropped here: they would fail the whole flush, again and again.
+        """
+        now = timezone.now()
+        for key, alias_report in list(report.alias_reports.items()):
+            if alias_report.alias_id and not alias_report.alias_id.isdigit():
+                logger.warning("Dropping alias report %s with invalid alias id %r", key, alias_report.alias_id)
+                del report.alias_reports[key]
+        with self._lock:
+            pending = self._pending.get(report.token)
+            if pending is None:
+                pending = self._pending[report.token] = PendingReport(functional=report.functional, reported_at=now)
+            pending.merge(report, now)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _requeue(self, batch: dict[str, PendingReport]) -> None:
+        # reports that arrived during the failed flush are newer and win
+        with self._lock:
+            for token, older in batch.items():
+                newer = self._pending.get(token)
+                if newer is not None:
+                    older.functional, older.reported_at = newer.functional, newer.reported_at
+                    older.alias_reports.update(newer.alias_reports)
+                self._pending[token] = older
+
+    def flush(self) -> int:
+        """Write everything buffered so far. On failure the reports are re-queued and the error re-raised."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+
+        if not batch:
+            return 0
+
+        try:
+            return write_reports(batch)
+        except Exception:
+            self._requeue(batch)
+            raise
+
+    def start(self) -> None:
+        """Start the periodic flush thread (no-op if running or the interval is 0)."""
+        if self.flush_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="fakts-report-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and flush what is left."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._flush_logged()
+
+    def _flush_logged(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing buffered client reports failed; they stay queued")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self._flush_logged()
+            # the flusher thread owns its connection, recycle it like a request would
+            close_old_connections()
+
+
+_buffer: Optional[ReportBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_report_buffer() -> ReportBuffer:
+    """Return the process-wide report buffer, starting its flusher on first use.
+
+    The buffer is flushed one last time when the interpreter exits.
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ReportBuffer(flush_interval=settings.FAKTS_REPORT_FLUSH_INTERVAL)
+            _buffer.start()
+            atexit.register(_buffer.stop)
+        return _buffer
+
+
+def reset_report_buffer() -> None:
+    """Stop (and flush) the process-wide buffer so the next access rebuilds it from settings."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is not None:
+            atexit.unregister(_buffer.stop)
+            _buffer.stop()
+        _buffer = None
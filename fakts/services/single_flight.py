@@ -0,0 +1,135 @@
+"""Request coalescing for claim rendering.
+
+When a composition is redeployed, every replica of an agent claims its
+configuration with the same client token at the same moment. :func:`do` lets
+concurrent requests for the same key share one in-flight load (client lookup
+plus render): the first request starts it as a task and everyone, the first
+request included, awaits that task. A caller that goes away (client disconnect)
+doesn't cancel the load for the others.
+
+With ``FAKTS_SINGLE_FLIGHT_SHARED`` the load is also coalesced across
+processes: the process that wins a lock in the Django cache (``add`` is atomic
+on the redis backend) loads and publishes the result for
+``FAKTS_SINGLE_FLIGHT_RESULT_TTL`` seconds, the others wait for it. If the
+winner fails or the lock expires, waiters load for themselves, so the shared
+layer can only ever delay a request by ``LOCK_TIMEOUT``. Published results of
+one token share a cache entry, which :func:`invalidate_tokens` drops together
+with the token's cached claims.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+T = TypeVar("T")
+
+# Upper bound for one load; also how long other processes wait for the winner.
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(str(value).encode()).hexdigest()
+
+
+def flight_key(kind: str, token: str, context_key: str) -> str:
+    """Key for loads of ``kind`` for ``token`` in a request context (hashed, so plaintext tokens never reach the cache)."""
+    return f"{kind}:{_digest(token)}:{_digest(context_key)}"
+
+
+def _result_key(key: str) -> str:
+    # every context of a token shares one entry, so it is dropped with one delete
+    group = key.rpartition(":")[0] or key
+    return f"fakts:flight:result:{group}"
+
+
+def invalidate_tokens(kind: str, tokens) -> None:
+    """Drop the published results of loads of ``kind`` for ``tokens``."""
+    cache.delete_many([f"fakts:flight:result:{kind}:{_digest(token)}" for token in tokens])
+
+
+def _cache_get(key: str):
+    return cache.get(key, _MISSING)
+
+
+def _cache_add(key: str, value, timeout) -> bool:
+    return cache.add(key, value, timeout)
+
+
+def _cache_delete(key: str) -> None:
+    cache.delete(key)
+
+
+def _get_result(key: str):
+    return cache.get(_result_key(key), {}).get(key, _MISSING)
+
+
+def _publish(key: str, result, timeout) -> None:
+    entry = cache.get(_result_key(key)) or {}
+    entry[key] = result
+    cache.set(_result_key(key), entry, timeout)
+
+
+# cache round trips never touch the ORM, so keep them off the thread-sensitive executor
+aget = sync_to_async(_cache_get, thread_sensitive=False)
+aadd = sync_to_async(_cache_add, thread_sensitive=False)
+adelete = sync_to_async(_cache_delete, thread_sensitive=False)
+aget_result = sync_to_async(_get_result, thread_sensitive=False)
+apublish = sync_to_async(_publish, thread_sensitive=False)
+
+
+async def _shared(key: str, load: Callable[[], Awaitable[T]]) -> T:
+    lock_key = f"fakts:flight:lock:{key}"
+
+    result = await aget_result(key)
+    if result is not _MISSING:
+        return result
+
+    if not await aadd(lock_key, True, LOCK_TIMEOUT):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            result = await aget_result(key)
+            if result is not _MISSING:
+                return result
+            if await aget(lock_key) is _MISSING:
+                # the winner gave up without a result; load ourselves
+                break
+        return await load()
+
+    try:
+        result = await load()
+        await apublish(key, result, settings.FAKTS_SINGLE_FLIGHT_RESULT_TTL)
+        return result
+    finally:
+        await adelete(lock_key)
+
+
+async def _run(key: str, load: Callable[[], Awaitable[T]]) -> T:
+    if getattr(settings, "FAKTS_SINGLE_FLIGHT_SHARED", False):
+        return await _shared(key, load)
+    return await load()
+
+
+async def do(key: str, load: Callable[[], Awaitable[T]]) -> T:
+    """Await ``load()``, sharing one in-flight call among concurrent callers with the same ``key``."""
+    task = _inflight.get(key)
+    if task is None or task.get_loop() is not asyncio.get_running_loop():
+        task = asyncio.ensure_future(_run(key, load))
+        _inflight[key] = task
+
+        def _forget(done: asyncio.Future) -> None:
+            if _inflight.get(key) is done:
+                del _inflight[key]
+
+        task.add_done_callback(_forget)
+    return await asyncio.shield(task)
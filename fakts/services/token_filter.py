@@ -0,0 +1,254 @@
+"""Negative lookups for the tokens and codes presented to the public fakts endpoints.
+
+Misconfigured or stale clients keep retrying ``/f/claim/``, ``/f/report/``,
+``/f/redeem/`` ... with tokens that no longer (or never did) exist, and every
+retry used to be a database ``get``. Two layers answer those without a query:
+
+* a **negative cache**: a lookup that found nothing is remembered in the Django
+  cache for ``FAKTS_NEGATIVE_LOOKUP_TTL`` seconds (``0`` disables it);
+* an optional per-process **Bloom filter** of every existing token
+  (``FAKTS_TOKEN_BLOOM_FILTER``). A token the filter has never seen cannot
+  exist; a token it has seen may (false positives simply fall through to the
+  database).
+
+Rows are only ever *added* to the filter. It is loaded from the database once
+and then kept current from the model signals in :mod:`fakts.signals`: every new
+token is appended (as a digest) to a numbered log in the shared cache, which
+other processes replay before they trust a negative answer. If the log has
+been evicted or the filter is full, the filter is simply reloaded. New tokens
+also drop their negative-cache entry, so a token that starts to exist is never
+rejected.
+
+Both only hold when every process shares the Django cache
+(``FAKTS_SHARED_CACHE``, i.e. the redis backend). With the per-process locmem
+cache another worker would never see the new token, so the Bloom filter stays
+off and negative-cache entries live at most ``LOCAL_TTL`` seconds: a token
+created right after a miss may be rejected by other workers for that long.
+"""
+
+import hashlib
+import math
+import threading
+import uuid
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from fakts import models
+
+# kind -> (model, token field)
+KINDS = {
+    "client": (models.Client, "token"),
+    "composition": (models.Composition, "token"),
+    "redeem_token": (models.RedeemToken, "token"),
+    "device_code": (models.DeviceCode, "code"),
+}
+
+ERROR_RATE = 0.01
+# Log entries only need to outlive the slowest process' next lookup; a process
+# that finds a gap reloads its filter.
+LOG_TTL = 24 * 3600
+# Replaying more than this many log entries is slower than a reload.
+MAX_REPLAY = 1000
+# Cap on the negative-cache TTL when the cache is per-process.
+LOCAL_TTL = 5
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(str(token).encode()).hexdigest()
+
+
+def _shared() -> bool:
+    return getattr(settings, "FAKTS_SHARED_CACHE", False)
+
+
+def _ttl() -> int:
+    ttl = getattr(settings, "FAKTS_NEGATIVE_LOOKUP_TTL", 0)
+    return ttl if _shared() else min(ttl, LOCAL_TTL)
+
+
+def _bloom_enabled() -> bool:
+    # new tokens only reach other processes' filters through a shared log
+    return getattr(settings, "FAKTS_TOKEN_BLOOM_FILTER", False) and _shared()
+
+
+def _missing_key(kind: str, digest: str) -> str:
+    return f"fakts:missing:{kind}:{digest}"
+
+
+def _epoch_key(kind: str) -> str:
+    return f"fakts:tokens:{kind}:epoch"
+
+
+def _seq_key(kind: str) -> str:
+    return f"fakts:tokens:{kind}:seq"
+
+
+def _log_key(kind: str, epoch: str, seq: int) -> str:
+    return f"fakts:tokens:{kind}:{epoch}:{seq}"
+
+
+class BloomFilter:
+    """A fixed-size Bloom filter over hex digests."""
+
+    def __init__(self, capacity: int, error_rate: float = ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: str):
+        # double hashing over two independent 64 bit halves of the digest
+        a, b = int(digest[:16], 16), int(digest[16:32], 16) | 1
+        return ((a + i * b) % self.size for i in range(self.hashes))
+
+    def add(self, digest: str) -> None:
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    @property
+    def full(self) -> bool:
+        return self.count > self.capacity
+
+
+class KnownTokens:
+    """The Bloom filter of one kind of token, plus how far it has replayed the shared log."""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.filter: Optional[BloomFilter] = None
+        self.epoch: Optional[str] = None
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def _log_position(self) -> tuple[str, int]:
+        found = cache.get_many([_epoch_key(self.kind), _seq_key(self.kind)])
+        epoch = found.get(_epoch_key(self.kind))
+        if epoch is None:
+            # the counter first, so _publish doesn't take it for a recreated one
+            cache.add(_seq_key(self.kind), 0, None)
+            cache.add(_epoch_key(self.kind), uuid.uuid4().hex, None)
+            epoch = cache.get(_epoch_key(self.kind))
+        return epoch, found.get(_seq_key(self.kind), 0)
+
+    def load(self) -> None:
+        """(Re)build the filter from the database."""
+        model, field = KINDS[self.kind]
+        # read the log position first: everything logged up to it is committed
+        # and therefore part of the load, everything after it is replayed later
+        epoch, seq = self._log_position()
+        tokens = list(model.objects.values_list(field, flat=True).iterator())
+        bloom = BloomFilter(max(2 * len(tokens), 1024))
+        for token in tokens:
+            bloom.add(_digest(token))
+        with self._lock:
+            self.filter, self.epoch, self.seq = bloom, epoch, seq
+
+    def catch_up(self) -> bool:
+        """Replay the shared log. False if the filter has to be reloaded instead."""
+        epoch, seq = self._log_position()
+        if self.filter is None or self.filter.full or epoch != self.epoch or seq < self.seq or seq - self.seq > MAX_REPLAY:
+            return False
+        if seq == self.seq:
+            return True
+
+        keys = [_log_key(self.kind, epoch, n) for n in range(self.seq + 1, seq + 1)]
+        found = cache.get_many(keys)
+        if len(found) != len(keys):
+            return False
+        with self._lock:
+            for key in keys:
+                self.filter.add(found[key])
+            self.seq = max(self.seq, seq)
+        return True
+
+    def might_contain(self, digest: str) -> Optional[bool]:
+        """Whether ``digest`` may exist; None if the filter has to be (re)loaded first."""
+        if self.filter is not None and digest in self.filter:
+            return True
+        if not self.catch_up():
+            return None
+        return digest in self.filter
+
+
+_known: dict[str, KnownTokens] = {kind: KnownTokens(kind) for kind in KINDS}
+
+
+def _check(kind: str, token: str) -> Optional[bool]:
+    digest = _digest(token)
+    if _bloom_enabled():
+        might_exist = _known[kind].might_contain(digest)
+        if might_exist is None:
+            return None
+        if not might_exist:
+            return True
+    return _ttl() > 0 and cache.get(_missing_key(kind, digest)) is not None
+
+
+def is_unknown(kind: str, token: str) -> bool:
+    """True if no ``kind`` row with ``token`` can exist, decided without a query
+    (except for the occasional reload of the Bloom filter)."""
+    unknown = _check(kind, token)
+    if unknown is None:
+        _known[kind].load()
+        unknown = _check(kind, token)
+    return bool(unknown)
+
+
+async def ais_unknown(kind: str, token: str) -> bool:
+    """Async :func:`is_unknown`. Only a filter reload runs on the ORM thread."""
+    unknown = await sync_to_async(_check, thread_sensitive=False)(kind, token)
+    if unknown is None:
+        await sync_to_async(_known[kind].load)()
+        unknown = await sync_to_async(_check, thread_sensitive=False)(kind, token)
+    return bool(unknown)
+
+
+def remember_unknown(kind: str, token: str) -> None:
+    """Record that a lookup of ``token`` found no ``kind`` row."""
+    if _ttl() > 0:
+        cache.set(_missing_key(kind, _digest(token)), True, _ttl())
+
+
+async def aremember_unknown(kind: str, token: str) -> None:
+    await sync_to_async(remember_unknown, thread_sensitive=False)(kind, token)
+
+
+def _publish(kind: str, digest: str) -> None:
+    cache.delete(_missing_key(kind, digest))
+    if not _bloom_enabled():
+        return
+
+    known = _known[kind]
+    if known.filter is not None:
+        known.filter.add(digest)
+
+    # a recreated counter could repeat sequence numbers processes have already
+    # replayed, so it starts a new epoch (which makes every process reload)
+    if cache.add(_seq_key(kind), 0, None):
+        cache.set(_epoch_key(kind), uuid.uuid4().hex, None)
+    epoch = known._log_position()[0]
+    seq = cache.incr(_seq_key(kind))
+    cache.set(_log_key(kind, epoch, seq), digest, LOG_TTL)
+
+
+def token_added(kind: str, token: str) -> None:
+    """Make ``token`` known once the current transaction commits."""
+    if not token:
+        return
+    digest = _digest(token)
+    transaction.on_commit(lambda: _publish(kind, digest))
+
+
+def clear() -> None:
+    """Forget the per-process filters (they are reloaded on the next lookup)."""
+    for kind in KINDS:
+        _known[kind] = KnownTokens(kind)
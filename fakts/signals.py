@@ -0,0 +1,105 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from authapp.models import OAuth2Client
+from fakts import models
+from fakts.services import claim_cache, token_filter
+from karakter.models import Scope
+
+# Client fields that never show up in a claim answer. Saves restricted to these
+# (e.g. the report endpoint bumping ``functional``/``last_reported_at``) keep the
+# cached claim.
+CLAIM_IRRELEVANT_CLIENT_FIELDS = {"functional", "last_reported_at", "name", "public_sources", "logo"}
+
+
+def _tokens_for_instances(instance_ids) -> list[str]:
+    return list(models.Client.objects.filter(mappings__instance_id__in=instance_ids).values_list("token", flat=True).distinct())
+
+
+@receiver(pre_save, sender=models.Client)
+def invalidate_claim_on_client_token_change(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk or (update_fields is not None and "token" not in update_fields):
+        return
+
+    old_token = models.Client.objects.filter(pk=instance.pk).values_list("token", flat=True).first()
+    if old_token and old_token != instance.token:
+        claim_cache.invalidate_tokens([old_token])
+
+
+@receiver(post_save, sender=models.Client)
+def invalidate_claim_on_client_save(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and set(update_fields) <= CLAIM_IRRELEVANT_CLIENT_FIELDS):
+        return
+
+    claim_cache.invalidate_tokens([instance.token])
+
+
+@receiver(post_delete, sender=models.Client)
+def invalidate_claim_on_client_delete(sender, instance, **kwargs):
+    claim_cache.invalidate_tokens([instance.token])
+
+
+@receiver(m2m_changed, sender=models.Client.scopes.through)
+def invalidate_claim_on_client_scopes_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # a clear has no pk_set, so look the affected rows up before they are gone
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+
+    if reverse:
+        # ``scope.clients.add(...)``: instance is the Scope
+        clients = models.Client.objects.filter(pk__in=pk_set) if pk_set else instance.clients.all()
+        claim_cache.invalidate_tokens(clients.values_list("token", flat=True))
+    else:
+        claim_cache.invalidate_tokens([instance.token])
+
+
+@receiver(post_save, sender=models.ServiceInstanceMapping)
+@receiver(post_delete, sender=models.ServiceInstanceMapping)
+def invalidate_claim_on_mapping_change(sender, instance, **kwargs):
+    claim_cache.invalidate_tokens(models.Client.objects.filter(pk=instance.client_id).values_list("token", flat=True))
+
+
+@receiver(post_save, sender=models.ServiceInstance)
+@receiver(post_delete, sender=models.ServiceInstance)
+def invalidate_claim_on_instance_change(sender, instance, **kwargs):
+    claim_cache.invalidate_tokens(_tokens_for_instances([instance.pk]))
+
+
+@receiver(post_save, sender=models.InstanceAlias)
+@receiver(post_delete, sender=models.InstanceAlias)
+def invalidate_claim_on_alias_change(sender, instance, **kwargs):
+    claim_cache.invalidate_tokens(_tokens_for_instances([instance.instance_id]))
+
+
+@receiver(post_save, sender=Scope)
+@receiver(pre_delete, sender=Scope)
+def invalidate_claim_on_scope_change(sender, instance, **kwargs):
+    claim_cache.invalidate_tokens(models.Client.objects.filter(scopes=instance).values_list("token", flat=True))
+
+
+@receiver(post_save, sender=OAuth2Client)
+@receiver(post_delete, sender=OAuth2Client)
+def invalidate_claim_on_oauth2_client_change(sender, instance, **kwargs):
+    claim_cache.invalidate_tokens(models.Client.objects.filter(oauth2_client_id=instance.pk).values_list("token", flat=True))
+
+
+@receiver(post_save, sender=models.Client)
+@receiver(post_save, sender=models.Composition)
+@receiver(post_save, sender=models.RedeemToken)
+@receiver(post_save, sender=models.DeviceCode)
+def register_token(sender, instance, created, update_fields=None, **kwargs):
+    # only a new row or a (possibly) changed token can make a lookup succeed
+    if not created and update_fields is not None and "token" not in update_fields and "code" not in update_fields:
+        return
+
+    for kind, (model, field) in token_filter.KINDS.items():
+        if model is sender:
+            token_filter.token_added(kind, getattr(instance, field))
+
+
+@receiver(post_delete, sender=models.IonscaleLayer)
+def forget_ionscale_layer_machines(sender, instance, **kwargs):
+    from ionscale.inventory import get_machine_inventory
+
+    # stop refreshing a tailnet no layer reads any more
+    get_machine_inventory().forget(instance.tailnet_name)
@@ -1,11 +1,16 @@
-from uuid import uuid4
 import collections.abc
-from urllib.request import urlopen
-from django.core.files import File
-from django.core.files.temp import NamedTemporaryFile
+import hashlib
+import io
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.cache import cache
+
 from karakter.datalayer import get_current_datalayer
 from karakter.models import MediaStore
-from django.conf import settings
+
 
 def update_nested(d, u):
     """Update a nested dictionary or similar mapping."""
@@ -17,29 +22,63 @@ def update_nested(d, u):
     return d
 
 
-def download_logo(url: str) -> File:
-    """Download a logo from a URL and return a Django File object, that can be
-    used directly in a model."""
-    img_tmp = NamedTemporaryFile(delete=True)
-    with urlopen(url) as uo:
-        assert uo.status == 200
-        content_type = uo.headers.get('Content-Type', '')
-        assert content_type == 'image/png', f"Expected PNG image, got {content_type}"
-        img_tmp.write(uo.read())
-        img_tmp.flush()
-        
-        
-       
-     
-    key = f"{uuid4()}.png"
+def _logo_fetch_key(url: str) -> str:
+    return "fakts:logo:" + hashlib.sha256(url.encode()).hexdigest()
+
+
+def store_logo(content: bytes) -> MediaStore:
+    """Store PNG bytes content-addressed by their SHA-256.
+
+    The same image is only ever uploaded once, however many apps, releases or
+    installs reference it.
+    """
+    digest = hashlib.sha256(content).hexdigest()
     bucket = settings.MEDIA_BUCKET
-    
-    img_tmp.seek(0)
-    
-    store = MediaStore.objects.create(
-        path=f"{bucket}/{key}", key=key, bucket=bucket
-    )
-    
-    store.put_file(get_current_datalayer(), img_tmp)
-        
+    key = f"logos/{digest}.png"
+
+    store, _ = MediaStore.objects.get_or_create(path=f"{bucket}/{key}", defaults={"key": key, "bucket": bucket})
+    if not store.populated:
+        store.populated = True
+        store.put_file(get_current_datalayer(), io.BytesIO(content))
+
+    return store
+
+
+def download_logo(url: str) -> MediaStore:
+    """Download a logo from a URL and return its (content-addressed) MediaStore,
+    that can be used directly in a model.
+
+    Fetches are cached per URL: within ``FAKTS_LOGO_REVALIDATE_AFTER`` seconds
+    the known store is returned without a request, afterwards the URL is
+    revalidated with its ETag / Last-Modified and a 304 keeps the store.
+    """
+    fetch_key = _logo_fetch_key(url)
+    known = cache.get(fetch_key)
+    store = MediaStore.objects.filter(pk=known["store"], populated=True).first() if known else None
+
+    if store and time.time() - known["checked_at"] < settings.FAKTS_LOGO_REVALIDATE_AFTER:
+        return store
+
+    headers = {}
+    if store:
+        if known["etag"]:
+            headers["If-None-Match"] = known["etag"]
+        if known["last_modified"]:
+            headers["If-Modified-Since"] = known["last_modified"]
+
+    try:
+        with urlopen(Request(url, headers=headers)) as uo:
+            assert uo.status == 200
+            content_type = uo.headers.get("Content-Type", "")
+            assert content_type == "image/png", f"Expected PNG image, got {content_type}"
+            content = uo.read()
+            etag, last_modified = uo.headers.get("ETag"), uo.headers.get("Last-Modified")
+    except HTTPError as e:
+        if e.code != 304 or not store:
+            raise
+        cache.set(fetch_key, {**known, "checked_at": time.time()}, timeout=None)
+        return store
+
+    store = store_logo(content)
+    cache.set(fetch_key, {"store": store.pk, "etag": etag, "last_modified": last_modified, "checked_at": time.time()}, timeout=None)
     return store
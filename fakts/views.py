@@ -10,7 +10,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 
 from fakts import base_models, models
-from fakts.services import clients, device_codes, rendering
+from fakts.services import challenges, claim_cache, clients, device_codes, poll_pacing, rendering, report_buffer, single_flight, token_filter
+from lok_server import discovery
 
 logger = logging.getLogger(__name__)
 
@@ -32,14 +33,19 @@ def _status(status, message):
     return JsonResponse({"status": status, "message": message})
 
 
-def _poll_device_code(device_code, result_attr):
-    """Shared polling response for the device-code challenge endpoints."""
+async def _poll_device_code(device_code, result_attr, interval):
+    """Shared polling response for the device-code challenge endpoints.
+
+    ``result_attr`` must have been loaded with ``select_related`` so that
+    reading it does not hit the database from the event loop. Pending answers
+    advertise the poll ``interval`` (see :mod:`fakts.services.poll_pacing`).
+    """
     if timezone.now() > device_code.expires_at:
-        device_code.delete()
+        await device_code.adelete()
         return _status("expired", "The user has not given an answer in enough time")
 
     if device_code.denied:
-        device_code.delete()
+        await device_code.adelete()
         return _status("denied", "The user has denied the request")
 
     # the related object is only set once the user has verified the challenge
@@ -47,7 +53,57 @@ def _poll_device_code(device_code, result_attr):
     if result:
         return JsonResponse({"status": "granted", "token": result.token})
 
-    return _status("pending", "User  has not verfied the challenge")
+    return JsonResponse({"status": "pending", "message": "User  has not verfied the challenge", "interval": interval})
+
+
+def _is_pending(device_code, result_attr) -> bool:
+    return not device_code.denied and getattr(device_code, f"{result_attr}_id") is None and timezone.now() <= device_code.expires_at
+
+
+async def _challenge(queryset, kind, result_attr, wait, token_kind=None, **lookup):
+    """Answer a challenge, optionally holding it open until it resolves.
+
+    With ``wait > 0`` a pending challenge is long-polled: we subscribe to the
+    device code's wake-ups, re-read it (so a resolution that landed before the
+    subscription isn't missed) and wait until the accept/decline mutation
+    notifies us, the code expires or ``FAKTS_CHALLENGE_LONG_POLL_MAX`` passes.
+
+    With ``token_kind`` the (single) lookup value is checked against
+    :mod:`fakts.services.token_filter` first.
+
+    Short polls are paced: a code polled too often is answered ``slow_down``
+    (still ``pending``) without a database lookup. A ``wait`` shorter than the
+    advertised interval (or ``FAKTS_CHALLENGE_LONG_POLL_MAX``) doesn't make a
+    long poll, so it is paced and answered as a short poll.
+    """
+    if token_kind and await token_filter.ais_unknown(token_kind, *lookup.values()):
+        return JsonResponse({"status": "error", "error": "Challenge does not exist"})
+
+    interval = await poll_pacing.acurrent_interval(kind, queryset, result_attr)
+    longest = settings.FAKTS_CHALLENGE_LONG_POLL_MAX
+    if not min(wait, longest) >= min(interval, longest) > 0:
+        wait = 0
+        pace = await poll_pacing.arecord_poll(kind, *lookup.values(), interval)
+        if pace.slow_down:
+            return JsonResponse({"status": "pending", "error": "slow_down", "message": "Polling too fast, slow down", "interval": pace.interval})
+        interval = pace.interval
+
+    try:
+        device_code = await queryset.aget(**lookup)
+
+        timeout = min(wait, settings.FAKTS_CHALLENGE_LONG_POLL_MAX, (device_code.expires_at - timezone.now()).total_seconds())
+        if timeout > 0 and _is_pending(device_code, result_attr):
+            async with challenges.subscribe_challenge(kind, device_code.pk) as wait_for_resolution:
+                device_code = await queryset.aget(pk=device_code.pk)
+                if _is_pending(device_code, result_attr):
+                    await wait_for_resolution(timeout)
+                    device_code = await queryset.aget(pk=device_code.pk)
+    except queryset.model.DoesNotExist:
+        if token_kind:
+            await token_filter.aremember_unknown(token_kind, *lookup.values())
+        return JsonResponse({"status": "error", "error": "Challenge does not exist"})
+
+    return await _poll_device_code(device_code, result_attr, interval)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -57,30 +113,33 @@ class WellKnownFakts(View):
     endpoints for "Claim" and "Configure" as well as the name and version.
     Of the Fakts Protocol"""
 
-    def get(self, request, format=None):
-        return JsonResponse(
-            data=base_models.WellKnownFakts(
-                name=settings.DEPLOYMENT_NAME,
-                version=settings.FAKTS_PROTOCOL_VERSION,
-                description=settings.DEPLOYMENT_DESCRIPTION,
-                claim=request.build_absolute_uri(reverse("fakts:claim")),
-                base_url=request.build_absolute_uri(reverse("fakts:index")),
-                frontend_url=request.build_absolute_uri(reverse("mainhome")).replace(f"/{settings.MY_SCRIPT_NAME}", ""),
-            ).model_dump()
-        )
+    @staticmethod
+    def build(request) -> dict:
+        return base_models.WellKnownFakts(
+            name=settings.DEPLOYMENT_NAME,
+            version=settings.FAKTS_PROTOCOL_VERSION,
+            description=settings.DEPLOYMENT_DESCRIPTION,
+            claim=request.build_absolute_uri(reverse("fakts:claim")),
+            base_url=request.build_absolute_uri(reverse("fakts:index")),
+            frontend_url=request.build_absolute_uri(reverse("mainhome")).replace(f"/{settings.MY_SCRIPT_NAME}", ""),
+        ).model_dump()
+
+    async def get(self, request, format=None):
+        # built once per host, see lok_server.discovery
+        return discovery.serve("fakts", self.build, request)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class StartChallengeView(View):
     """An endpoint that is challenged in the course of a device code flow."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         start_grant, err = _parse(request, base_models.DeviceCodeStartRequest)
         if err:
             return err
 
         try:
-            device_code = device_codes.start_device_code(start_grant)
+            device_code = await device_codes.astart_device_code(start_grant)
         except device_codes.LogoDownloadError:
             return JsonResponse({"status": "error", "error": "Error downloading logo"})
 
@@ -91,13 +150,13 @@ class StartChallengeView(View):
 class ServiceStartChallengeView(View):
     """An endpoint that is challenged in the course of a device code flow."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         start_grant, err = _parse(request, base_models.ServiceDeviceCodeStartRequest)
         if err:
             return err
 
         try:
-            device_code = device_codes.start_service_device_code(start_grant)
+            device_code = await device_codes.astart_service_device_code(start_grant)
         except device_codes.LogoDownloadError:
             return JsonResponse({"status": "error", "error": "Error downloading logo"})
 
@@ -108,13 +167,13 @@ class ServiceStartChallengeView(View):
 class CompositionStartChallengeView(View):
     """An endpoint that is challenged in the course of a device code flow."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         start_grant, err = _parse(request, base_models.CompositionStartRequest)
         if err:
             return err
 
         try:
-            device_code = device_codes.start_composition_device_code(start_grant)
+            device_code = await device_codes.astart_composition_device_code(start_grant)
         except device_codes.LogoDownloadError:
             return JsonResponse({"status": "error", "error": "Error downloading logo"})
 
@@ -125,51 +184,36 @@ class CompositionStartChallengeView(View):
 class CompositionChallengeView(View):
     """An endpoint that is challenged in the course of a device code flow."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         challenge, err = _parse(request, base_models.DeviceCodeChallengeRequest)
         if err:
             return err
 
-        try:
-            device_code = models.CompositionDeviceCode.objects.get(challenge_code=challenge.code)
-        except models.CompositionDeviceCode.DoesNotExist:
-            return JsonResponse({"status": "error", "error": "Challenge does not exist"})
-
-        return _poll_device_code(device_code, "composition")
+        return await _challenge(models.CompositionDeviceCode.objects.select_related("composition"), "composition", "composition", challenge.wait, challenge_code=challenge.code)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class ServiceChallengeView(View):
     """An endpoint that is challenged in the course of a device code flow."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         challenge, err = _parse(request, base_models.DeviceCodeChallengeRequest)
         if err:
             return err
 
-        try:
-            device_code = models.ServiceDeviceCode.objects.get(challenge_code=challenge.code)
-        except models.ServiceDeviceCode.DoesNotExist:
-            return JsonResponse({"status": "error", "error": "Challenge does not exist"})
-
-        return _poll_device_code(device_code, "instance")
+        return await _challenge(models.ServiceDeviceCode.objects.select_related("instance"), "service", "instance", challenge.wait, challenge_code=challenge.code)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
 class ChallengeView(View):
     """An endpoint that is challenged in the course of a device code flow."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         challenge, err = _parse(request, base_models.DeviceCodeChallengeRequest)
         if err:
             return err
 
-        try:
-            device_code = models.DeviceCode.objects.get(code=challenge.code)
-        except models.DeviceCode.DoesNotExist:
-            return JsonResponse({"status": "error", "error": "Challenge does not exist"})
-
-        return _poll_device_code(device_code, "client")
+        return await _challenge(models.DeviceCode.objects.select_related("client"), "client", "client", challenge.wait, token_kind="device_code", code=challenge.code)
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -181,20 +225,20 @@ class RetrieveView(View):
     and the app will not be able to use the faktsclaim to get a configuration.
     """
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         retrieve, err = _parse(request, base_models.RetrieveRequest)
         if err:
             return err
 
         try:
-            app = models.App.objects.get(identifier=retrieve.manifest.identifier)
-            release = models.Release.objects.get(app=app, version=retrieve.manifest.version)
+            app = await models.App.objects.aget(identifier=retrieve.manifest.identifier)
+            release = await models.Release.objects.aget(app=app, version=retrieve.manifest.version)
         except models.Release.DoesNotExist:
             return _status("error", f"Release does not exist {retrieve.manifest.identifier}:{retrieve.manifest.version}")
         except models.App.DoesNotExist:
             return _status("error", f"App does not exist {retrieve.manifest.identifier}")
 
-        client = release.clients.filter(public=True).first()
+        client = await release.clients.filter(public=True).afirst()
         if not client:
             return _status("error", "There is no client for this app that is public. Please use a different grant")
 
@@ -207,18 +251,22 @@ class RedeemView(View):
     Implements an endpoint that redeems a pre-issued token into a client token.
     """
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         redeem_request, err = _parse(request, base_models.ReedeemTokenRequest)
         if err:
             return err
 
+        if await token_filter.ais_unknown("redeem_token", redeem_request.token):
+            return _status("error", "Invalid redeem token")
+
         try:
-            client = clients.redeem_token(
+            client = await clients.aredeem_token(
                 redeem_request.token,
                 redeem_request.manifest,
                 role=redeem_request.requested_client_role,
             )
         except models.RedeemToken.DoesNotExist:
+            await token_filter.aremember_unknown("redeem_token", redeem_request.token)
             return _status("error", "Invalid redeem token")
         except clients.RedeemTokenExpired:
             return _status("error", "Redeem token expired")
@@ -235,17 +283,34 @@ class RedeemView(View):
 class ClaimView(View):
     """Retrieve a faktsclaim given a client token generated by the platform."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         claim, err = _parse(request, base_models.ClaimRequest, error_key="message")
         if err:
             return err
 
-        try:
-            client = models.Client.objects.get(token=claim.token)
-            context = rendering.create_linking_context(request, client, claim)
+        linking_request = rendering.create_linking_request(request)
+        ctx_key = claim_cache.context_key(linking_request, claim)
+
+        config = await claim_cache.aget_claim(claim.token, ctx_key)
+        if config is not None:
+            return JsonResponse({"status": "granted", "config": config})
+
+        if await token_filter.ais_unknown("client", claim.token):
+            return _status("error", "No Client found for this token")
+
+        async def load():
+            client = await rendering.claim_client_queryset().aget(token=claim.token)
+            context = rendering.create_linking_context(request, client, claim, linking_request=linking_request)
             config = rendering.render_composition(client, context)
+            await claim_cache.aset_claim(claim.token, ctx_key, config)
+            return config
+
+        try:
+            # replicas claiming with the same token at once share one render
+            config = await single_flight.do(single_flight.flight_key("claim", claim.token, ctx_key), load)
             return JsonResponse({"status": "granted", "config": config})
         except models.Client.DoesNotExist:
+            await token_filter.aremember_unknown("client", claim.token)
             return _status("error", "No Client found for this token")
         except Exception as e:
             logger.error(e, exc_info=True)
@@ -256,17 +321,27 @@ class ClaimView(View):
 class ClaimCompositionView(View):
     """Retrieve a composition faktsclaim given a composition token."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         claim, err = _parse(request, base_models.ServerClaimRequest, error_key="message")
         if err:
             return err
 
-        try:
-            composition = models.Composition.objects.get(token=claim.token)
+        if await token_filter.ais_unknown("composition", claim.token):
+            return _status("error", "No Composition found for this token")
+
+        async def load():
+            composition = await rendering.composition_claim_queryset().aget(token=claim.token)
             context = rendering.create_serverlinking_context(request, composition, claim)
-            config = rendering.render_server_fakts(composition, context)
-            return JsonResponse({"status": "granted", "config": config.model_dump()})
+            return rendering.render_server_fakts(composition, context).model_dump()
+
+        linking_request = rendering.create_linking_request(request)
+        ctx_key = f"{linking_request.host}|{linking_request.port}|{linking_request.base_url}|{linking_request.is_secure}"
+
+        try:
+            config = await single_flight.do(single_flight.flight_key("composition", claim.token, ctx_key), load)
+            return JsonResponse({"status": "granted", "config": config})
         except models.Composition.DoesNotExist:
+            await token_filter.aremember_unknown("composition", claim.token)
             return _status("error", "No Composition found for this token")
         except Exception as e:
             logger.error(e, exc_info=True)
@@ -277,15 +352,24 @@ class ClaimCompositionView(View):
 class ReportView(View):
     """Record a client's self-report (functional flag + alias reports)."""
 
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         claim, err = _parse(request, base_models.ReportRequest, error_key="message")
         if err:
             return err
 
+        if await token_filter.ais_unknown("client", claim.token):
+            return _status("error", "No Client found for this token")
+
+        if settings.FAKTS_REPORT_INGESTION == "buffered":
+            # acknowledged right away, written by the periodic bulk flush
+            report_buffer.get_report_buffer().submit(claim)
+            return _status("reported", "Report accepted")
+
         try:
-            clients.report_client(claim)
+            await clients.areport_client(claim)
             return _status("reported", "Report processed successfully")
         except models.Client.DoesNotExist:
+            await token_filter.aremember_unknown("client", claim.token)
             return _status("error", "No Client found for this token")
         except Exception as e:
             logger.error(e, exc_info=True)
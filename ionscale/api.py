@@ -0,0 +1,187 @@
+"""Ionscale repository talking to the ionscale server API instead of the CLI.
+
+:class:`IonscaleRepository` forks the ``ionscale`` binary for every operation
+and scrapes its human-readable tables. :class:`IonscaleApiRepository` calls the
+same server API the CLI uses (``ionscale.v1.IonscaleService``, Connect protocol
+with JSON bodies) over one persistent, keep-alive HTTP session, and maps the
+structured responses onto the pydantic models in :mod:`ionscale.base_models`.
+
+Select it with ``IONSCALE_CLIENT = "api"``. Requests authenticate with
+``IONSCALE_ADMIN_KEY`` as a bearer token, so it must be an ionscale API key
+(the CLI additionally understands system admin keys).
+The ionscale API addresses tailnets by id; names are resolved with
+``ListTailnets`` and remembered. A remembered id the server reports as not
+found (the tailnet was deleted, maybe recreated under the same name) is
+forgotten and the name resolved once more.
+"""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import requests
+
+from .base_models import Machine, MachineDetail, Tailnet, TailnetCreate
+from .repo import IonscaleOperationUnsupported
+
+SERVICE = "ionscale.v1.IonscaleService"
+TIMEOUT = 10
+
+
+class IonscaleApiError(RuntimeError):
+    """An error answer of the ionscale API, with its Connect error ``code``."""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")) if value else None
+
+
+def _machine_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(data["id"]),
+        "name": data.get("name", ""),
+        "tailnet": (data.get("tailnet") or {}).get("name"),
+        "ipv4": data.get("ipv4") or None,
+        "ipv6": data.get("ipv6") or None,
+        "ephemeral": data.get("ephemeral", False),
+        "connected": data.get("connected", False),
+        "last_seen": _timestamp(data.get("lastSeen")),
+        "tags": data.get("tags", []),
+    }
+
+
+class IonscaleApiRepository:
+    def __init__(self, server_url: str, admin_key: str, timeout: float = TIMEOUT):
+        """
+        Initializes the repository.
+        :param server_url: The full URL of your Ionscale instance (e.g. https://vpn.corp.com)
+        :param admin_key: An ionscale API key, sent as bearer token
+        :param timeout: Seconds to wait for a response
+        """
+        self.server_url = server_url.rstrip("/")
+        self.admin_key = admin_key
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(
+            {
+                "Authorization": f"Bearer {admin_key}",
+                "Content-Type": "application/json",
+                "Connect-Protocol-Version": "1",
+            }
+        )
+        self._tailnet_ids: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Calls a unary method of the ionscale service and returns the decoded response.
+        """
+        try:
+            response = self.session.post(f"{self.server_url}/{SERVICE}/{method}", json=body or {}, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise IonscaleApiError(f"Ionscale API Error: {method} failed: {e}") from e
+
+        if response.status_code != 200:
+            code = None
+            try:
+                error = response.json()
+                code = error.get("code")
+                message = f"{error.get('code', response.status_code)}: {error.get('message', '')}"
+            except ValueError:
+                message = f"{response.status_code}: {response.text}"
+            raise IonscaleApiError(f"Ionscale API Error: {method} {message}", code=code)
+
+        return response.json()
+
+    def _tailnet_id(self, tailnet: str, refresh: bool = False) -> str:
+        with self._lock:
+            if refresh:
+                self._tailnet_ids.pop(tailnet, None)
+            tailnet_id = self._tailnet_ids.get(tailnet)
+        if tailnet_id is None:
+            self.list_tailnets()
+            with self._lock:
+                tailnet_id = self._tailnet_ids.get(tailnet)
+            if tailnet_id is None:
+                raise RuntimeError(f"Ionscale API Error: unknown tailnet {tailnet}")
+        return tailnet_id
+
+    def _tailnet_call(self, tailnet: str, method: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Calls a method addressing ``tailnet`` by id, re-resolving a stale id once."""
+        try:
+            return self._call(method, {"tailnetId": self._tailnet_id(tailnet), **(body or {})})
+        except IonscaleApiError as e:
+            if e.code != "not_found":
+                raise
+        return self._call(method, {"tailnetId": self._tailnet_id(tailnet, refresh=True), **(body or {})})
+
+    def _remember(self, tailnet: Tailnet) -> Tailnet:
+        with self._lock:
+            self._tailnet_ids[tailnet.name] = tailnet.id
+        return tailnet
+
+    def list_tailnets(self) -> List[Tailnet]:
+        data = self._call("ListTailnets")
+        return [self._remember(Tailnet(id=str(t["id"]), name=t["name"])) for t in data.get("tailnet", [])]
+
+    def list_machines(self, tailnet: str) -> List[Machine]:
+        data = self._tailnet_call(tailnet, "ListMachines")
+        return [Machine(**_machine_fields(m)) for m in data.get("machines", [])]
+
+    def get_machine(self, machine_id: str) -> MachineDetail:
+        machine = self._call("GetMachine", {"machineId": str(machine_id)})["machine"]
+        return MachineDetail(
+            **_machine_fields(machine),
+            os=machine.get("os") or None,
+            key_expiry=_timestamp(machine.get("expiresAt")),
+            authorized=machine.get("authorized", False),
+            is_external=machine.get("isExternal", False),
+        )
+
+    def create_tailnet(self, tailnet_input: TailnetCreate) -> Tailnet:
+        tailnet = self._call("CreateTailnet", {"name": tailnet_input.name})["tailnet"]
+        return self._remember(Tailnet(id=str(tailnet["id"]), name=tailnet["name"]))
+
+    def update_policy(self, tailnet: str, policy: Union[Dict[str, Any], str, Path]) -> str:
+        """
+        Sets the IAM policy of a tailnet.
+
+        :param tailnet: The name of the tailnet
+        :param policy: Policy data as a dict, JSON string, or path to a JSON file
+        """
+        if isinstance(policy, str) and policy.lstrip().startswith("{"):
+            policy = json.loads(policy)
+        elif isinstance(policy, (str, Path)):
+            policy = json.loads(Path(policy).read_text())
+        elif not isinstance(policy, dict):
+            raise ValueError("policy must be a dict, JSON string, or file path")
+
+        self._tailnet_call(tailnet, "SetIAMPolicy", {"policy": policy})
+        return "IAM policy updated"
+
+    def create_auth_key(self, tailnet: str, ephemeral: bool = False, pre_authorized: bool = True, tags: List[str] = None) -> str:
+        data = self._tailnet_call(
+            tailnet,
+            "CreateAuthKey",
+            {
+                "ephemeral": ephemeral,
+                "preAuthorized": pre_authorized,
+                "tags": tags or [],
+            },
+        )
+        # ``authKey`` only describes the key, the key itself is ``value``
+        return data["value"]
+
+    def run(self, *preargs) -> str:
+        """CLI passthrough; not available over the server API."""
+        raise IonscaleOperationUnsupported("Ionscale API Error: running CLI commands needs the CLI repository (IONSCALE_CLIENT = 'cli').")
+
+    def help(self, *preargs) -> str:
+        """CLI help; not available over the server API."""
+        raise IonscaleOperationUnsupported("Ionscale API Error: the CLI help needs the CLI repository (IONSCALE_CLIENT = 'cli').")
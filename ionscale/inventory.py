@@ -0,0 +1,227 @@
+"""Cached ionscale machine inventory.
+
+Listing a layer's machines used to shell out to the ``ionscale`` CLI (a process
+spawn plus a round trip to the coordinator) on every GraphQL resolution.
+:class:`MachineInventory` keeps the machines of each tailnet, and the machine
+details looked up by id, in process memory:
+
+* entries checked less than ``IONSCALE_INVENTORY_TTL`` seconds ago are served
+  as they are;
+* older entries are still served while a background thread fetches them again
+  (stale-while-revalidate), so once a tailnet has been listed a slow CLI never
+  holds up a resolver;
+* a failed refresh keeps the last good entry and is retried after another TTL;
+* every tailnet read within the last ``IDLE_AFTER`` seconds is refreshed each
+  ``IONSCALE_INVENTORY_REFRESH_INTERVAL`` seconds (``0`` disables that thread);
+  tailnets nobody reads any more are dropped instead, as are the tailnets of
+  deleted ionscale layers (:meth:`MachineInventory.forget`).
+
+Only the first listing of a tailnet, or the first lookup of a machine, waits
+for the CLI. Creating an auth key marks its tailnet stale
+(:meth:`MachineInventory.invalidate`). The inventory lives in process memory,
+so that only affects the process that created the key: other workers keep
+serving their listing until their own TTL or refresh comes round.
+``IONSCALE_INVENTORY_TTL = 0`` turns the cache off and every read goes to the
+repository again.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from django.conf import settings
+
+from .base_models import Machine, MachineDetail
+from .repo import get_ionscale_repo
+
+logger = logging.getLogger(__name__)
+
+MAX_DETAILS = 1024
+# Tailnets not read for this many seconds are dropped rather than refreshed.
+IDLE_AFTER = 3600
+
+
+@dataclass
+class _Entry:
+    value: Any
+    checked_at: float
+    read_at: float
+
+
+class MachineInventory:
+    """Per-tailnet machine listings (and machine details) served stale-while-revalidate."""
+
+    def __init__(self, ttl: float, refresh_interval: float = 0) -> None:
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._tailnets: dict[str, _Entry] = {}
+        self._details: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._refreshing: dict[Hashable, threading.Thread] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # reads
+
+    def machines(self, tailnet: str) -> list[Machine]:
+        """The machines of ``tailnet``; only the first call waits for the repository."""
+        if not self.ttl:
+            return get_ionscale_repo().list_machines(tailnet)
+        return self._read(self._tailnets, tailnet, lambda: get_ionscale_repo().list_machines(tailnet))
+
+    def machine(self, machine_id: str) -> MachineDetail:
+        """The details of a machine. Raises whatever the repository raises for unknown ids."""
+        machine_id = str(machine_id)
+        if not self.ttl:
+            return get_ionscale_repo().get_machine(machine_id)
+        return self._read(self._details, machine_id, lambda: get_ionscale_repo().get_machine(machine_id))
+
+    def _read(self, store: dict, key: str, fetch: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = store.get(key)
+            if entry is not None:
+                entry.read_at = time.monotonic()
+        if entry is None:
+            value = fetch()
+            self._store(store, key, value)
+            return value
+        if time.monotonic() - entry.checked_at >= self.ttl:
+            self.revalidate(store, key, fetch)
+        return entry.value
+
+    def _store(self, store: dict, key: str, value: Any, refresh: bool = False) -> None:
+        with self._lock:
+            previous = store.get(key)
+            if refresh and previous is None:
+                # forgotten while the refresh was running
+                return
+            now = time.monotonic()
+            store[key] = _Entry(value, now, previous.read_at if previous else now)
+            if store is self._details:
+                self._details.move_to_end(key)
+                while len(self._details) > MAX_DETAILS:
+                    self._details.popitem(last=False)
+            else:
+                self._prune_details(key, value)
+
+    def _prune_details(self, tailnet: str, machines: list[Machine]) -> None:
+        # machines that left the tailnet shouldn't linger as details
+        present = {machine.id for machine in machines}
+        for machine_id, entry in list(self._details.items()):
+            if entry.value.tailnet == tailnet and machine_id not in present:
+                del self._details[machine_id]
+
+    # refreshes
+
+    def revalidate(self, store: dict, key: str, fetch: Callable[[], Any]) -> Optional[threading.Thread]:
+        """Refetch an entry in a background thread (at most one per entry at a time)."""
+        with self._lock:
+            if (id(store), key) in self._refreshing:
+                return None
+            thread = threading.Thread(target=self._refresh, args=(store, key, fetch), name=f"ionscale-inventory-{key}", daemon=True)
+            self._refreshing[(id(store), key)] = thread
+        thread.start()
+        return thread
+
+    def _refresh(self, store: dict, key: str, fetch: Callable[[], Any]) -> None:
+        try:
+            self._store(store, key, fetch(), refresh=True)
+        except Exception:
+            logger.warning("Refreshing the ionscale inventory for %s failed, serving the cached entry", key, exc_info=True)
+            with self._lock:
+                entry = store.get(key)
+                if entry is not None:
+                    entry.checked_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing.pop((id(store), key), None)
+
+    def refresh_all(self) -> None:
+        """Refetch the machines of every tailnet read recently, forget the others (what the refresher thread runs)."""
+        now = time.monotonic()
+        with self._lock:
+            tailnets = []
+            for tailnet, entry in list(self._tailnets.items()):
+                if now - entry.read_at < IDLE_AFTER:
+                    tailnets.append(tailnet)
+                else:
+                    self._forget(tailnet)
+        for tailnet in tailnets:
+            with self._lock:
+                if (id(self._tailnets), tailnet) in self._refreshing:
+                    continue
+                self._refreshing[(id(self._tailnets), tailnet)] = threading.current_thread()
+            self._refresh(self._tailnets, tailnet, lambda tailnet=tailnet: get_ionscale_repo().list_machines(tailnet))
+
+    def invalidate(self, tailnet: str) -> None:
+        """Mark ``tailnet`` stale: the next read triggers a refresh (and still gets the cached machines).
+
+        Only this process's inventory is affected.
+        """
+        with self._lock:
+            entry = self._tailnets.get(tailnet)
+            if entry is not None:
+                entry.checked_at = float("-inf")
+
+    def forget(self, tailnet: str) -> None:
+        """Drop ``tailnet`` and its machine details; a later read lists it afresh."""
+        with self._lock:
+            self._forget(tailnet)
+
+    def _forget(self, tailnet: str) -> None:
+        self._tailnets.pop(tailnet, None)
+        self._prune_details(tailnet, [])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tailnets.clear()
+            self._details.clear()
+
+    # refresher thread
+
+    def start(self) -> None:
+        if self.refresh_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ionscale-inventory", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh_all()
+
+
+_inventory: Optional[MachineInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_machine_inventory() -> MachineInventory:
+    """Return the process-wide inventory, starting its refresher on first use."""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = MachineInventory(
+                ttl=settings.IONSCALE_INVENTORY_TTL,
+                refresh_interval=settings.IONSCALE_INVENTORY_REFRESH_INTERVAL,
+            )
+            _inventory.start()
+            atexit.register(_inventory.stop)
+        return _inventory
+
+
+def reset_machine_inventory() -> None:
+    """Stop the process-wide inventory so the next access rebuilds it from settings."""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is not None:
+            atexit.unregister(_inventory.stop)
+            _inventory.stop()
+        _inventory = None
@@ -1,23 +1,53 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
 from fakts.models import IonscaleLayer
 from karakter.models import Membership
 from .repo import get_ionscale_repo
 
 
-def sync(layer: IonscaleLayer) -> IonscaleLayer:
+def _policy_hash_key(tailnet: str) -> str:
+    return f"ionscale:policy:{tailnet}"
+
+
+def build_policy(layer: IonscaleLayer) -> dict:
     # Create iam policy for all organization members
-    members = Membership.objects.filter(organization=layer.organization).select_related("user")
+    members = Membership.objects.filter(organization=layer.organization).order_by("user_id").values_list("user_id", flat=True)
 
-    # Build policy
-    policy = {
-        "subs": [str(m.user.pk) for m in members]
+    return {
+        "subs": [str(user_id) for user_id in members]
     }
 
+
+def policy_hash(policy: dict) -> str:
+    return hashlib.sha256(json.dumps(policy, sort_keys=True).encode()).hexdigest()
+
+
+def sync(layer: IonscaleLayer, force: bool = True) -> IonscaleLayer:
+    """Push the layer's policy to ionscale.
+
+    With ``force=False`` the push is skipped when the policy hashes the same as
+    the last one pushed for the tailnet (remembered in the Django cache). That
+    only happens with ``IONSCALE_POLICY_SKIP_UNCHANGED``: a per-process cache
+    doesn't see the pushes of other processes, so its hash may be outdated.
+    """
+    policy = build_policy(layer)
+    digest = policy_hash(policy)
+    key = _policy_hash_key(layer.tailnet_name)
+
+    if not force and settings.IONSCALE_POLICY_SKIP_UNCHANGED and cache.get(key) == digest:
+        return layer
+
     get_ionscale_repo().update_policy(layer.tailnet_name, policy)
+    cache.set(key, digest, None)
 
     return layer
 
 
-def sync_organization_layers(organization) -> None:
-    layers = IonscaleLayer.objects.filter(organization=organization)
+def sync_organization_layers(organization, force: bool = True) -> None:
+    layers = IonscaleLayer.objects.filter(organization=organization).select_related("organization")
     for layer in layers:
-        sync(layer)
\ No newline at end of file
+        sync(layer, force=force)
@@ -14,7 +14,8 @@ from django.utils.module_loading import import_string
 class IonscaleRepo(Protocol):
     """The behaviour the rest of the app depends on.
 
-    Both :class:`IonscaleRepository` (the real CLI-backed implementation) and the
+    :class:`IonscaleRepository` (the real CLI-backed implementation),
+    :class:`~ionscale.api.IonscaleApiRepository` (the server API) and the
     in-memory ``FakeIonscaleRepository`` used in tests satisfy this protocol, so
     consumers can depend on the interface instead of a concrete class.
     """
@@ -29,6 +30,10 @@ class IonscaleRepo(Protocol):
     def help(self, *preargs) -> str: ...
 
 
+class IonscaleOperationUnsupported(RuntimeError):
+    """Raised by a repository that cannot perform an :class:`IonscaleRepo` operation."""
+
+
 class IonscaleRepository:
     def __init__(self, server_url: str, admin_key: str, binary_path: str = "ionscale"):
         """
@@ -330,11 +335,20 @@ def _build_default_repo() -> IonscaleRepo:
     Pluggable via the ``IONSCALE_REPOSITORY`` setting: set it to the dotted path
     of a zero-argument factory (or class) that returns an :class:`IonscaleRepo`
     — e.g. ``"ionscale.testing.FakeIonscaleRepository"`` in tests. When unset, the
-    real CLI-backed :class:`IonscaleRepository` is built from the IONSCALE_* settings.
+    real repository is built from the IONSCALE_* settings: the CLI-backed
+    :class:`IonscaleRepository`, or with ``IONSCALE_CLIENT = "api"`` the
+    :class:`~ionscale.api.IonscaleApiRepository` talking to the server API.
     """
     dotted = getattr(settings, "IONSCALE_REPOSITORY", None)
     if dotted:
         return import_string(dotted)()
+    if getattr(settings, "IONSCALE_CLIENT", "cli") == "api":
+        from .api import IonscaleApiRepository
+
+        return IonscaleApiRepository(
+            server_url=settings.IONSCALE_SERVER_URL,
+            admin_key=settings.IONSCALE_ADMIN_KEY,
+        )
     return IonscaleRepository(
         server_url=settings.IONSCALE_SERVER_URL,
         admin_key=settings.IONSCALE_ADMIN_KEY,
@@ -0,0 +1,153 @@
+"""Debounced ionscale policy sync for membership changes.
+
+Every saved or deleted :class:`karakter.models.Membership` changes the policy
+of its organization's ionscale layers. Pushing it from the signal handler ran
+one ``update_policy`` (a CLI subprocess) per layer inside the request, and a
+bulk invite or ``ensurememberships`` pushed once per row.
+
+The membership signals now :meth:`~PolicySyncQueue.request` a sync of the
+organization once their transaction commits. Requests are collected per
+organization for ``IONSCALE_POLICY_SYNC_DELAY`` seconds and then synced by a
+daemon thread, one ``update_policy`` per layer, skipped when the policy is
+unchanged since the last push (:func:`ionscale.manager.sync`). A failed sync is
+retried with an exponential backoff (capped at ``MAX_BACKOFF`` seconds) and
+given up after ``MAX_ATTEMPTS``; the next membership change requests it again.
+Whatever is queued is synced once more when the process exits. With a delay of ``0`` the sync runs right after the commit.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .manager import sync_organization_layers
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+MAX_BACKOFF = 600
+
+
+class PolicySyncQueue:
+    """Organizations awaiting a policy sync, each with the time it is due."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._due: dict[int, float] = {}
+        self._failures: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def request(self, organization_id: int) -> None:
+        """Sync ``organization_id``'s layers within the delay (requests in between collapse)."""
+        if self.delay <= 0:
+            self._sync_logged(organization_id)
+            return
+        with self._lock:
+            self._due.setdefault(organization_id, time.monotonic() + self.delay)
+        self._wakeup.set()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def flush(self, now: Optional[float] = None) -> int:
+        """Sync the organizations due by ``now`` (all of them if ``None``). Returns how many synced."""
+        with self._lock:
+            due = [org for org, at in self._due.items() if now is None or at <= now]
+            for org in due:
+                del self._due[org]
+
+        synced = 0
+        for organization_id in due:
+            if self._sync_logged(organization_id):
+                synced += 1
+                with self._lock:
+                    self._failures.pop(organization_id, None)
+            else:
+                self._retry(organization_id)
+        return synced
+
+    def _retry(self, organization_id: int) -> None:
+        with self._lock:
+            failures = self._failures.get(organization_id, 0) + 1
+            if failures >= MAX_ATTEMPTS:
+                self._failures.pop(organization_id, None)
+                logger.error("Giving up syncing the ionscale policies of organization %s after %s attempts", organization_id, failures)
+                return
+            self._failures[organization_id] = failures
+            backoff = min(max(self.delay, 1) * 2**failures, MAX_BACKOFF)
+            self._due.setdefault(organization_id, time.monotonic() + backoff)
+
+    def _sync_logged(self, organization_id: int) -> bool:
+        try:
+            sync_organization_layers(organization_id, force=False)
+            return True
+        except Exception:
+            logger.exception("Syncing the ionscale policies of organization %s failed", organization_id)
+            return False
+
+    def start(self) -> None:
+        """Start the sync thread (no-op if running or the delay is 0)."""
+        if self.delay <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ionscale-policy-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the sync thread and sync what is left."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            pending = list(self._due)
+            self._due.clear()
+            self._failures.clear()
+        for organization_id in pending:
+            self._sync_logged(organization_id)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                next_due = min(self._due.values(), default=None)
+            timeout = None if next_due is None else max(next_due - time.monotonic(), 0)
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            self.flush(time.monotonic())
+            # the sync thread owns its connection, recycle it like a request would
+            close_old_connections()
+
+
+_queue: Optional[PolicySyncQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_policy_sync_queue() -> PolicySyncQueue:
+    """Return the process-wide sync queue, starting its thread on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PolicySyncQueue(delay=settings.IONSCALE_POLICY_SYNC_DELAY)
+            _queue.start()
+            atexit.register(_queue.stop)
+        return _queue
+
+
+def reset_policy_sync_queue() -> None:
+    """Stop (and drain) the process-wide queue so the next access rebuilds it from settings."""
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            atexit.unregister(_queue.stop)
+            _queue.stop()
+        _queue = None
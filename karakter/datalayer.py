@@ -1,6 +1,22 @@
+"""S3 / STS access for lok (the "datalayer").
+
+Building a boto3 client loads botocore's service models and resolves the
+endpoint, which costs tens of milliseconds, and every client opens its own
+connection pool. The clients are therefore created lazily, once per process,
+from a dedicated boto3 session (the default session is not thread safe) and
+shared by every thread: boto3 clients themselves are thread safe. Each client
+keeps up to ``AWS_S3_MAX_POOL_CONNECTIONS`` connections open.
+
+Use :func:`get_current_datalayer` to get the shared :class:`Datalayer`;
+:func:`set_datalayer` / :func:`reset_datalayer` swap it (e.g. in tests).
+"""
+
+import threading
 from contextvars import ContextVar
-from functools import cached_property
+from typing import Any, Optional
+
 import boto3
+from botocore.config import Config
 from django.conf import settings
 from strawberry.extensions import SchemaExtension
 
@@ -8,55 +24,85 @@ datalayer: ContextVar = ContextVar("datalayer", default=None)
 
 
 class Datalayer:
+    """Lazily created, process-wide S3 and STS clients."""
+
+    def __init__(self):
+        self._clients: dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._session: Optional[boto3.session.Session] = None
+
+    def _client(self, name: str, service: str, **kwargs):
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                if self._session is None:
+                    self._session = boto3.session.Session()
+                client = self._clients[name] = self._session.client(
+                    service,
+                    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                    region_name=settings.AWS_S3_REGION_NAME,  # region does not matter when using MinIO
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    **kwargs,
+                )
+            return client
+
+    def _config(self, **kwargs) -> Config:
+        return Config(max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS, **kwargs)
+
+    @property
+    def s3(self):
+        """The boto3 S3 client (default signature)"""
+        return self._client("s3", "s3", config=self._config())
 
-    @cached_property
-    def s3(self) -> boto3.Session:
-        """Get a boto3 session for S3 without s3v4 signature"""
-        return boto3.client(
-            "s3",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            region_name=settings.AWS_S3_REGION_NAME,  # region does not matter when using MinIO
-        )
-
-    @cached_property
-    def s3v4(self) -> boto3.Session:
-        """Get a boto3 session for S3 with s3v4 signature"""
-        return boto3.client(
-            "s3",
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            region_name=settings.AWS_S3_REGION_NAME,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=None,
-            config=boto3.session.Config(signature_version="s3v4"),
-            verify=False,
-        )
-
-    @cached_property
-    def sts(self) -> boto3.Session:
-        """Get a boto3 session for STS with s3v4 signature"""
-        return boto3.client(
-            "sts",
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            region_name=settings.AWS_S3_REGION_NAME,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            aws_session_token=None,
-            config=boto3.session.Config(signature_version="s3v4"),
-            verify=False,
-        )
+    @property
+    def s3v4(self):
+        """The boto3 S3 client with s3v4 signature"""
+        return self._client("s3v4", "s3", aws_session_token=None, config=self._config(signature_version="s3v4"), verify=False)
+
+    @property
+    def sts(self):
+        """The boto3 STS client with s3v4 signature"""
+        return self._client("sts", "sts", aws_session_token=None, config=self._config(signature_version="s3v4"), verify=False)
+
+
+_datalayer: Optional[Datalayer] = None
+_datalayer_lock = threading.Lock()
 
 
 def get_current_datalayer() -> Datalayer:
-    return Datalayer()
+    """Return the process-wide datalayer (its clients are created on first use)."""
+    global _datalayer
+    if _datalayer is None:
+        with _datalayer_lock:
+            if _datalayer is None:
+                _datalayer = Datalayer()
+    return _datalayer
 
 
-class DatalayerExtension(SchemaExtension):
+def set_datalayer(layer: Optional[Datalayer]) -> None:
+    """Install an explicit datalayer (e.g. a fake in tests). Pass ``None`` to clear."""
+    global _datalayer
+    _datalayer = layer
+
 
+def reset_datalayer() -> None:
+    """Drop the shared datalayer so the next access rebuilds its clients from settings."""
+    set_datalayer(None)
+
+
+class DatalayerExtension(SchemaExtension):
     def on_operation(self):
-        t1 = datalayer.set(Datalayer())
+        from karakter import presign
+
+        t1 = datalayer.set(get_current_datalayer())
+        # batches the presigned URLs of the whole response (karakter.presign)
+        t2 = presign.loader.set(presign.new_loader())
 
         yield
+        presign.loader.reset(t2)
         datalayer.reset(t1)
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('karakter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invite',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -3,7 +3,6 @@ import secrets
 from typing import Optional, List, Tuple
 
 import requests
-from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
 from django.utils import timezone
@@ -41,16 +40,10 @@ class MediaStore(S3Store):
             datalayer: object exposing ``s3`` boto3 session/client.
             host: optional host to replace the endpoint with when returning.
         """
-        s3 = datalayer.s3
-        url: str = s3.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={
-                "Bucket": self.bucket,
-                "Key": self.key,
-            },
-            ExpiresIn=3600,
-        )
-        return url.replace(getattr(settings, "AWS_S3_ENDPOINT_URL", ""), host or "")
+        from karakter import presign
+
+        # reused until shortly before it expires, see karakter.presign
+        return presign.presigned_url(self.bucket, self.key, host, datalayer=datalayer)
 
     def fill_info(self) -> None:
         """Populate or refresh derived metadata for the stored object."""
@@ -293,7 +286,7 @@ class Invite(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="created_invites")
     created_for = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="invites")
     created_at = models.DateTimeField(auto_now_add=True)
-    expires_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
 
     # Status tracking
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
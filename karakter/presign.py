@@ -0,0 +1,106 @@
+"""Cached, batched presigned URLs for :class:`karakter.models.MediaStore`.
+
+List views resolve an avatar, banner or logo per row, and signing each one
+(SigV4: several HMACs plus request building in botocore) used to dominate
+their CPU time. A signed URL stays valid for ``AWS_QUERYSTRING_EXPIRE``
+seconds, so it is cached per (bucket, key, host) in the process and reused
+until shortly before it expires.
+
+Within a GraphQL operation the ``presigned_url`` fields are additionally
+collected by a per-operation :class:`~strawberry.dataloader.DataLoader`
+(installed by :class:`karakter.datalayer.DatalayerExtension`), so every
+MediaStore of one response is looked up and signed in a single batch, and a
+store that appears several times is signed once.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from django.conf import settings
+from strawberry.dataloader import DataLoader
+
+from karakter.datalayer import Datalayer, get_current_datalayer
+
+MAX_URLS = 4096
+# URLs are reused until this share of their lifetime is left (but at least MIN_MARGIN seconds).
+MARGIN_FRACTION = 0.25
+MIN_MARGIN = 60
+
+UrlKey = tuple[str, str, Optional[str]]
+
+_urls: "OrderedDict[UrlKey, tuple[str, float]]" = OrderedDict()
+_lock = threading.Lock()
+
+loader: ContextVar[Optional[DataLoader]] = ContextVar("presign_loader", default=None)
+
+
+def _reuse_for() -> float:
+    expires_in = settings.AWS_QUERYSTRING_EXPIRE
+    return expires_in - max(expires_in * MARGIN_FRACTION, MIN_MARGIN)
+
+
+def _sign(s3, bucket: str, key: str, host: Optional[str]) -> str:
+    url: str = s3.generate_presigned_url(
+        ClientMethod="get_object",
+        Params={"Bucket": bucket, "Key": key},
+        ExpiresIn=settings.AWS_QUERYSTRING_EXPIRE,
+    )
+    return url.replace(getattr(settings, "AWS_S3_ENDPOINT_URL", ""), host or "")
+
+
+def presigned_urls(keys: Iterable[UrlKey], datalayer: Optional[Datalayer] = None) -> list[str]:
+    """Presigned ``get_object`` URLs for ``(bucket, key, host)`` triples, in order."""
+    keys = list(keys)
+    now = time.monotonic()
+    found: dict[UrlKey, str] = {}
+    with _lock:
+        for url_key in keys:
+            cached = _urls.get(url_key)
+            if cached is not None and cached[1] > now:
+                _urls.move_to_end(url_key)
+                found[url_key] = cached[0]
+
+    missing = [url_key for url_key in dict.fromkeys(keys) if url_key not in found]
+    if missing:
+        s3 = (datalayer or get_current_datalayer()).s3
+        reuse_until = now + _reuse_for()
+        signed = {url_key: _sign(s3, *url_key) for url_key in missing}
+        found.update(signed)
+        if reuse_until > now:
+            with _lock:
+                for url_key, url in signed.items():
+                    _urls[url_key] = (url, reuse_until)
+                    _urls.move_to_end(url_key)
+                while len(_urls) > MAX_URLS:
+                    _urls.popitem(last=False)
+
+    return [found[url_key] for url_key in keys]
+
+
+def presigned_url(bucket: str, key: str, host: Optional[str] = None, datalayer: Optional[Datalayer] = None) -> str:
+    return presigned_urls([(bucket, key, host)], datalayer)[0]
+
+
+async def _load(keys: list[UrlKey]) -> list[str]:
+    return presigned_urls(keys)
+
+
+def new_loader() -> DataLoader:
+    """A loader that signs the URLs requested within one GraphQL operation together."""
+    return DataLoader(load_fn=_load)
+
+
+async def aload(bucket: str, key: str, host: Optional[str] = None) -> str:
+    """The presigned URL of an object, batched with the rest of the current operation."""
+    current = loader.get()
+    if current is None:
+        return presigned_url(bucket, key, host)
+    return await current.load((bucket, key, host))
+
+
+def clear() -> None:
+    with _lock:
+        _urls.clear()
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save, pre_delete
 from django.db.models import Q
 from django.dispatch import receiver
@@ -60,18 +61,21 @@ def notify_user_activation(sender, instance, created, **kwargs):
             # Handle the error as needed, e.g., log it or notify admins
 
 
+def _queue_ionscale_sync(organization_id):
+    from ionscale.sync_queue import get_policy_sync_queue
+
+    # debounced and off the request path, see ionscale.sync_queue
+    transaction.on_commit(lambda: get_policy_sync_queue().request(organization_id))
+
+
 @receiver(post_save, sender=Membership)
 def sync_ionscale_layers_on_membership_save(sender, instance, **kwargs):
-    from ionscale.manager import sync_organization_layers
-
-    sync_organization_layers(instance.organization)
+    _queue_ionscale_sync(instance.organization_id)
 
 
 @receiver(post_delete, sender=Membership)
 def sync_ionscale_layers_on_membership_delete(sender, instance, **kwargs):
-    from ionscale.manager import sync_organization_layers
-
-    sync_organization_layers(instance.organization)
+    _queue_ionscale_sync(instance.organization_id)
 
 
 @receiver(pre_delete, sender=Organization)
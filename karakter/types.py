@@ -1,6 +1,6 @@
 import datetime
 from typing import List, Optional, cast
-from karakter.datalayer import get_current_datalayer
+from karakter import presign
 import strawberry
 import strawberry_django
 from kante.types import Info
@@ -53,9 +53,10 @@ class MediaStore:
     key: str
 
     @strawberry_django.field()
-    def presigned_url(self, info: Info, host: str | None = None) -> str:
-        datalayer = get_current_datalayer()
-        return cast(models.MediaStore, self).get_presigned_url(info, datalayer=datalayer, host=host)
+    async def presigned_url(self, info: Info, host: str | None = None) -> str:
+        # signed together with every other MediaStore of the response
+        store = cast(models.MediaStore, self)
+        return await presign.aload(store.bucket, store.key, host)
 
 
 @strawberry_django.type(
@@ -19,6 +19,9 @@ django_asgi_app = get_asgi_application()
 
 from .schema import schema  # noqa: E402
 from kante.router import router  # noqa: E402
+from fakts.services.reaper import start_reaper  # noqa: E402
+
+start_reaper()
 
 
 application = router(
@@ -8,7 +8,7 @@ with a ``ValidationError`` if they are not supplied via config or environment.
 """
 
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict, Field
 from pydantic_settings import (
@@ -45,6 +45,7 @@ class DjangoSettings(BaseModel):
     language_code: str = Field(default="en-us", description="Django LANGUAGE_CODE.")
     time_zone: str = Field(default="UTC", description="Django TIME_ZONE.")
     log_level: str = Field(default="INFO", description="Root logger level (e.g. DEBUG, INFO, WARNING).")
+    discovery_max_age: int = Field(default=300, description="Cache-Control max-age in seconds of the discovery documents (/.well-known/fakts, /.well-known/openid-configuration, JWKS).")
 
 
 class PostgresSettings(BaseModel):
@@ -70,6 +71,44 @@ class RedisSettings(BaseModel):
     channel_prefix: str = Field(default="lok", description="Key prefix for the channels_redis channel layer.")
 
 
+class CacheSettings(BaseModel):
+    """Django cache backend (``CACHES['default']``) used for hot-path response caches."""
+
+    backend: str = Field(default="locmem", description="Cache backend: 'locmem' (per-process) or 'redis' (shared across processes, uses the redis block's host/port).")
+    redis_db: int = Field(default=1, description="Redis database number used when backend is 'redis' (kept apart from the channel layer).")
+    key_prefix: str = Field(default="lok", description="Prefix prepended to every cache key.")
+
+
+class FaktsSettings(BaseModel):
+    """Tuning knobs for the public fakts protocol endpoints."""
+
+    claim_cache_ttl: int = Field(default=300, description="Seconds a rendered claim answer is cached per client token and request host (at most 5 with the locmem cache backend). 0 disables the claim cache.")
+    logo_revalidate_after: int = Field(default=3600, description="Seconds a fetched manifest logo URL is trusted before it is revalidated (conditional GET with ETag / Last-Modified).")
+    report_ingestion: str = Field(default="direct", description="How /f/report/ is persisted: 'direct' writes each report in its own transaction, 'buffered' acknowledges immediately and coalesces reports per client for periodic bulk writes.")
+    report_flush_interval: float = Field(default=5, description="Seconds between bulk flushes of buffered reports. 0 disables the periodic flush (reports are then only written on shutdown).")
+    reaper_interval: float = Field(default=0, description="Seconds between in-process passes of the expired-row reaper. 0 disables it (run `manage.py reapexpired` from cron instead).")
+    reaper_batch_size: int = Field(default=1000, description="Maximum number of rows the reaper deletes per model and transaction.")
+    challenge_long_poll_max: float = Field(default=30, description="Upper bound in seconds for how long a device-code challenge request may be held open waiting for the user's answer. 0 disables long-polling.")
+    device_code_poll_interval: int = Field(default=5, description="Poll interval in seconds advertised to device-code clients while few codes are pending.")
+    device_code_busy_threshold: int = Field(default=100, description="Every this many pending device codes (of one kind) add another device_code_poll_interval to the advertised interval.")
+    device_code_poll_interval_max: int = Field(default=60, description="Upper bound in seconds for the advertised device-code poll interval.")
+    negative_lookup_ttl: int = Field(default=60, description="Seconds a token or device code that matched no row is remembered, so retries with it are rejected without a query (at most 5 with the locmem cache backend). 0 disables the negative cache.")
+    token_bloom_filter: bool = Field(default=False, description="Keep a per-process Bloom filter of all client, composition and redeem tokens and device codes, so unknown ones are rejected without a query. Needs the redis cache backend; ignored with locmem.")
+    single_flight_shared: bool = Field(default=False, description="Coalesce identical concurrent claim renders across processes through a lock in the Django cache (use with the redis cache backend). Within a process they are always coalesced.")
+    single_flight_result_ttl: int = Field(default=5, description="Seconds the result of a render coalesced across processes is kept for the waiting processes.")
+
+
+class AuthAppSettings(BaseModel):
+    """Tuning knobs for lok's OAuth2 server and the authentication of its own API."""
+
+    auth_context_cache_size: int = Field(default=1024, description="Maximum number of verified tokens (and of expanded user/client/organization/membership contexts) cached per process until the token expires. 0 disables the cache.")
+    auth_context_shared_cache: bool = Field(default=False, description="Also keep expanded auth contexts in the Django cache, so every worker reuses them.")
+    access_token_storage: str = Field(default="persist", description="'persist' stores every issued access token as an OAuth2Token row. 'stateless' stores only refresh tokens; access tokens are verified by signature and revoked early through a revocation list.")
+    claims_profile_ttl: int = Field(default=300, description="Seconds the precomputed token-claims profile of an (OAuth2 client, membership) pair is cached for token issuance (only with the redis cache backend). 0 disables the cache.")
+    introspection_cache_ttl: int = Field(default=300, description="Seconds the state of an active token is cached for the introspection endpoint (never past the token's expiry). 0 disables the cache.")
+    introspection_max_batch: int = Field(default=100, description="Maximum number of tokens per batch introspection request.")
+
+
 class LokSettings(BaseModel):
     """Lok identity-provider key material used by this service."""
 
@@ -105,7 +144,11 @@ class IonscaleSettings(BaseModel):
     admin_key: str = Field(description="Ionscale admin API key. Secret — must be set.")
     coord_url: str = Field(description="Public coordination URL advertised to clients.")
     repository: Optional[str] = Field(default=None, description="Dotted path to an IonscaleRepo factory (tests).")
+    client: Literal["cli", "api"] = Field(default="cli", description="How to reach ionscale: the `ionscale` CLI binary or its server API over HTTP (needs an API key as admin_key).")
     eager_init: bool = Field(default=False, description="Eagerly initialize the ionscale repo on boot (tests).")
+    inventory_ttl: int = Field(default=30, description="Seconds a cached machine listing is served before it is refreshed in the background (0 disables the cache).")
+    inventory_refresh_interval: int = Field(default=60, description="Seconds between background refreshes of every cached tailnet (0 disables them).")
+    policy_sync_delay: float = Field(default=2, description="Seconds membership changes are collected before an organization's policies are pushed (0 pushes right after the commit).")
 
 
 class DatalayerBucket(BaseModel):
@@ -129,6 +172,7 @@ class DatalayerSettings(BaseModel):
     region: str = Field(default="us-east-1", description="S3 region name.")
     default_acl: str = Field(default="private", description="Default ACL applied to stored objects (AWS_DEFAULT_ACL).")
     querystring_expire: int = Field(default=3600, description="Presigned URL lifetime in seconds (AWS_QUERYSTRING_EXPIRE).")
+    max_pool_connections: int = Field(default=10, description="Connections each of the process-wide S3 / STS clients keeps open (AWS_S3_MAX_POOL_CONNECTIONS).")
     file_overwrite: bool = Field(default=False, description="Overwrite existing files on name collision (AWS_S3_FILE_OVERWRITE).")
     secure: Optional[bool] = Field(default=None, description="Use TLS for S3 (AWS_S3_USE_SSL/SECURE_URLS). When None, derived from protocol == 'https'.")
     media: DatalayerBucket = Field(description="Bucket for media / general file storage. Required for this service.")
@@ -184,6 +228,9 @@ class Settings(BaseSettings):
     django: DjangoSettings = Field(description="Core Django settings.")
     postgres: PostgresSettings = Field(description="PostgreSQL connection.")
     redis: RedisSettings = Field(description="Redis connection.")
+    cache: CacheSettings = Field(default_factory=CacheSettings, description="Django cache backend.")
+    fakts: FaktsSettings = Field(default_factory=FaktsSettings, description="Fakts protocol endpoint tuning.")
+    authapp: AuthAppSettings = Field(default_factory=AuthAppSettings, description="OAuth2 server and API authentication tuning.")
     lok: LokSettings = Field(default_factory=LokSettings, description="Lok IdP key material.")
     authentikate: AuthentikateSettings = Field(description="Token-verification config (authentikate).")
     datalayer: DatalayerSettings = Field(description="S3 storage connection and buckets.")
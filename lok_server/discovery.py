@@ -0,0 +1,69 @@
+"""Precomputed discovery documents.
+
+``/.well-known/fakts``, ``/.well-known/openid-configuration`` and the JWKS
+are what every client fetches first, and their content only depends on the
+settings, the signing key and the URL the server is reached under. They are
+therefore built once per (document, scheme, host, script name), serialized,
+and served from memory with a strong ``ETag`` and a public ``Cache-Control``
+so clients and proxies can revalidate them with ``If-None-Match`` (answered
+with a bodyless 304).
+"""
+
+import hashlib
+import json
+import threading
+from typing import Callable
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+# Documents are keyed by the request host, which is client controlled when
+# ALLOWED_HOSTS is permissive, so the table is bounded.
+MAX_DOCUMENTS = 256
+
+_documents: dict[tuple, tuple[bytes, str]] = {}
+_lock = threading.Lock()
+
+
+def _key(name: str, request: HttpRequest) -> tuple:
+    return (name, request.scheme, request.get_host(), request.META.get("SCRIPT_NAME", ""))
+
+
+def _render(build: Callable[[HttpRequest], dict], request: HttpRequest) -> tuple[bytes, str]:
+    body = json.dumps(build(request), separators=(",", ":")).encode()
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def get_document(name: str, build: Callable[[HttpRequest], dict], request: HttpRequest) -> tuple[bytes, str]:
+    """The serialized document ``name`` and its ETag, building it with ``build`` on first use."""
+    key = _key(name, request)
+    document = _documents.get(key)
+    if document is None:
+        document = _render(build, request)
+        with _lock:
+            if len(_documents) >= MAX_DOCUMENTS:
+                _documents.clear()
+            _documents[key] = document
+    return document
+
+
+def serve(name: str, build: Callable[[HttpRequest], dict], request: HttpRequest) -> HttpResponse:
+    """Serve the discovery document ``name`` for ``request``, honouring ``If-None-Match``."""
+    body, etag = get_document(name, build, request)
+
+    known = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in known or "*" in known:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=settings.DISCOVERY_MAX_AGE)
+    return response
+
+
+def clear() -> None:
+    """Forget every built document (e.g. after rotating the signing key)."""
+    with _lock:
+        _documents.clear()
@@ -50,20 +50,37 @@ if conf.ionscale is not None:
     IONSCALE_ADMIN_KEY = conf.ionscale.admin_key
     IONSCALE_COORD_URL = conf.ionscale.coord_url  # thats the public coord url
     IONSCALE_REPOSITORY = conf.ionscale.repository
+    IONSCALE_CLIENT = conf.ionscale.client
     # Configured -> validate the ionscale repository at startup (fail fast).
     IONSCALE_EAGER_INIT = conf.ionscale.eager_init
+    IONSCALE_INVENTORY_TTL = conf.ionscale.inventory_ttl
+    IONSCALE_INVENTORY_REFRESH_INTERVAL = conf.ionscale.inventory_refresh_interval
+    IONSCALE_POLICY_SYNC_DELAY = conf.ionscale.policy_sync_delay
 else:
     IONSCALE_SERVER_URL = None
     IONSCALE_ADMIN_KEY = None
     IONSCALE_COORD_URL = None
     IONSCALE_REPOSITORY = None
+    IONSCALE_CLIENT = "cli"
     IONSCALE_EAGER_INIT = False
+    IONSCALE_INVENTORY_TTL = 30
+    IONSCALE_INVENTORY_REFRESH_INTERVAL = 60
+    IONSCALE_POLICY_SYNC_DELAY = 2
 
 # IONSCALE_REPOSITORY: dotted path to a zero-arg factory returning an
 # ionscale.repo.IonscaleRepo. When None, the real CLI-backed IonscaleRepository is
-# used. Tests point it at ionscale.testing.FakeIonscaleRepository (see settings_test).
+# used, or the HTTP ionscale.api.IonscaleApiRepository when IONSCALE_CLIENT = "api".
+# Tests point it at ionscale.testing.FakeIonscaleRepository (see settings_test).
 # IONSCALE_EAGER_INIT: when True, ionscale.apps.IonscaleConfig.ready() builds the
 # repository at boot so misconfiguration fails fast.
+# IONSCALE_INVENTORY_*: machine listings are cached per tailnet and refreshed in
+# the background, see ionscale.inventory.
+# IONSCALE_POLICY_SYNC_DELAY: membership changes are synced debounced per
+# organization, see ionscale.sync_queue.
+# IONSCALE_POLICY_SKIP_UNCHANGED: skip pushing a policy that hashes the same as
+# the last push. The hash is kept in the Django cache, so only the shared redis
+# backend sees every process's pushes; with per-process locmem always push.
+IONSCALE_POLICY_SKIP_UNCHANGED = conf.cache.backend == "redis"
 
 INSTALLED_APPS = [
     "daphne",
@@ -124,7 +141,7 @@ SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https") if conf.django.sec
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "lok_server.middleware.AsyncWhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -149,6 +166,8 @@ AWS_S3_ENDPOINT_URL = f"{conf.datalayer.protocol}://{conf.datalayer.host}:{conf.
 AWS_S3_URL_PROTOCOL = f"{conf.datalayer.protocol}:"
 AWS_S3_FILE_OVERWRITE = conf.datalayer.file_overwrite
 AWS_QUERYSTRING_EXPIRE = conf.datalayer.querystring_expire
+# per S3 / STS client, which are shared process-wide (karakter.datalayer)
+AWS_S3_MAX_POOL_CONNECTIONS = conf.datalayer.max_pool_connections
 AWS_S3_REGION_NAME = conf.datalayer.region
 
 MEDIA_BUCKET = conf.datalayer.media.bucket
@@ -168,6 +187,68 @@ CHANNEL_LAYERS = {
     },
 }
 
+if conf.cache.backend == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": f"redis://{conf.redis.host}:{conf.redis.port}/{conf.cache.redis_db}",
+            "KEY_PREFIX": conf.cache.key_prefix,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "KEY_PREFIX": conf.cache.key_prefix,
+        },
+    }
+
+# The fakts caches below are invalidated through the Django cache, which only
+# reaches every process with the shared redis backend. With per-process locmem
+# they are turned off or kept to a few seconds.
+FAKTS_SHARED_CACHE = conf.cache.backend == "redis"
+# Seconds a rendered /f/claim/ answer is cached (0 disables). Invalidated by
+# the model signals in fakts.signals.
+FAKTS_CLAIM_CACHE_TTL = conf.fakts.claim_cache_ttl
+FAKTS_CHALLENGE_LONG_POLL_MAX = conf.fakts.challenge_long_poll_max
+# Poll interval advertised to device-code clients, scaled with the number of
+# pending codes (see fakts.services.poll_pacing)
+FAKTS_DEVICE_CODE_POLL_INTERVAL = conf.fakts.device_code_poll_interval
+FAKTS_DEVICE_CODE_BUSY_THRESHOLD = conf.fakts.device_code_busy_threshold
+FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX = conf.fakts.device_code_poll_interval_max
+# Unknown tokens / device codes on the public fakts endpoints are answered
+# without a query, see fakts.services.token_filter
+FAKTS_NEGATIVE_LOOKUP_TTL = conf.fakts.negative_lookup_ttl
+FAKTS_TOKEN_BLOOM_FILTER = conf.fakts.token_bloom_filter
+# Share identical concurrent claim renders across processes, see
+# fakts.services.single_flight
+FAKTS_SINGLE_FLIGHT_SHARED = conf.fakts.single_flight_shared
+FAKTS_SINGLE_FLIGHT_RESULT_TTL = conf.fakts.single_flight_result_ttl
+FAKTS_LOGO_REVALIDATE_AFTER = conf.fakts.logo_revalidate_after
+FAKTS_REPORT_INGESTION = conf.fakts.report_ingestion
+FAKTS_REPORT_FLUSH_INTERVAL = conf.fakts.report_flush_interval
+FAKTS_REAPER_INTERVAL = conf.fakts.reaper_interval
+FAKTS_REAPER_BATCH_SIZE = conf.fakts.reaper_batch_size
+
+# Per-process cache of verified tokens and expanded auth contexts (0 disables).
+# Invalidated by the model signals in authapp.signals.
+AUTHAPP_AUTH_CONTEXT_CACHE_SIZE = conf.authapp.auth_context_cache_size
+AUTHAPP_AUTH_CONTEXT_SHARED_CACHE = conf.authapp.auth_context_shared_cache
+# Cached auth contexts and introspection states are invalidated through
+# generation keys in the Django cache. Those only reach every process with the
+# shared redis backend; with per-process locmem those caches stay off.
+AUTHAPP_SHARED_GENERATIONS = conf.cache.backend == "redis"
+# "persist" or "stateless" (only refresh tokens are stored, see authapp.server)
+AUTHAPP_ACCESS_TOKEN_STORAGE = conf.authapp.access_token_storage
+# Seconds the token-claims profile of an (OAuth2 client, membership) is cached
+# (0 disables). Also invalidated by authapp.signals; only cached with
+# AUTHAPP_SHARED_GENERATIONS.
+AUTHAPP_CLAIMS_PROFILE_TTL = conf.authapp.claims_profile_ttl
+# Seconds active token states are cached for /o/introspect/ (0 disables), see
+# authapp.introspection
+AUTHAPP_INTROSPECTION_CACHE_TTL = conf.authapp.introspection_cache_ttl
+AUTHAPP_INTROSPECTION_MAX_BATCH = conf.authapp.introspection_max_batch
+
 
 ROOT_URLCONF = "lok_server.urls"
 
@@ -272,6 +353,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CSRF_TRUSTED_ORIGINS = conf.django.csrf_trusted_origins
 MY_SCRIPT_NAME = conf.django.force_script_name
+# max-age of the precomputed discovery documents, see lok_server.discovery
+DISCOVERY_MAX_AGE = conf.django.discovery_max_age
 STATIC_URL = MY_SCRIPT_NAME.lstrip("/") + "/" + "static/"
 
 # WhiteNoise serves static directly from the staticfiles finders at request time
@@ -16,11 +16,21 @@ DATABASES["default"] = {
 
 AUTHENTIKATE = {**AUTHENTIKATE, "static_tokens": {"test": {"sub": "1", "active_org": "testorg"}}}
 
+# Tests run in a single process, so the locmem cache is as good as a shared one.
+AUTHAPP_SHARED_GENERATIONS = True
+FAKTS_SHARED_CACHE = True
+
 # Never touch the real ionscale CLI in tests: build the in-memory fake by default.
 # The ``_reset_ionscale_repo`` autouse fixture rebuilds it fresh per test.
 IONSCALE_REPOSITORY = "ionscale.testing.FakeIonscaleRepository"
 # Don't fail-fast / eagerly build the repo at boot during tests.
 IONSCALE_EAGER_INIT = False
+# No periodic ionscale inventory refresher thread in tests.
+IONSCALE_INVENTORY_REFRESH_INTERVAL = 0
+# Push ionscale policies right after the commit instead of from a sync thread.
+IONSCALE_POLICY_SYNC_DELAY = 0
+# Tests run in a single process, so the locmem cache sees every push.
+IONSCALE_POLICY_SKIP_UNCHANGED = True
 
 # Disable migrations for faster tests
 class DisableMigrations:
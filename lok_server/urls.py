@@ -66,6 +66,6 @@ urlpatterns = [
     dynamicpath("accounts/", include("karakter.urls")),
     dynamicpath("_allauth/", include("allauth.headless.urls")),
     dynamicpath(".well-known/fakts-challenge", fakts_challenge, name="fakts-challenge"),
-    dynamicpath(".well-known/fakts", WellKnownFakts.as_view()),
+    dynamicpath(".well-known/fakts", WellKnownFakts.as_view(), name="well_known_fakts"),
     dynamicpath(".well-known/openid-configuration", open_id_configuration, name="openid_configuration"),
 ]
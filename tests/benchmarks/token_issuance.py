@@ -0,0 +1,231 @@
+"""Benchmark of the OAuth2 token endpoint (``authapp.views.issue_token``).
+
+Seeds organizations, memberships and fakts clients with :mod:`tests.factories`
+and drives ``client_credentials``, ``authorization_code`` and ``refresh_token``
+grants through the Django test client against ``/o/token/``. For every grant it
+reports throughput, latency percentiles, queries per request and where the time
+goes, split into stages:
+
+* ``client_auth`` -- looking up and authenticating the OAuth2 client
+* ``credential`` -- looking up the authorization code / refresh token
+* ``claims`` -- assembling the access-token claims
+* ``signing`` -- the rest of access-token generation (key import, RS256 signing)
+* ``persist`` -- storing the token and retiring the used code / refresh token
+* ``other`` -- everything else (request parsing, id_token, response rendering)
+
+Stage times are exclusive: nested stages are not counted twice.
+
+Run it against a throwaway test database::
+
+    python -m tests.benchmarks.token_issuance --organizations 10 --clients 5 --requests 500
+
+Settings are taken from ``DJANGO_SETTINGS_MODULE`` (default
+``lok_server.settings_test``), so e.g. ``AUTHAPP__ACCESS_TOKEN_STORAGE=stateless``
+benchmarks the stateless mode.
+"""
+
+import argparse
+import itertools
+import os
+import secrets
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+from unittest import mock
+
+GRANTS = ("client_credentials", "authorization_code", "refresh_token")
+
+
+@dataclass
+class GrantReport:
+    """Measurements for one grant type."""
+
+    grant: str
+    requests: int
+    seconds: float
+    latencies: list[float]
+    queries: list[int]
+    stages: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+    def percentile(self, p: int) -> float:
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[p - 1]
+
+
+class StageTimer:
+    """Accumulates exclusive wall time per stage for patched callables."""
+
+    def __init__(self):
+        self.totals: dict[str, float] = {}
+        self._stack: list[list[float]] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._stack.append([time.perf_counter(), 0.0])
+        try:
+            yield
+        finally:
+            started, children = self._stack.pop()
+            elapsed = time.perf_counter() - started
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed - children
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+
+        return timed
+
+    @contextmanager
+    def instrument(self) -> Iterator["StageTimer"]:
+        """Patch the token endpoint's building blocks to report into this timer."""
+        from authapp import grants, server
+        from authapp.token_generators import MyJWTBearerTokenGenerator
+
+        targets = {
+            "client_auth": [(server.LokAuthorizationServer, "authenticate_client")],
+            "credential": [
+                (grants.AuthorizationCodeGrant, "query_authorization_code"),
+                (grants.RefreshTokenGrant, "authenticate_refresh_token"),
+            ],
+            "claims": [(MyJWTBearerTokenGenerator, "get_extra_claims")],
+            "signing": [(MyJWTBearerTokenGenerator, "generate")],
+            "persist": [
+                (server.LokAuthorizationServer, "save_token"),
+                (grants.AuthorizationCodeGrant, "delete_authorization_code"),
+                (grants.RefreshTokenGrant, "revoke_old_credential"),
+            ],
+        }
+
+        with ExitStack() as stack:
+            for name, callables in targets.items():
+                for owner, attr in callables:
+                    stack.enter_context(mock.patch.object(owner, attr, self.wrap(name, getattr(owner, attr))))
+            yield self
+
+
+def seed(organizations: int, clients_per_organization: int) -> list:
+    """Create ``organizations`` x ``clients_per_organization`` fakts clients with OAuth2 clients."""
+    from tests import factories
+
+    clients = []
+    for _ in range(organizations):
+        organization = factories.make_organization()
+        for _ in range(clients_per_organization):
+            membership = factories.make_membership(organization=organization)
+            clients.append(factories.make_client(membership=membership).oauth2_client)
+    return clients
+
+
+def _prepare(grant: str, oauth2_client) -> dict:
+    """Create what one request of ``grant`` consumes and return its form data."""
+    from authapp.models import AuthorizationCode, OAuth2Token, token_digest
+
+    data = {"grant_type": grant, "client_id": oauth2_client.client_id, "client_secret": oauth2_client.client_secret}
+    membership = oauth2_client.client.membership
+
+    if grant == "client_credentials":
+        data["scope"] = "openid profile"
+    elif grant == "authorization_code":
+        code = secrets.token_urlsafe(24)
+        AuthorizationCode.objects.create(membership=membership, client_id=oauth2_client.client_id, code=code, redirect_uri="http://localhost/callback", scope="openid profile", nonce=secrets.token_urlsafe(8))
+        data.update(code=code, redirect_uri="http://localhost/callback")
+    elif grant == "refresh_token":
+        refresh_token = secrets.token_urlsafe(48)
+        OAuth2Token.objects.create(user=membership, client_id=oauth2_client.client_id, token_type="Bearer", refresh_token_digest=token_digest(refresh_token), scope="openid profile", expires_in=3600)
+        data["refresh_token"] = refresh_token
+    else:
+        raise ValueError(f"Unknown grant {grant}")
+
+    return data
+
+
+def benchmark_grant(grant: str, oauth2_clients: list, requests: int) -> GrantReport:
+    """Issue ``requests`` tokens of ``grant``, round-robin over ``oauth2_clients``."""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    http = Client()
+    url = reverse("token")
+    payloads = [_prepare(grant, oauth2_client) for oauth2_client, _ in zip(itertools.cycle(oauth2_clients), range(requests))]
+    latencies, queries = [], []
+
+    with StageTimer().instrument() as timer:
+        started = time.perf_counter()
+        for data in payloads:
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = http.post(url, data=data, secure=True)
+                latencies.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                raise RuntimeError(f"{grant} request failed: {response.status_code} {response.content!r}")
+            queries.append(len(captured))
+        seconds = time.perf_counter() - started
+
+    stages = dict(timer.totals)
+    stages["other"] = max(sum(latencies) - sum(stages.values()), 0.0)
+    return GrantReport(grant=grant, requests=requests, seconds=seconds, latencies=latencies, queries=queries, stages=stages)
+
+
+def run_benchmark(grants=GRANTS, organizations: int = 5, clients_per_organization: int = 4, requests: int = 200) -> list[GrantReport]:
+    """Seed the database and benchmark every grant in ``grants``."""
+    oauth2_clients = seed(organizations, clients_per_organization)
+    return [benchmark_grant(grant, oauth2_clients, requests) for grant in grants]
+
+
+def format_report(reports: list[GrantReport]) -> str:
+    stage_names = ["client_auth", "credential", "claims", "signing", "persist", "other"]
+    lines = [
+        f"{'grant':<20} {'req':>6} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'queries':>8}",
+    ]
+    for r in reports:
+        lines.append(
+            f"{r.grant:<20} {r.requests:>6} {r.throughput:>9.1f} {r.percentile(50) * 1000:>8.2f} {r.percentile(90) * 1000:>8.2f} "
+            f"{r.percentile(99) * 1000:>8.2f} {max(r.latencies) * 1000:>8.2f} {statistics.mean(r.queries):>8.1f}"
+        )
+
+    lines += ["", "per-request stage breakdown (ms, exclusive)", f"{'grant':<20} " + " ".join(f"{name:>11}" for name in stage_names)]
+    for r in reports:
+        lines.append(f"{r.grant:<20} " + " ".join(f"{r.stages.get(name, 0.0) / r.requests * 1000:>11.3f}" for name in stage_names))
+    return "\n".join(lines)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--grant", action="append", choices=GRANTS, help="Grant(s) to benchmark (default: all)")
+    parser.add_argument("--organizations", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=4, help="Clients per organization")
+    parser.add_argument("--requests", type=int, default=200, help="Token requests per grant")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lok_server.settings_test")
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        reports = run_benchmark(args.grant or GRANTS, args.organizations, args.clients, args.requests)
+        print(format_report(reports))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    main()
@@ -54,18 +54,46 @@ def build_auth_context(user, organization, oauth2_client, roles=("admin",)) -> H
     )
 
 
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    """Start every test with an empty (locmem) cache so cached claims don't leak."""
+    from django.core.cache import cache
+    from authapp import auth_cache, introspection
+    from fakts.services import token_filter
+    from lok_server import discovery
+
+    cache.clear()
+    auth_cache.clear()
+    introspection.states.clear()
+    discovery.clear()
+    token_filter.clear()
+    yield
+    cache.clear()
+    auth_cache.clear()
+    introspection.states.clear()
+    discovery.clear()
+    token_filter.clear()
+
+
 @pytest.fixture(autouse=True)
 def _reset_ionscale_repo():
     """Give every test a fresh ionscale repository with no leaked state.
 
     The test settings point ``IONSCALE_REPOSITORY`` at ``FakeIonscaleRepository``,
     so the rebuilt repo is the in-memory fake — no CLI, no binary, no network.
+    The machine inventory and policy sync queue built on it are dropped as well.
     """
+    from ionscale.inventory import reset_machine_inventory
     from ionscale.repo import reset_ionscale_repo
+    from ionscale.sync_queue import reset_policy_sync_queue
 
     reset_ionscale_repo()
+    reset_machine_inventory()
+    reset_policy_sync_queue()
     yield
+    reset_policy_sync_queue()
     reset_ionscale_repo()
+    reset_machine_inventory()
 
 
 @pytest.fixture
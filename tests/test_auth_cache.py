@@ -0,0 +1,111 @@
+"""Tests for the cached auth contexts of ``AuthAppExtension``."""
+
+import datetime
+
+import pytest
+from asgiref.sync import async_to_sync
+from authentikate.base_models import JWTToken
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from authapp import auth_cache
+from authapp.extension import AuthAppExtension
+from tests import factories
+
+
+def _token(fakts_client, raw="raw-token") -> JWTToken:
+    membership = fakts_client.membership
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return JWTToken(
+        sub=str(membership.user_id),
+        iss="lok",
+        exp=now + datetime.timedelta(hours=1),
+        iat=now,
+        active_org=membership.organization.slug,
+        client_id=fakts_client.oauth2_client.client_id,
+        preferred_username=membership.user.username,
+        roles=[],
+        scope="openid",
+        raw=raw,
+    )
+
+
+def _expand(token):
+    return async_to_sync(AuthAppExtension().aexpand_token_context)(token)
+
+
+@pytest.mark.django_db
+def test_expansion_is_one_query_then_cached():
+    fakts_client = factories.make_client()
+    token = _token(fakts_client)
+
+    with CaptureQueriesContext(connection) as queries:
+        user, client, organization, membership = _expand(token)
+    assert len(queries) == 1
+    assert (user, client, organization, membership) == (fakts_client.user, fakts_client, fakts_client.organization, fakts_client.membership)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert _expand(token)[1] == fakts_client
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_membership_change_invalidates_cached_context(django_capture_on_commit_callbacks):
+    fakts_client = factories.make_client()
+    token = _token(fakts_client)
+    _expand(token)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        fakts_client.membership.save()
+
+    with CaptureQueriesContext(connection) as queries:
+        _expand(token)
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_evicted_generation_invalidates_cached_context():
+    fakts_client = factories.make_client()
+    token = _token(fakts_client)
+    _expand(token)
+
+    cache.delete(auth_cache.generation_key("membership", f"{token.sub}:{token.active_org}"))
+
+    with CaptureQueriesContext(connection) as queries:
+        _expand(token)
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_contexts_are_not_cached_without_shared_generations(settings):
+    settings.AUTHAPP_SHARED_GENERATIONS = False
+    fakts_client = factories.make_client()
+    token = _token(fakts_client)
+    _expand(token)
+
+    with CaptureQueriesContext(connection) as queries:
+        _expand(token)
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_falls_back_when_token_user_does_not_own_client():
+    fakts_client = factories.make_client()
+    other = factories.make_membership(organization=fakts_client.organization)
+    token = _token(fakts_client).model_copy(update={"sub": str(other.user_id)})
+
+    user, client, organization, membership = _expand(token)
+
+    assert (user, client, membership) == (other.user, fakts_client, other)
+
+
+@pytest.mark.django_db
+def test_verified_tokens_are_served_to_authentikate():
+    fakts_client = factories.make_client()
+    token = _token(fakts_client, raw="header.payload.signature")
+    static_tokens = AuthAppExtension().get_settings().static_tokens
+
+    assert "header.payload.signature" not in static_tokens
+    _expand(token)
+    assert static_tokens["header.payload.signature"] == token
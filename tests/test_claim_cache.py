@@ -0,0 +1,137 @@
+"""Tests for the cached ``/f/claim/`` answers and their signal-driven invalidation."""
+
+import json
+
+import pytest
+from django.core.cache.backends import locmem
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fakts import models
+from fakts.services import claim_cache
+from tests import factories
+
+
+def _claim(client, token, secure=False):
+    return client.post(reverse("fakts:claim"), data=json.dumps({"token": token, "secure": secure}), content_type="application/json").json()
+
+
+def _client_with_mapping():
+    fakts_client = factories.make_client()
+    instance = factories.make_service_instance()
+    models.InstanceAlias.objects.create(instance=instance, host="db.example.com", port=5432, kind="absolute")
+    models.ServiceInstanceMapping.objects.create(client=fakts_client, instance=instance, key="db")
+    return fakts_client, instance
+
+
+@pytest.mark.django_db
+def test_repeated_claim_is_served_from_cache_without_queries(client):
+    fakts_client, _ = _client_with_mapping()
+
+    first = _claim(client, fakts_client.token)
+
+    with CaptureQueriesContext(connection) as queries:
+        second = _claim(client, fakts_client.token)
+
+    assert first == second
+    assert second["status"] == "granted"
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_claim_cache_is_keyed_by_request_context(client):
+    fakts_client, _ = _client_with_mapping()
+
+    plain = _claim(client, fakts_client.token)
+    other_host = client.post(
+        reverse("fakts:claim"),
+        data=json.dumps({"token": fakts_client.token}),
+        content_type="application/json",
+        HTTP_HOST="other.example.com:8443",
+    ).json()
+
+    assert plain["config"]["self"]["alias"]["host"] != other_host["config"]["self"]["alias"]["host"]
+    assert other_host["config"]["self"]["alias"]["port"] == 8443
+
+
+@pytest.mark.django_db
+def test_alias_change_invalidates_cached_claim(client, django_capture_on_commit_callbacks):
+    fakts_client, instance = _client_with_mapping()
+    _claim(client, fakts_client.token)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        alias = instance.aliases.get()
+        alias.host = "moved.example.com"
+        alias.save()
+
+    body = _claim(client, fakts_client.token)
+    assert body["config"]["instances"]["db"]["aliases"][0]["host"] == "moved.example.com"
+
+
+@pytest.mark.django_db
+def test_mapping_delete_invalidates_cached_claim(client, django_capture_on_commit_callbacks):
+    fakts_client, _ = _client_with_mapping()
+    assert "db" in _claim(client, fakts_client.token)["config"]["instances"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        fakts_client.mappings.all().delete()
+
+    assert _claim(client, fakts_client.token)["config"]["instances"] == {}
+
+
+@pytest.mark.django_db
+def test_rotated_client_token_stops_answering_from_cache(client, django_capture_on_commit_callbacks):
+    fakts_client, _ = _client_with_mapping()
+    old_token = fakts_client.token
+    _claim(client, old_token)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        fakts_client.token = "rotated-token"
+        fakts_client.save()
+
+    assert _claim(client, old_token)["status"] == "error"
+    assert _claim(client, "rotated-token")["status"] == "granted"
+
+
+@pytest.mark.django_db
+def test_report_does_not_invalidate_cached_claim(client, django_capture_on_commit_callbacks):
+    fakts_client, _ = _client_with_mapping()
+    _claim(client, fakts_client.token)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        client.post(reverse("fakts:report"), data=json.dumps({"token": fakts_client.token, "functional": False}), content_type="application/json")
+
+    assert callbacks == []
+
+
+@pytest.mark.django_db
+def test_claim_cache_disabled_with_zero_ttl(client, settings):
+    settings.FAKTS_CLAIM_CACHE_TTL = 0
+    fakts_client, _ = _client_with_mapping()
+    _claim(client, fakts_client.token)
+
+    with CaptureQueriesContext(connection) as queries:
+        _claim(client, fakts_client.token)
+
+    assert len(queries) > 0
+
+
+@pytest.mark.django_db
+def test_claims_expire_quickly_without_a_shared_cache(client, settings, monkeypatch):
+    settings.FAKTS_SHARED_CACHE = False
+    settings.FAKTS_CLAIM_CACHE_TTL = 300
+    now = [1000.0]
+    monkeypatch.setattr(locmem.time, "time", lambda: now[0])
+    fakts_client, _ = _client_with_mapping()
+    _claim(client, fakts_client.token)
+
+    with CaptureQueriesContext(connection) as queries:
+        _claim(client, fakts_client.token)
+    assert len(queries) == 0
+
+    # other workers' invalidations never reach this cache: the entry has to expire
+    now[0] += claim_cache.LOCAL_TTL + 1
+    with CaptureQueriesContext(connection) as queries:
+        assert _claim(client, fakts_client.token)["status"] == "granted"
+    assert len(queries) > 0
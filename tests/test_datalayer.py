@@ -0,0 +1,58 @@
+"""The process-wide S3 / STS clients of the datalayer (karakter.datalayer)."""
+
+import threading
+
+import pytest
+
+from karakter import datalayer
+
+
+@pytest.fixture(autouse=True)
+def _fresh_datalayer():
+    datalayer.reset_datalayer()
+    yield
+    datalayer.reset_datalayer()
+
+
+def test_datalayer_is_shared_process_wide():
+    from api.management.datalayer import get_current_datalayer as management_datalayer
+
+    assert datalayer.get_current_datalayer() is datalayer.get_current_datalayer()
+    assert management_datalayer() is datalayer.get_current_datalayer()
+
+
+def test_clients_are_created_once_with_the_configured_pool(settings):
+    settings.AWS_S3_MAX_POOL_CONNECTIONS = 32
+    layer = datalayer.get_current_datalayer()
+
+    assert layer.s3 is layer.s3
+    assert layer.s3.meta.config.max_pool_connections == 32
+    assert layer.s3v4.meta.config.signature_version == "s3v4"
+    assert layer.sts.meta.service_model.service_name == "sts"
+
+
+def test_concurrent_first_use_builds_one_client():
+    layer = datalayer.get_current_datalayer()
+    barrier = threading.Barrier(8)
+    clients = []
+
+    def use():
+        barrier.wait()
+        clients.append(layer.s3v4)
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(client) for client in clients}) == 1
+
+
+def test_extension_exposes_the_shared_datalayer():
+    extension = datalayer.DatalayerExtension()
+    operation = extension.on_operation()
+    next(operation)
+    assert datalayer.datalayer.get() is datalayer.get_current_datalayer()
+    next(operation, None)
+    assert datalayer.datalayer.get() is None
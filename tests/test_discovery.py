@@ -0,0 +1,59 @@
+"""Precomputed, ETag-served discovery documents (lok_server.discovery)."""
+
+import pytest
+from django.urls import reverse
+
+DOCUMENTS = ["well_known_fakts", "openid_configuration", "jwks"]
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_documents_carry_etag_and_cache_control(client, name, settings):
+    settings.DISCOVERY_MAX_AGE = 120
+
+    response = client.get(reverse(name), secure=True)
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/json"
+    assert response["ETag"].startswith('"')
+    assert "public" in response["Cache-Control"]
+    assert "max-age=120" in response["Cache-Control"]
+
+
+@pytest.mark.parametrize("name", DOCUMENTS)
+def test_matching_if_none_match_answers_304(client, name):
+    etag = client.get(reverse(name), secure=True)["ETag"]
+
+    response = client.get(reverse(name), secure=True, HTTP_IF_NONE_MATCH=f'"other", {etag}')
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response["ETag"] == etag
+
+
+def test_stale_etag_gets_the_document(client):
+    response = client.get(reverse("openid_configuration"), secure=True, HTTP_IF_NONE_MATCH='"outdated"')
+
+    assert response.status_code == 200
+    assert response.json()["jwks_uri"] == "https://testserver" + reverse("jwks")
+
+
+def test_documents_are_built_per_host(client):
+    first = client.get(reverse("openid_configuration"), secure=True, HTTP_HOST="a.example")
+    second = client.get(reverse("openid_configuration"), secure=True, HTTP_HOST="b.example")
+
+    assert first.json()["token_endpoint"].startswith("https://a.example/")
+    assert second.json()["token_endpoint"].startswith("https://b.example/")
+    assert first["ETag"] != second["ETag"]
+
+
+def test_documents_are_built_once(client, monkeypatch):
+    from authapp import views
+
+    calls = []
+    build = views._open_id_configuration
+    monkeypatch.setattr(views, "_open_id_configuration", lambda request: calls.append(1) or build(request))
+
+    for _ in range(3):
+        assert client.get(reverse("openid_configuration"), secure=True).status_code == 200
+
+    assert len(calls) == 1
@@ -1,11 +1,13 @@
 """End-to-end HTTP tests for the Fakts protocol endpoints (fakts/views.py)."""
 
+import asyncio
 import json
 
 import pytest
+from asgiref.sync import sync_to_async
 from django.urls import reverse
 
-from fakts import models
+from fakts import models, views
 from tests import factories
 
 
@@ -182,3 +184,78 @@ def test_claim_unknown_token_errors(client):
     body = _post(client, "fakts:claim", {"token": "missing"}).json()
     assert body["status"] == "error"
     assert body["message"] == "No Client found for this token"
+
+
+@pytest.mark.parametrize(
+    "view",
+    [
+        views.WellKnownFakts,
+        views.StartChallengeView,
+        views.ServiceStartChallengeView,
+        views.CompositionStartChallengeView,
+        views.ChallengeView,
+        views.ServiceChallengeView,
+        views.CompositionChallengeView,
+        views.RetrieveView,
+        views.RedeemView,
+        views.ClaimView,
+        views.ClaimCompositionView,
+        views.ReportView,
+    ],
+)
+def test_protocol_views_are_async(view):
+    # async handlers run on the event loop instead of the single sync thread
+    assert view.view_is_async
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_concurrent_claims_through_async_client(async_client):
+    fakts_client = await sync_to_async(factories.make_client)()
+
+    responses = await asyncio.gather(
+        *[async_client.post(reverse("fakts:claim"), data=json.dumps({"token": fakts_client.token}), content_type="application/json") for _ in range(5)]
+    )
+
+    assert [r.json()["status"] for r in responses] == ["granted"] * 5
+
+
+def _attach_client_and_notify(device_code):
+    from fakts.services import challenges
+
+    device_code.client = factories.make_client()
+    device_code.save()
+    challenges.notify_challenge("client", device_code.pk)
+    return device_code.client.token
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_challenge_long_poll_wakes_on_resolution(async_client):
+    device_code = await sync_to_async(factories.make_device_code)()
+
+    async def _challenge():
+        return await async_client.post(reverse("fakts:challenge"), data=json.dumps({"code": device_code.code, "wait": 10}), content_type="application/json")
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    pending = asyncio.create_task(_challenge())
+    await asyncio.sleep(0.2)
+    assert not pending.done()
+
+    token = await sync_to_async(_attach_client_and_notify)(device_code)
+    body = (await asyncio.wait_for(pending, 5)).json()
+
+    assert body == {"status": "granted", "token": token}
+    assert loop.time() - started < 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_challenge_long_poll_times_out_as_pending(async_client, settings):
+    settings.FAKTS_CHALLENGE_LONG_POLL_MAX = 0.2
+    device_code = await sync_to_async(factories.make_device_code)()
+
+    body = (await async_client.post(reverse("fakts:challenge"), data=json.dumps({"code": device_code.code, "wait": 30}), content_type="application/json")).json()
+
+    assert body["status"] == "pending"
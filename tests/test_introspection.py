@@ -0,0 +1,170 @@
+"""Token introspection (RFC 7662) endpoints of the OAuth2 server."""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from authapp.models import OAuth2Token, token_digest
+from authapp.revocation import access_token_jti, revoke
+from tests import factories
+
+
+@pytest.fixture
+def oauth2(db):
+    oauth2 = factories.make_client().oauth2_client
+    oauth2.scope = "openid profile email introspection"
+    oauth2.save()
+    return oauth2
+
+
+def _access_token(client, oauth2) -> str:
+    response = client.post(
+        reverse("token"),
+        data={"grant_type": "client_credentials", "client_id": oauth2.client_id, "client_secret": oauth2.client_secret, "scope": "profile"},
+        secure=True,
+    )
+    assert response.status_code == 200, response.content
+    return response.json()["access_token"]
+
+
+def _introspect(client, oauth2, token):
+    return client.post(reverse("introspect"), data={"token": token, "client_id": oauth2.client_id, "client_secret": oauth2.client_secret}, secure=True)
+
+
+def test_active_access_token(client, oauth2):
+    token = _access_token(client, oauth2)
+
+    response = _introspect(client, oauth2, token)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["active"] is True
+    assert body["token_type"] == "access_token"
+    assert body["client_id"] == oauth2.client_id
+    assert body["active_org"] == oauth2.client.organization.slug
+    assert body["jti"] == access_token_jti(token)
+
+
+def test_unknown_token_is_inactive(client, oauth2):
+    assert _introspect(client, oauth2, "not-a-token").json() == {"active": False}
+
+
+def test_requires_client_authentication(client, oauth2):
+    token = _access_token(client, oauth2)
+
+    response = client.post(reverse("introspect"), data={"token": token, "client_id": oauth2.client_id, "client_secret": "wrong"}, secure=True)
+
+    assert response.status_code == 401
+
+
+def test_requires_the_introspection_scope(client, oauth2):
+    token = _access_token(client, oauth2)
+    oauth2.scope = "openid profile email"
+    oauth2.save()
+
+    response = _introspect(client, oauth2, token)
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "unauthorized_client"
+
+
+def test_cached_answer_needs_no_queries(client, oauth2):
+    token = _access_token(client, oauth2)
+    _introspect(client, oauth2, token)
+
+    from authapp.introspection import introspect
+
+    with CaptureQueriesContext(connection) as captured:
+        assert introspect([token])[0]["active"] is True
+    assert len(captured) == 0
+
+
+def test_revoked_access_token_turns_inactive(client, oauth2, django_capture_on_commit_callbacks):
+    token = _access_token(client, oauth2)
+    assert _introspect(client, oauth2, token).json()["active"] is True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        revoke(access_token_jti(token), 2**31 - 1)
+
+    assert _introspect(client, oauth2, token).json() == {"active": False}
+
+
+def test_revoked_stored_access_token_turns_inactive(client, oauth2, django_capture_on_commit_callbacks):
+    token = _access_token(client, oauth2)
+    assert _introspect(client, oauth2, token).json()["active"] is True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        stored = OAuth2Token.objects.get(access_token_digest=token_digest(token))
+        stored.revoked = True
+        stored.save()
+
+    assert _introspect(client, oauth2, token).json() == {"active": False}
+
+    # and stays inactive once the reaper has deleted the row
+    stored.delete()
+    assert _introspect(client, oauth2, token).json() == {"active": False}
+
+
+def test_states_are_not_cached_without_shared_generations(client, oauth2, settings):
+    settings.AUTHAPP_SHARED_GENERATIONS = False
+    token = _access_token(client, oauth2)
+    _introspect(client, oauth2, token)
+
+    from authapp.introspection import introspect
+
+    with CaptureQueriesContext(connection) as captured:
+        assert introspect([token])[0]["active"] is True
+    assert len(captured) > 0
+
+
+def test_deleted_membership_turns_inactive(client, oauth2, django_capture_on_commit_callbacks):
+    token = _access_token(client, oauth2)
+    assert _introspect(client, oauth2, token).json()["active"] is True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        oauth2.client.membership.delete()
+
+    from authapp.introspection import introspect
+
+    assert introspect([token]) == [{"active": False}]
+
+
+def test_refresh_token_turns_inactive_once_rotated(client, oauth2, django_capture_on_commit_callbacks):
+    OAuth2Token.objects.create(user=oauth2.client.membership, client_id=oauth2.client_id, token_type="Bearer", refresh_token_digest=token_digest("refresh-me"), scope="profile", expires_in=3600)
+
+    body = _introspect(client, oauth2, "refresh-me").json()
+    assert body["active"] is True
+    assert body["token_type"] == "refresh_token"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            reverse("token"),
+            data={"grant_type": "refresh_token", "refresh_token": "refresh-me", "client_id": oauth2.client_id, "client_secret": oauth2.client_secret},
+            secure=True,
+        )
+    assert response.status_code == 200, response.content
+
+    assert _introspect(client, oauth2, "refresh-me").json() == {"active": False}
+
+
+def test_batch_answers_in_order(client, oauth2):
+    token = _access_token(client, oauth2)
+
+    response = client.post(
+        reverse("introspect_batch"),
+        data={"token": ["bogus", token, "bogus"], "client_id": oauth2.client_id, "client_secret": oauth2.client_secret},
+        secure=True,
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["active"] for r in results] == [False, True, False]
+
+
+def test_batch_size_is_capped(client, oauth2, settings):
+    settings.AUTHAPP_INTROSPECTION_MAX_BATCH = 2
+
+    response = client.post(reverse("introspect_batch"), data={"token": ["a", "b", "c"], "client_id": oauth2.client_id, "client_secret": oauth2.client_secret}, secure=True)
+
+    assert response.status_code == 400
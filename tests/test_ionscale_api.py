@@ -0,0 +1,207 @@
+"""The HTTP ionscale repository (ionscale.api) against a local stand-in server."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ionscale.api import SERVICE, IonscaleApiRepository
+from ionscale.base_models import TailnetCreate
+from ionscale.repo import IonscaleOperationUnsupported, IonscaleRepo, get_ionscale_repo
+
+API_KEY = "isk-test"
+
+
+class StandInIonscale:
+    """Just enough of ``ionscale.v1.IonscaleService`` (Connect, JSON) for the repository."""
+
+    def __init__(self):
+        self.tailnets = {"1": {"id": "1", "name": "net"}}
+        self.machines = {
+            "7": {
+                "id": "7",
+                "name": "alpha",
+                "ipv4": "100.64.0.7",
+                "connected": True,
+                "lastSeen": "2026-01-02T03:04:05Z",
+                "tailnet": {"id": "1", "name": "net"},
+                "tags": ["tag:lok"],
+                "os": "linux",
+                "authorized": True,
+            }
+        }
+        self.policies = {}
+        self.calls = []
+        self.peers = set()
+
+    def ListTailnets(self, body):
+        return {"tailnet": list(self.tailnets.values())}
+
+    def CreateTailnet(self, body):
+        tailnet = {"id": str(len(self.tailnets) + 1), "name": body["name"]}
+        self.tailnets[tailnet["id"]] = tailnet
+        return {"tailnet": tailnet}
+
+    def ListMachines(self, body):
+        if body["tailnetId"] not in self.tailnets:
+            return None
+        return {"machines": [m for m in self.machines.values() if m["tailnet"]["id"] == body["tailnetId"]]}
+
+    def GetMachine(self, body):
+        if body["machineId"] not in self.machines:
+            return None
+        return {"machine": self.machines[body["machineId"]]}
+
+    def SetIAMPolicy(self, body):
+        if body["tailnetId"] not in self.tailnets:
+            return None
+        self.policies[body["tailnetId"]] = body["policy"]
+        return {}
+
+    def CreateAuthKey(self, body):
+        # CreateAuthKeyResponse: the key is ``value``, ``authKey`` is its (masked) metadata
+        tailnet = self.tailnets.get(body["tailnetId"])
+        if tailnet is None:
+            return None
+        return {
+            "authKeyId": "3",
+            "value": f"tskey-{body['tailnetId']}-{int(body['ephemeral'])}",
+            "authKey": {
+                "id": "3",
+                "key": "tskey-****",
+                "ephemeral": body["ephemeral"],
+                "tags": body["tags"],
+                "createdAt": "2026-01-02T03:04:05Z",
+                "tailnet": {"id": tailnet["id"], "name": tailnet["name"]},
+            },
+        }
+
+
+@pytest.fixture
+def server():
+    state = StandInIonscale()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            state.peers.add(self.client_address)
+            if self.headers["Authorization"] != f"Bearer {API_KEY}":
+                return self._send(401, {"code": "unauthenticated", "message": "invalid key"})
+
+            service, _, method = self.path.strip("/").rpartition("/")
+            state.calls.append(method)
+            handler = getattr(state, method, None) if service == SERVICE else None
+            if handler is None:
+                return self._send(404, {"code": "unimplemented", "message": self.path})
+            result = handler(body)
+            if result is None:
+                return self._send(404, {"code": "not_found", "message": f"{method}: not found"})
+            self._send(200, result)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{httpd.server_port}"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def repo(server):
+    return IonscaleApiRepository(server_url=server.url, admin_key=API_KEY)
+
+
+def test_satisfies_the_repo_protocol(repo):
+    assert isinstance(repo, IonscaleRepo)
+
+
+def test_reads_map_structured_responses(repo):
+    assert [t.name for t in repo.list_tailnets()] == ["net"]
+
+    [machine] = repo.list_machines("net")
+    assert (machine.id, machine.name, machine.ipv4, machine.connected, machine.tailnet) == ("7", "alpha", "100.64.0.7", True, "net")
+    assert machine.last_seen.year == 2026
+
+    detail = repo.get_machine("7")
+    assert (detail.os, detail.authorized, detail.tags) == ("linux", True, ["tag:lok"])
+
+
+def test_writes_resolve_tailnet_names_once(repo, server):
+    repo.update_policy("net", {"subs": ["1", "2"]})
+    repo.update_policy("net", '{"subs": ["1"]}')
+    assert repo.create_auth_key("net", ephemeral=True) == "tskey-1-1"
+
+    assert server.policies == {"1": {"subs": ["1"]}}
+    assert server.calls.count("ListTailnets") == 1
+
+
+def test_recreated_tailnets_are_resolved_again(repo, server):
+    repo.update_policy("net", {"subs": []})
+
+    # deleted and recreated under the same name, with a new id
+    del server.tailnets["1"]
+    server.tailnets["9"] = {"id": "9", "name": "net"}
+    repo.update_policy("net", {"subs": ["1"]})
+
+    assert server.policies == {"1": {"subs": []}, "9": {"subs": ["1"]}}
+    assert server.calls.count("ListTailnets") == 2
+
+
+def test_created_tailnets_are_addressable(repo, server):
+    tailnet = repo.create_tailnet(TailnetCreate(name="other"))
+
+    repo.update_policy("other", {"subs": []})
+    assert server.policies == {tailnet.id: {"subs": []}}
+    assert "ListTailnets" not in server.calls
+
+
+def test_calls_share_one_connection(repo, server):
+    for _ in range(5):
+        repo.list_tailnets()
+
+    assert len(server.peers) == 1
+
+
+def test_api_errors_raise(repo, server):
+    with pytest.raises(RuntimeError, match="not_found"):
+        repo.get_machine("404")
+    with pytest.raises(RuntimeError, match="unknown tailnet"):
+        repo.list_machines("missing")
+
+    unauthenticated = IonscaleApiRepository(server_url=server.url, admin_key="wrong")
+    with pytest.raises(RuntimeError, match="unauthenticated"):
+        unauthenticated.list_tailnets()
+
+
+def test_cli_passthrough_is_unsupported(repo):
+    with pytest.raises(IonscaleOperationUnsupported, match="CLI repository"):
+        repo.run("tailnets", "list")
+    with pytest.raises(IonscaleOperationUnsupported):
+        repo.help()
+
+
+def test_selected_through_settings(settings, server):
+    settings.IONSCALE_REPOSITORY = None
+    settings.IONSCALE_CLIENT = "api"
+    settings.IONSCALE_SERVER_URL = server.url
+    settings.IONSCALE_ADMIN_KEY = API_KEY
+
+    repo = get_ionscale_repo()
+
+    assert isinstance(repo, IonscaleApiRepository)
+    assert [t.name for t in repo.list_tailnets()] == ["net"]
@@ -0,0 +1,176 @@
+"""Cached machine inventory for ionscale layers (ionscale.inventory)."""
+
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+
+from api.management.mutations.ionscale import CreateIonscaleAuthKeyInput, create_ionscale_auth_key
+from fakts import models as fakts_models
+from ionscale import inventory as inventory_module
+from ionscale.base_models import Machine, MachineDetail
+from ionscale.inventory import MachineInventory, get_machine_inventory
+from karakter.models import Organization, User
+
+
+class CountingRepository:
+    """Wraps the fake repository, counting reads and optionally failing them."""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.listings = 0
+        self.lookups = 0
+        self.fail = False
+
+    def list_machines(self, tailnet):
+        self.listings += 1
+        if self.fail:
+            raise RuntimeError("Ionscale CLI Error: connection refused")
+        return self.repo.list_machines(tailnet)
+
+    def get_machine(self, machine_id):
+        self.lookups += 1
+        if self.fail:
+            raise RuntimeError("Ionscale CLI Error: connection refused")
+        return self.repo.get_machine(machine_id)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(inventory_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def counting(ionscale_repo, monkeypatch):
+    counting = CountingRepository(ionscale_repo)
+    monkeypatch.setattr(inventory_module, "get_ionscale_repo", lambda: counting)
+    ionscale_repo.machines_by_tailnet["net"] = [Machine(id="1", name="alpha", tailnet="net")]
+    return counting
+
+
+def _settle(inventory: MachineInventory) -> None:
+    for thread in list(inventory._refreshing.values()):
+        thread.join()
+
+
+def test_listings_are_cached_within_the_ttl(counting, clock):
+    inventory = MachineInventory(ttl=30)
+
+    assert [m.name for m in inventory.machines("net")] == ["alpha"]
+    clock[0] += 29
+    assert [m.name for m in inventory.machines("net")] == ["alpha"]
+    assert counting.listings == 1
+
+
+def test_stale_listings_are_served_while_refreshing(counting, ionscale_repo, clock):
+    inventory = MachineInventory(ttl=30)
+    inventory.machines("net")
+    ionscale_repo.machines_by_tailnet["net"].append(Machine(id="2", name="beta", tailnet="net"))
+
+    clock[0] += 31
+    assert [m.name for m in inventory.machines("net")] == ["alpha"]
+    _settle(inventory)
+
+    assert [m.name for m in inventory.machines("net")] == ["alpha", "beta"]
+    assert counting.listings == 2
+
+
+def test_failed_refresh_keeps_serving_the_cached_listing(counting, clock):
+    inventory = MachineInventory(ttl=30)
+    inventory.machines("net")
+    counting.fail = True
+
+    clock[0] += 31
+    assert [m.name for m in inventory.machines("net")] == ["alpha"]
+    _settle(inventory)
+
+    # the failure counts as a check: no retry before another ttl has passed
+    assert [m.name for m in inventory.machines("net")] == ["alpha"]
+    _settle(inventory)
+    assert counting.listings == 2
+
+
+def test_first_listing_failure_propagates(counting):
+    counting.fail = True
+
+    with pytest.raises(RuntimeError):
+        MachineInventory(ttl=30).machines("net")
+
+
+def test_zero_ttl_reads_through(counting):
+    inventory = MachineInventory(ttl=0)
+    inventory.machines("net")
+    inventory.machines("net")
+
+    assert counting.listings == 2
+
+
+def test_refresh_all_prunes_departed_machine_details(counting, ionscale_repo):
+    ionscale_repo.machines["1"] = MachineDetail(id="1", name="alpha", tailnet="net")
+    inventory = MachineInventory(ttl=30)
+    inventory.machines("net")
+    assert inventory.machine("1").name == "alpha"
+
+    ionscale_repo.machines_by_tailnet["net"] = []
+    inventory.refresh_all()
+
+    assert inventory.machines("net") == []
+    assert "1" not in inventory._details
+
+
+def test_refresh_all_forgets_idle_tailnets(counting, ionscale_repo, clock):
+    ionscale_repo.machines_by_tailnet["other"] = []
+    inventory = MachineInventory(ttl=30)
+    inventory.machines("net")
+    inventory.machines("other")
+
+    clock[0] += inventory_module.IDLE_AFTER - 1
+    inventory.machines("net")
+    _settle(inventory)
+    clock[0] += 1
+    inventory.refresh_all()
+
+    assert set(inventory._tailnets) == {"net"}
+    assert counting.listings == 4  # two first listings, a revalidation of "net" and its refresh
+
+
+def _layer(slug: str, tailnet: str) -> fakts_models.IonscaleLayer:
+    owner = User.objects.create(username=f"{slug}-owner")
+    organization = Organization.objects.create(slug=slug, owner=owner)
+    return fakts_models.IonscaleLayer.objects.create(
+        organization=organization,
+        name="Default",
+        kind="ionscale",
+        identifier=f"{slug}-default",
+        tailnet_name=tailnet,
+    )
+
+
+@pytest.mark.django_db
+def test_deleting_a_layer_forgets_its_tailnet(counting):
+    layer = _layer("forget-org", "net")
+    inventory = get_machine_inventory()
+    inventory.machines("net")
+
+    layer.delete()
+
+    assert "net" not in inventory._tailnets
+
+
+@pytest.mark.django_db
+def test_creating_an_auth_key_invalidates_the_tailnet(counting, clock):
+    layer = _layer("inventory-org", "net")
+    owner = layer.organization.owner
+    inventory = get_machine_inventory()
+    inventory.machines("net")
+
+    create_ionscale_auth_key(
+        info=cast(object, SimpleNamespace(context=SimpleNamespace(request=SimpleNamespace(user=owner)))),
+        input=cast(CreateIonscaleAuthKeyInput, SimpleNamespace(layer_id=layer.pk, ephemeral=True, tags=None)),
+    )
+    inventory.machines("net")
+    _settle(inventory)
+
+    assert counting.listings == 2
@@ -5,11 +5,14 @@ import pytest
 
 from api.management.mutations.ionscale import CreateIonscaleLayerInput, create_ionscale_layer
 from fakts import models as fakts_models
+from ionscale import sync_queue
+from ionscale.manager import sync_organization_layers
+from ionscale.sync_queue import PolicySyncQueue
 from karakter.models import Membership, Organization, User
 
 
 @pytest.mark.django_db
-def test_membership_changes_resync_ionscale_layers(ionscale_repo):
+def test_membership_changes_resync_ionscale_layers(ionscale_repo, django_capture_on_commit_callbacks):
     existing_user = User.objects.create(username="existing-user")
     # owner is required; the org post_save signal makes the owner an admin member,
     # so we don't create the membership for ``existing_user`` explicitly.
@@ -23,7 +26,9 @@ def test_membership_changes_resync_ionscale_layers(ionscale_repo):
     )
 
     new_user = User.objects.create(username="new-user")
-    membership = Membership.objects.create(user=new_user, organization=organization)
+    # the sync is queued for after the commit (pushed right away with the test delay of 0)
+    with django_capture_on_commit_callbacks(execute=True):
+        membership = Membership.objects.create(user=new_user, organization=organization)
 
     assert len(ionscale_repo.updated_policies) == 1
     tailnet, policy = ionscale_repo.updated_policies[-1]
@@ -32,7 +37,8 @@ def test_membership_changes_resync_ionscale_layers(ionscale_repo):
 
     ionscale_repo.updated_policies.clear()
 
-    membership.delete()
+    with django_capture_on_commit_callbacks(execute=True):
+        membership.delete()
 
     assert len(ionscale_repo.updated_policies) == 1
     tailnet, policy = ionscale_repo.updated_policies[-1]
@@ -63,3 +69,113 @@ def test_create_ionscale_layer_syncs_existing_members(ionscale_repo):
     assert ionscale_repo.updated_policies == [
         ("ionscale-create-org-default", {"subs": [str(first_user.pk), str(second_user.pk)]}),
     ]
+
+
+def _ionscale_org(slug):
+    owner = User.objects.create(username=f"{slug}-owner")
+    organization = Organization.objects.create(slug=slug, owner=owner)
+    fakts_models.IonscaleLayer.objects.create(
+        organization=organization,
+        name="Default",
+        kind="ionscale",
+        identifier=f"{slug}-default",
+        tailnet_name=f"{slug}-default",
+    )
+    return organization
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """A debouncing queue whose thread isn't running; tests flush it by hand."""
+    queue = PolicySyncQueue(delay=60)
+    monkeypatch.setattr(sync_queue, "_queue", queue)
+    return queue
+
+
+@pytest.mark.django_db
+def test_membership_changes_collapse_into_one_push(ionscale_repo, queue, django_capture_on_commit_callbacks):
+    organization = _ionscale_org("ionscale-bulk-org")
+
+    users = [User.objects.create(username=f"bulk-{i}") for i in range(3)]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for user in users:
+            Membership.objects.create(user=user, organization=organization)
+
+    assert ionscale_repo.updated_policies == []
+    assert len(queue) == 1
+    assert queue.flush(now=0) == 0  # not due yet
+
+    assert queue.flush() == 1
+    assert len(ionscale_repo.updated_policies) == 1
+    assert len(ionscale_repo.updated_policies[0][1]["subs"]) == 4
+
+
+@pytest.mark.django_db
+def test_unchanged_policy_is_not_pushed_again(ionscale_repo, queue):
+    organization = _ionscale_org("ionscale-same-org")
+
+    queue.request(organization.pk)
+    queue.flush()
+    queue.request(organization.pk)
+    queue.flush()
+    assert len(ionscale_repo.updated_policies) == 1
+
+    # explicit syncs (layer mutations) always push
+    sync_organization_layers(organization)
+    assert len(ionscale_repo.updated_policies) == 2
+
+
+@pytest.mark.django_db
+def test_unchanged_policy_is_pushed_without_a_shared_cache(ionscale_repo, queue, settings):
+    settings.IONSCALE_POLICY_SKIP_UNCHANGED = False
+    organization = _ionscale_org("ionscale-local-org")
+
+    queue.request(organization.pk)
+    queue.flush()
+    queue.request(organization.pk)
+    queue.flush()
+
+    assert len(ionscale_repo.updated_policies) == 2
+
+
+@pytest.mark.django_db
+def test_failed_sync_is_requeued(ionscale_repo, queue, monkeypatch):
+    organization = _ionscale_org("ionscale-fail-org")
+
+    def _fail(tailnet, policy):
+        raise RuntimeError("Ionscale CLI Error: connection refused")
+
+    monkeypatch.setattr(ionscale_repo, "update_policy", _fail)
+    queue.request(organization.pk)
+    assert queue.flush() == 0
+    assert len(queue) == 1
+
+    monkeypatch.undo()
+    monkeypatch.setattr(sync_queue, "_queue", queue)
+    assert queue.flush() == 1
+    assert len(ionscale_repo.updated_policies) == 1
+
+
+@pytest.mark.django_db
+def test_failing_sync_backs_off_and_gives_up(ionscale_repo, queue, monkeypatch):
+    organization = _ionscale_org("ionscale-down-org")
+
+    def _fail(tailnet, policy):
+        raise RuntimeError("Ionscale CLI Error: connection refused")
+
+    monkeypatch.setattr(ionscale_repo, "update_policy", _fail)
+    queue.request(organization.pk)
+
+    backoffs = []
+    for _ in range(sync_queue.MAX_ATTEMPTS - 1):
+        before = sync_queue.time.monotonic()
+        assert queue.flush() == 0
+        backoffs.append(round(queue._due[organization.pk] - before))
+
+    assert backoffs == sorted(backoffs)
+    assert backoffs[0] >= 2 * queue.delay
+    assert max(backoffs) == sync_queue.MAX_BACKOFF
+
+    assert queue.flush() == 0
+    assert len(queue) == 0
@@ -0,0 +1,82 @@
+"""Content-addressed logo storage and the per-URL logo fetch cache (fakts/utils.py)."""
+
+import email.message
+from urllib.error import HTTPError
+
+import pytest
+
+from fakts import utils
+from karakter.models import MediaStore
+
+PNG = b"\x89PNG\r\n\x1a\nfake-logo"
+
+
+class _Response:
+    def __init__(self, content, headers):
+        self.status = 200
+        self.headers = headers
+        self._content = content
+
+    def read(self):
+        return self._content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def logo_host(monkeypatch):
+    """A fake logo host serving PNG with an ETag and honouring If-None-Match."""
+    host = type("Host", (), {"requests": [], "uploads": [], "content": PNG, "etag": '"v1"'})()
+
+    def _urlopen(request):
+        host.requests.append(dict(request.header_items()))
+        headers = email.message.Message()
+        headers["Content-Type"] = "image/png"
+        headers["ETag"] = host.etag
+        if request.get_header("If-none-match") == host.etag:
+            raise HTTPError(request.full_url, 304, "Not Modified", headers, None)
+        return _Response(host.content, headers)
+
+    s3 = type("S3", (), {"upload_fileobj": lambda self, file, bucket, key: host.uploads.append(key)})()
+    monkeypatch.setattr(utils, "urlopen", _urlopen)
+    monkeypatch.setattr(utils, "get_current_datalayer", lambda: type("Datalayer", (), {"s3": s3})())
+    return host
+
+
+@pytest.mark.django_db
+def test_same_image_is_stored_once(logo_host):
+    first = utils.download_logo("http://a.example/logo.png")
+    second = utils.download_logo("http://b.example/other-name.png")
+
+    assert first == second
+    assert len(logo_host.uploads) == 1
+    assert MediaStore.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_repeat_fetch_within_freshness_makes_no_request(logo_host):
+    store = utils.download_logo("http://a.example/logo.png")
+
+    assert utils.download_logo("http://a.example/logo.png") == store
+    assert len(logo_host.requests) == 1
+    assert len(logo_host.uploads) == 1
+
+
+@pytest.mark.django_db
+def test_stale_fetch_revalidates_with_etag(logo_host, settings):
+    settings.FAKTS_LOGO_REVALIDATE_AFTER = 0
+    store = utils.download_logo("http://a.example/logo.png")
+
+    # unchanged: a conditional request answered with 304 keeps the store
+    assert utils.download_logo("http://a.example/logo.png") == store
+    assert logo_host.requests[-1]["If-none-match"] == '"v1"'
+    assert len(logo_host.uploads) == 1
+
+    # changed: the new bytes get their own store
+    logo_host.content, logo_host.etag = PNG + b"-v2", '"v2"'
+    assert utils.download_logo("http://a.example/logo.png") != store
+    assert len(logo_host.uploads) == 2
@@ -0,0 +1,124 @@
+"""Adaptive poll interval and slow_down answers of the device-code challenge endpoints."""
+
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fakts.services import poll_pacing
+from tests import factories
+
+
+def _poll(client, code):
+    return client.post(reverse("fakts:challenge"), data=json.dumps({"code": code}), content_type="application/json").json()
+
+
+@pytest.mark.django_db
+def test_pending_answer_advertises_the_interval(client, settings):
+    settings.FAKTS_DEVICE_CODE_POLL_INTERVAL = 7
+    device_code = factories.make_device_code()
+
+    body = _poll(client, device_code.code)
+
+    assert body["status"] == "pending"
+    assert body["interval"] == 7
+    assert "error" not in body
+
+
+@pytest.mark.django_db
+def test_hammering_a_code_is_slowed_down_without_queries(client):
+    device_code = factories.make_device_code()
+    _poll(client, device_code.code)
+    _poll(client, device_code.code)  # one early poll is tolerated
+
+    with CaptureQueriesContext(connection) as queries:
+        body = _poll(client, device_code.code)
+
+    assert body["status"] == "pending"
+    assert body["error"] == "slow_down"
+    assert body["interval"] == 5 + poll_pacing.SLOW_DOWN_STEP
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_interval_grows_with_pending_codes(client, settings):
+    settings.FAKTS_DEVICE_CODE_POLL_INTERVAL = 5
+    settings.FAKTS_DEVICE_CODE_BUSY_THRESHOLD = 2
+    settings.FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX = 12
+    codes = [factories.make_device_code() for _ in range(2)]
+
+    assert _poll(client, codes[0].code)["interval"] == 10
+
+    for _ in range(4):
+        factories.make_device_code()
+    # the count is reused for LOAD_TTL seconds
+    assert _poll(client, codes[1].code)["interval"] == 10
+
+
+def test_on_time_polls_reset_the_strikes(settings, monkeypatch):
+    settings.FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX = 60
+    now = [1000.0]
+    monkeypatch.setattr(poll_pacing.time, "time", lambda: now[0])
+
+    assert poll_pacing.record_poll("client", "c", 5) == poll_pacing.Pace(5)
+    now[0] += 1
+    assert poll_pacing.record_poll("client", "c", 5) == poll_pacing.Pace(5)
+    now[0] += 5
+    assert poll_pacing.record_poll("client", "c", 5) == poll_pacing.Pace(5)
+    now[0] += 1
+    assert poll_pacing.record_poll("client", "c", 5) == poll_pacing.Pace(5)
+    now[0] += 1
+    assert poll_pacing.record_poll("client", "c", 5) == poll_pacing.Pace(10, slow_down=True)
+    # the slowed-down interval sticks to the code
+    now[0] += 10
+    assert poll_pacing.record_poll("client", "c", 5) == poll_pacing.Pace(10)
+
+
+def test_interval_is_capped(settings):
+    settings.FAKTS_DEVICE_CODE_POLL_INTERVAL = 5
+    settings.FAKTS_DEVICE_CODE_BUSY_THRESHOLD = 10
+    settings.FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX = 30
+
+    assert poll_pacing.interval_for(0) == 5
+    assert poll_pacing.interval_for(25) == 15
+    assert poll_pacing.interval_for(10_000) == 30
+
+
+@pytest.mark.django_db
+def test_fast_legacy_poller_is_eventually_granted(client, settings, monkeypatch):
+    settings.FAKTS_DEVICE_CODE_POLL_INTERVAL_MAX = 60
+    now = [1000.0]
+    monkeypatch.setattr(poll_pacing.time, "time", lambda: now[0])
+    device_code = factories.make_device_code()
+
+    answers = []
+    for second in range(120):
+        if second == 3:
+            device_code.client = factories.make_client()
+            device_code.save()
+        answers.append(_poll(client, device_code.code))
+        now[0] += 1
+
+    assert [a["status"] for a in answers[:3]] == ["pending"] * 3
+    assert any(a.get("error") == "slow_down" for a in answers)
+    # polling every second, yet an answer is served within the slowed-down interval
+    first_granted = next(i for i, a in enumerate(answers) if a["status"] == "granted")
+    assert first_granted <= 3 + 5 + poll_pacing.SLOW_DOWN_STEP
+
+
+@pytest.mark.django_db
+def test_tiny_waits_are_paced_as_short_polls(client):
+    device_code = factories.make_device_code()
+
+    def _wait_poll():
+        return client.post(reverse("fakts:challenge"), data=json.dumps({"code": device_code.code, "wait": 0.001}), content_type="application/json").json()
+
+    _wait_poll()
+    _wait_poll()
+    with CaptureQueriesContext(connection) as queries:
+        body = _wait_poll()
+
+    assert body["error"] == "slow_down"
+    assert len(queries) == 0
@@ -0,0 +1,83 @@
+"""Cached, batched presigned URLs for MediaStore fields (karakter.presign)."""
+
+import asyncio
+
+import pytest
+
+from karakter import presign
+
+
+class FakeS3:
+    def __init__(self):
+        self.signed = []
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn):
+        self.signed.append((Params["Bucket"], Params["Key"]))
+        return f"http://s3.local/{Params['Bucket']}/{Params['Key']}?sig={len(self.signed)}"
+
+
+@pytest.fixture
+def s3(settings, monkeypatch):
+    settings.AWS_S3_ENDPOINT_URL = "http://s3.local"
+    settings.AWS_QUERYSTRING_EXPIRE = 3600
+    fake = FakeS3()
+    monkeypatch.setattr(presign, "get_current_datalayer", lambda: type("Datalayer", (), {"s3": fake})())
+    presign.clear()
+    yield fake
+    presign.clear()
+
+
+def test_urls_are_reused_until_shortly_before_expiry(s3, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(presign.time, "monotonic", lambda: now[0])
+
+    first = presign.presigned_url("media", "a.png", "https://lok")
+    assert presign.presigned_url("media", "a.png", "https://lok") == first
+    assert first.startswith("https://lok/media/a.png")
+
+    now[0] += 3600 * (1 - presign.MARGIN_FRACTION) + 1
+    assert presign.presigned_url("media", "a.png", "https://lok") != first
+    assert len(s3.signed) == 2
+
+
+def test_cache_is_keyed_by_host(s3):
+    presign.presigned_url("media", "a.png", "https://one")
+    presign.presigned_url("media", "a.png", "https://two")
+
+    assert len(s3.signed) == 2
+
+
+def test_short_lived_urls_are_not_cached(s3, settings):
+    settings.AWS_QUERYSTRING_EXPIRE = 30
+
+    presign.presigned_url("media", "a.png")
+    presign.presigned_url("media", "a.png")
+
+    assert len(s3.signed) == 2
+
+
+def test_batch_signs_each_store_once_in_order(s3):
+    keys = [("media", "a.png", None), ("media", "b.png", None), ("media", "a.png", None)]
+
+    urls = presign.presigned_urls(keys)
+
+    assert [url.split("?")[0] for url in urls] == ["/media/a.png", "/media/b.png", "/media/a.png"]
+    assert s3.signed == [("media", "a.png"), ("media", "b.png")]
+
+
+def test_fields_of_one_operation_are_loaded_together(s3, monkeypatch):
+    batches = []
+    presigned_urls = presign.presigned_urls
+    monkeypatch.setattr(presign, "presigned_urls", lambda keys: batches.append(list(keys)) or presigned_urls(keys))
+
+    async def operation():
+        token = presign.loader.set(presign.new_loader())
+        try:
+            return await asyncio.gather(*(presign.aload("media", f"{n}.png") for n in range(3)))
+        finally:
+            presign.loader.reset(token)
+
+    urls = asyncio.run(operation())
+
+    assert len(urls) == 3
+    assert len(batches) == 1
@@ -0,0 +1,84 @@
+"""Batch deletion of expired rows (fakts/services/reaper.py, ``reapexpired``)."""
+
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from authapp.models import AuthorizationCode, OAuth2Token, RevokedAccessToken, now_timestamp, token_digest
+from fakts import models
+from fakts.services import reaper
+from karakter.models import Invite
+from tests import factories
+
+
+def _token(membership, n, **kw):
+    return OAuth2Token.objects.create(user=membership, client_id="c", token_type="Bearer", access_token_digest=token_digest(f"access-{n}"), refresh_token_digest=token_digest(f"refresh-{n}"), **kw)
+
+
+@pytest.mark.django_db
+def test_reaper_deletes_only_expired_rows_in_batches():
+    past, future = timezone.now() - timedelta(minutes=1), timezone.now() + timedelta(hours=1)
+    membership = factories.make_membership()
+    long_ago = now_timestamp() - 40 * 24 * 3600
+
+    expired_codes = [factories.make_device_code(expires_at=past) for _ in range(3)]
+    live_code = factories.make_device_code(expires_at=future)
+    factories.make_redeem_token(expires_at=past)
+    permanent_redeem = factories.make_redeem_token(expires_at=None)
+    AuthorizationCode.objects.create(membership=membership, client_id="c", code="old", auth_time=now_timestamp() - 3600)
+    AuthorizationCode.objects.create(membership=membership, client_id="c", code="fresh")
+    _token(membership, 1, revoked=True)
+    _token(membership, 2, issued_at=long_ago, expires_in=3600)
+    refreshable = _token(membership, 3, issued_at=now_timestamp() - 7200, expires_in=3600)
+    RevokedAccessToken.objects.create(jti="expired", expires_at=now_timestamp() - 60)
+    RevokedAccessToken.objects.create(jti="live", expires_at=now_timestamp() + 60)
+    Invite.objects.create(created_by=membership.user, created_for=membership.organization, expires_at=past)
+    open_invite = Invite.objects.create(created_by=membership.user, created_for=membership.organization, expires_at=future)
+
+    results = {r.name: r for r in reaper.reap_expired(batch_size=2)}
+
+    assert (results["device_codes"].deleted, results["device_codes"].batches) == (3, 2)
+    assert results["redeem_tokens"].deleted == 1
+    assert results["authorization_codes"].deleted == 1
+    assert results["oauth2_tokens"].deleted == 2
+    assert results["revoked_access_tokens"].deleted == 1
+    assert results["invites"].deleted == 1
+
+    assert not models.DeviceCode.objects.filter(pk__in=[c.pk for c in expired_codes]).exists()
+    assert list(models.DeviceCode.objects.all()) == [live_code]
+    assert list(models.RedeemToken.objects.all()) == [permanent_redeem]
+    assert list(AuthorizationCode.objects.values_list("code", flat=True)) == ["fresh"]
+    # an expired access token is kept while its refresh token is still usable
+    assert list(OAuth2Token.objects.all()) == [refreshable]
+    assert list(RevokedAccessToken.objects.values_list("jti", flat=True)) == ["live"]
+    assert list(Invite.objects.all()) == [open_invite]
+
+
+@pytest.mark.django_db
+def test_reaper_keeps_accepted_invites():
+    past = timezone.now() - timedelta(minutes=1)
+    membership = factories.make_membership()
+    accepted = Invite.objects.create(created_by=membership.user, created_for=membership.organization, expires_at=past, status=Invite.Status.ACCEPTED)
+    membership.created_through = accepted
+    membership.save()
+    Invite.objects.create(created_by=membership.user, created_for=membership.organization, expires_at=past)
+
+    results = {r.name: r for r in reaper.reap_expired(only=["invites"])}
+
+    assert results["invites"].deleted == 1
+    assert list(Invite.objects.all()) == [accepted]
+    membership.refresh_from_db()
+    assert membership.created_through == accepted
+
+
+@pytest.mark.django_db
+def test_reapexpired_command_reports_counts(capsys):
+    factories.make_device_code(expires_at=timezone.now() - timedelta(minutes=1))
+
+    call_command("reapexpired", "--only", "device_codes")
+
+    out = capsys.readouterr().out
+    assert "device_codes: deleted 1 in 1 batches" in out
+    assert "Reaped 1 expired rows" in out
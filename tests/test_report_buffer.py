@@ -0,0 +1,122 @@
+"""Buffered ingestion of client reports (fakts/services/report_buffer.py)."""
+
+import json
+
+import pytest
+from django.urls import reverse
+
+from fakts import base_models, models
+from fakts.services import report_buffer
+from tests import factories
+
+
+@pytest.fixture
+def buffered_reports(settings):
+    settings.FAKTS_REPORT_INGESTION = "buffered"
+    # no flusher thread: the tests flush explicitly
+    settings.FAKTS_REPORT_FLUSH_INTERVAL = 0
+    report_buffer.reset_report_buffer()
+    yield report_buffer.get_report_buffer()
+    report_buffer.reset_report_buffer()
+
+
+def _report(token, functional=True, **alias_reports):
+    return base_models.ReportRequest(
+        token=token,
+        functional=functional,
+        alias_reports={key: base_models.AliasReport(**report) for key, report in alias_reports.items()},
+    )
+
+
+@pytest.mark.django_db
+def test_report_is_acknowledged_before_it_is_written(client, buffered_reports, django_assert_num_queries):
+    fakts_client = factories.make_client()
+
+    with django_assert_num_queries(0):
+        body = client.post(reverse("fakts:report"), data=json.dumps({"token": fakts_client.token, "functional": False}), content_type="application/json").json()
+
+    assert body["status"] == "reported"
+    assert models.Client.objects.get(pk=fakts_client.pk).functional is True
+
+    buffered_reports.flush()
+    assert models.Client.objects.get(pk=fakts_client.pk).functional is False
+
+
+@pytest.mark.django_db
+def test_unknown_tokens_are_remembered_by_the_flush(client, buffered_reports, django_assert_num_queries):
+    def _post():
+        return client.post(reverse("fakts:report"), data=json.dumps({"token": "dead-token", "functional": True}), content_type="application/json").json()
+
+    assert _post()["status"] == "reported"
+    buffered_reports.flush()
+
+    with django_assert_num_queries(0):
+        assert _post() == {"status": "error", "message": "No Client found for this token"}
+    assert len(buffered_reports) == 0
+
+
+@pytest.mark.django_db
+def test_reports_are_coalesced_per_client(buffered_reports):
+    fakts_client = factories.make_client()
+    alias = models.InstanceAlias.objects.create(instance=factories.make_service_instance(), host="db.example.com", kind="absolute")
+
+    buffered_reports.submit(_report(fakts_client.token, db={"alias_id": str(alias.pk), "valid": True}, cache={"valid": True}))
+    buffered_reports.submit(_report(fakts_client.token, functional=False, db={"alias_id": str(alias.pk), "valid": False, "reason": "timeout"}))
+    assert len(buffered_reports) == 1
+
+    assert buffered_reports.flush() == 1
+
+    used = {u.key: u for u in models.UsedAlias.objects.filter(client=fakts_client)}
+    assert set(used) == {"db", "cache"}
+    assert (used["db"].alias_id, used["db"].valid, used["db"].reason) == (alias.pk, False, "timeout")
+    assert models.Client.objects.get(pk=fakts_client.pk).functional is False
+
+    # a later flush updates the existing rows instead of adding new ones
+    buffered_reports.submit(_report(fakts_client.token, db={"alias_id": str(alias.pk), "valid": True}))
+    buffered_reports.flush()
+    assert models.UsedAlias.objects.filter(client=fakts_client).count() == 2
+    assert models.UsedAlias.objects.get(client=fakts_client, key="db").valid is True
+
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_reports_queued(buffered_reports, monkeypatch):
+    fakts_client = factories.make_client()
+    buffered_reports.submit(_report(fakts_client.token, functional=False))
+
+    def _fail(pending):
+        raise RuntimeError("database unavailable")
+
+    with monkeypatch.context() as m:
+        m.setattr(report_buffer, "write_reports", _fail)
+        with pytest.raises(RuntimeError):
+            buffered_reports.flush()
+
+    assert len(buffered_reports) == 1
+    assert buffered_reports.flush() == 1
+    assert models.Client.objects.get(pk=fakts_client.pk).functional is False
+
+
+@pytest.mark.django_db
+def test_invalid_alias_ids_do_not_block_the_buffer(buffered_reports):
+    fakts_client = factories.make_client()
+    other = factories.make_client()
+
+    buffered_reports.submit(_report(fakts_client.token, db={"alias_id": "not-a-pk", "valid": True}))
+    buffered_reports.submit(_report(other.token, functional=False))
+
+    assert buffered_reports.flush() == 2
+    assert len(buffered_reports) == 0
+    assert not models.UsedAlias.objects.filter(client=fakts_client).exists()
+    assert models.Client.objects.get(pk=other.pk).functional is False
+
+
+@pytest.mark.django_db
+def test_new_alias_usages_keep_the_report_time(buffered_reports):
+    fakts_client = factories.make_client()
+    alias = models.InstanceAlias.objects.create(instance=factories.make_service_instance(), host="db.example.com", kind="absolute")
+    buffered_reports.submit(_report(fakts_client.token, db={"alias_id": str(alias.pk), "valid": True}))
+    reported_at = buffered_reports._pending[fakts_client.token].alias_reports["db"][1]
+
+    buffered_reports.flush()
+
+    assert models.UsedAlias.objects.get(client=fakts_client, key="db").used_at == reported_at
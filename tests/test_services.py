@@ -91,3 +91,213 @@ def test_auto_compose_is_atomic_and_rolls_back_on_required_missing():
 
     # the @transaction.atomic decorator should have rolled back the mapping deletion
     assert client.mappings.filter(key="old").exists()
+
+
+def _client_with_mappings(count):
+    client = factories.make_client()
+    composition = factories.make_composition(organization=client.organization)
+    for i in range(count):
+        instance = factories.make_service_instance(composition=composition)
+        models.InstanceAlias.objects.create(instance=instance, host=f"svc{i}.example.com", kind="absolute")
+        models.InstanceAlias.objects.create(instance=instance, port=8000 + i)
+        models.ServiceInstanceMapping.objects.create(client=client, instance=instance, key=f"req{i}")
+    client.scopes.add(*client.organization.scopes.all())
+    return client
+
+
+def _linking_context(client):
+    return base_models.LinkingContext(
+        request=base_models.LinkingRequest(host="lok.example.com", port="80", base_url="http://lok.example.com/lok"),
+        manifest=_manifest(),
+        client=base_models.LinkingClient(
+            client_id=client.oauth2_client.client_id,
+            client_secret=client.oauth2_client.client_secret,
+            client_type="confidential",
+            authorization_grant_type="client-credentials",
+            name=client.name,
+        ),
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("mapping_count", [1, 8])
+def test_render_composition_query_count_is_independent_of_mappings(django_assert_num_queries, mapping_count):
+    client = _client_with_mappings(mapping_count)
+    context = _linking_context(client)
+
+    # client (+oauth2 client, release, app), scopes, mappings (+instance, release, service), aliases
+    with django_assert_num_queries(4):
+        loaded = rendering.claim_client_queryset().get(token=client.token)
+        answer = rendering.render_composition(loaded, context)
+
+    assert len(answer["instances"]) == mapping_count
+    assert all(len(claim["aliases"]) == 2 for claim in answer["instances"].values())
+    assert answer["auth"]["scopes"]
+
+
+@pytest.mark.django_db
+def test_render_server_fakts_query_count_is_fixed(django_assert_num_queries):
+    composition = factories.make_composition()
+    for _ in range(5):
+        factories.make_service_instance(composition=composition)
+        factories.make_client(composition=composition)
+    context = base_models.ServerLinkingContext(request=base_models.LinkingRequest(host="lok.example.com", base_url="http://lok.example.com/lok"))
+
+    # composition (+auth key), instances, clients
+    with django_assert_num_queries(3):
+        loaded = rendering.composition_claim_queryset().get(token=composition.token)
+        answer = rendering.render_server_fakts(loaded, context)
+
+    assert len(answer.instances) == 5
+    assert len(answer.clients) == 5
+
+
+@pytest.mark.django_db
+def test_batch_resolver_matches_single_resolver(django_assert_num_queries):
+    from django.contrib.auth.models import Group
+
+    composition = factories.make_composition()
+    user = factories.make_user()
+    other = factories.make_user()
+    group = Group.objects.create(name="resolver-group")
+    user.groups.add(group)
+
+    def _instance(release, **access):
+        instance = factories.make_service_instance(composition=composition, release=release, instance_id=f"instance-{release.instances.count()}")
+        for field, values in access.items():
+            getattr(instance, field).set(values)
+        return instance
+
+    open_release, guarded_release, first_wins_release = factories.make_service_release(), factories.make_service_release(), factories.make_service_release()
+    _instance(open_release, allowed_users=[other])
+    _instance(open_release)
+    _instance(guarded_release, allowed_users=[user], denied_groups=[group])
+    _instance(guarded_release, allowed_users=[user, other], allowed_groups=[group])
+    _instance(first_wins_release)
+    _instance(first_wins_release)
+
+    requirements = [
+        base_models.Requirement(key="open", service=open_release.service.identifier),
+        base_models.Requirement(key="guarded", service=guarded_release.service.identifier),
+        base_models.Requirement(key="first", service=first_wins_release.service.identifier),
+        base_models.Requirement(key="first-again", service=first_wins_release.service.identifier),
+        base_models.Requirement(key="missing", service="com.missing.service", optional=True),
+    ]
+
+    expected = {req.key: rendering.find_instance_for_requirement_and_composition(req, user, composition) for req in requirements}
+    with django_assert_num_queries(1):
+        resolved = rendering.find_instances_for_requirements(requirements, user, composition)
+
+    assert resolved == expected
+    assert resolved["missing"] is None
+    assert all(resolved[key] is not None for key in ("open", "guarded", "first"))
+
+
+def _composed_client(*services):
+    client = factories.make_client()
+    client.composition = factories.make_composition(organization=client.organization)
+    client.save()
+    instances = [factories.make_service_instance(composition=client.composition, release=factories.make_service_release(service=service)) for service in services]
+    return client, instances
+
+
+def _writes(queries):
+    return [q["sql"] for q in queries if q["sql"].split()[0] in ("INSERT", "UPDATE", "DELETE")]
+
+
+@pytest.mark.django_db
+def test_auto_compose_recompose_without_changes_writes_nothing():
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    first, second = factories.make_service(), factories.make_service()
+    client, _ = _composed_client(first, second)
+    manifest = _manifest(requirements=[base_models.Requirement(key="a", service=first.identifier), base_models.Requirement(key="b", service=second.identifier)])
+
+    rendering.auto_compose(client, manifest, client.user, client.organization)
+    mapping_ids = set(client.mappings.values_list("pk", flat=True))
+
+    with CaptureQueriesContext(connection) as ctx:
+        rendering.auto_compose(client, manifest, client.user, client.organization)
+
+    assert _writes(ctx.captured_queries) == []
+    assert set(client.mappings.values_list("pk", flat=True)) == mapping_ids
+
+
+@pytest.mark.django_db
+def test_auto_compose_applies_only_the_difference(django_capture_on_commit_callbacks):
+    first, second = factories.make_service(), factories.make_service()
+    client, _ = _composed_client(first, second)
+    rendering.auto_compose(client, _manifest(requirements=[base_models.Requirement(key="a", service=first.identifier), base_models.Requirement(key="b", service=second.identifier)]), client.user, client.organization)
+    kept = client.mappings.get(key="a")
+
+    # "a" now points at the second service, "b" is dropped and "c" is new
+    manifest = _manifest(requirements=[base_models.Requirement(key="a", service=second.identifier), base_models.Requirement(key="c", service=first.identifier)])
+    with django_capture_on_commit_callbacks() as callbacks:
+        rendering.auto_compose(client, manifest, client.user, client.organization)
+
+    mappings = {m.key: m for m in client.mappings.select_related("instance__release__service")}
+    assert set(mappings) == {"a", "c"}
+    assert mappings["a"].pk == kept.pk
+    assert mappings["a"].instance.release.service == second
+    assert client.statuses == {"a": "granted", "c": "granted"}
+    # the bulk writes bypass signals, so the claim cache must be dropped explicitly
+    assert callbacks
+
+
+@pytest.fixture
+def fake_logo_download(monkeypatch):
+    """Replace the logo download with one that records whether it ran inside a transaction."""
+    from django.db import connection
+
+    from fakts import utils
+    from karakter.models import MediaStore
+
+    calls = []
+
+    def _download(url):
+        calls.append(connection.in_atomic_block)
+        return MediaStore.objects.create(path=f"media/logo-{len(calls)}.png", key=f"logo-{len(calls)}.png", bucket="media")
+
+    monkeypatch.setattr(utils, "download_logo", _download)
+    return calls
+
+
+@pytest.mark.django_db(transaction=True)
+def test_redeem_fetches_logo_before_locking_the_token(fake_logo_download):
+    redeem = factories.make_redeem_token()
+    manifest = base_models.Manifest(identifier="com.example.logo", version="1.0.0", scopes=[], logo="http://logos.example/logo.png")
+
+    client = clients.redeem_token(redeem.token, manifest)
+
+    assert fake_logo_download == [False]
+    assert client.release.logo is not None
+
+    # re-redeeming the same manifest returns the existing client without a download
+    clients.redeem_token(redeem.token, manifest)
+    assert fake_logo_download == [False]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_validate_device_code_fetches_logo_outside_the_transaction(fake_logo_download):
+    composition = factories.make_composition()
+    device_code = factories.make_device_code(
+        staging_manifest={"identifier": "com.example.dclogo", "version": "1.0.0", "scopes": [], "requirements": [], "logo": "http://logos.example/logo.png"},
+    )
+
+    device_codes.validate_device_code(device_code, composition.creator, composition.organization, composition)
+
+    assert fake_logo_download == [False]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_redeem_never_downloads_inside_the_transaction(fake_logo_download, monkeypatch):
+    # the unlocked pre-check predicts no new client, but one has to be created after all
+    monkeypatch.setattr(clients, "_redeem_may_create_client", lambda token, manifest: False)
+    redeem = factories.make_redeem_token()
+    manifest = base_models.Manifest(identifier="com.example.nologo", version="1.0.0", scopes=[], logo="http://logos.example/logo.png")
+
+    client = clients.redeem_token(redeem.token, manifest)
+
+    assert fake_logo_download == []
+    assert client.release.logo is None
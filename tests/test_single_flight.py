@@ -0,0 +1,149 @@
+"""Request coalescing for claim rendering (fakts.services.single_flight)."""
+
+import asyncio
+import json
+
+import pytest
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import reverse
+
+from fakts.services import claim_cache, rendering, single_flight
+from tests import factories
+
+
+def _counting_load(calls, result="config", delay=0.05):
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result
+
+    return load
+
+
+def test_concurrent_calls_share_one_load():
+    calls = []
+    load = _counting_load(calls)
+
+    async def main():
+        return await asyncio.gather(*(single_flight.do("k", load) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["config"] * 5
+    assert len(calls) == 1
+
+
+def test_different_keys_load_separately():
+    calls = []
+    load = _counting_load(calls)
+
+    async def main():
+        return await asyncio.gather(single_flight.do("a", load), single_flight.do("b", load))
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_failures_reach_every_waiter_and_are_not_kept():
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise LookupError("gone")
+
+    async def main():
+        return await asyncio.gather(single_flight.do("k", failing), single_flight.do("k", failing), return_exceptions=True)
+
+    assert all(isinstance(r, LookupError) for r in asyncio.run(main()))
+    assert len(calls) == 1
+    assert single_flight._inflight == {}
+
+
+def test_cancelled_caller_does_not_cancel_the_load():
+    calls = []
+    load = _counting_load(calls, delay=0.1)
+
+    async def main():
+        first = asyncio.ensure_future(single_flight.do("k", load))
+        second = asyncio.ensure_future(single_flight.do("k", load))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "config"
+    assert len(calls) == 1
+
+
+def test_shared_mode_waits_for_the_lock_holder(settings):
+    settings.FAKTS_SINGLE_FLIGHT_SHARED = True
+    calls = []
+    # another process holds the lock and publishes its result shortly
+    cache.add("fakts:flight:lock:k", True, 10)
+
+    async def main():
+        waiter = asyncio.ensure_future(single_flight.do("k", _counting_load(calls, result="mine")))
+        await asyncio.sleep(0.1)
+        cache.set("fakts:flight:result:k", {"k": "theirs"}, 5)
+        return await waiter
+
+    assert asyncio.run(main()) == "theirs"
+    assert calls == []
+
+
+def test_shared_mode_loads_when_the_lock_holder_gives_up(settings):
+    settings.FAKTS_SINGLE_FLIGHT_SHARED = True
+    calls = []
+    cache.add("fakts:flight:lock:k", True, 10)
+
+    async def main():
+        waiter = asyncio.ensure_future(single_flight.do("k", _counting_load(calls, result="mine")))
+        await asyncio.sleep(0.1)
+        cache.delete("fakts:flight:lock:k")
+        return await waiter
+
+    assert asyncio.run(main()) == "mine"
+    assert len(calls) == 1
+
+
+def test_shared_mode_publishes_the_result(settings):
+    settings.FAKTS_SINGLE_FLIGHT_SHARED = True
+    calls = []
+
+    asyncio.run(single_flight.do("k", _counting_load(calls)))
+
+    assert cache.get("fakts:flight:result:k") == {"k": "config"}
+    assert cache.get("fakts:flight:lock:k") is None
+
+
+@pytest.mark.django_db
+def test_invalidated_tokens_drop_their_published_results(settings, django_capture_on_commit_callbacks):
+    settings.FAKTS_SINGLE_FLIGHT_SHARED = True
+    calls = []
+    keys = [single_flight.flight_key("claim", "token", ctx) for ctx in ("a", "b")]
+    for key in keys:
+        asyncio.run(single_flight.do(key, _counting_load(calls, result="old")))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        claim_cache.invalidate_tokens(["token"])
+
+    assert [asyncio.run(single_flight.do(key, _counting_load(calls, result="new"))) for key in keys] == ["new", "new"]
+    assert len(calls) == 4
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_claims_render_once(settings, monkeypatch):
+    settings.FAKTS_CLAIM_CACHE_TTL = 0
+    fakts_client = factories.make_client()
+    renders = []
+    render = rendering.render_composition
+    monkeypatch.setattr(rendering, "render_composition", lambda client, context: renders.append(1) or render(client, context))
+
+    async def main():
+        client = AsyncClient()
+        payload = json.dumps({"token": fakts_client.token, "secure": False})
+        return await asyncio.gather(*(client.post(reverse("fakts:claim"), data=payload, content_type="application/json") for _ in range(4)))
+
+    responses = asyncio.run(main())
+
+    assert {r.json()["status"] for r in responses} == {"granted"}
+    assert len(renders) == 1
@@ -0,0 +1,19 @@
+"""Smoke test for the token endpoint benchmark (tests/benchmarks/token_issuance.py)."""
+
+import pytest
+
+from tests.benchmarks.token_issuance import GRANTS, format_report, run_benchmark
+
+
+@pytest.mark.django_db
+def test_benchmark_drives_every_grant_and_reports_stages():
+    reports = run_benchmark(organizations=1, clients_per_organization=2, requests=3)
+
+    assert [r.grant for r in reports] == list(GRANTS)
+    for report in reports:
+        assert report.requests == len(report.latencies) == len(report.queries) == 3
+        assert all(queries > 0 for queries in report.queries)
+        assert report.stages["signing"] > 0
+        assert report.stages["persist"] > 0
+
+    assert "client_credentials" in format_report(reports)
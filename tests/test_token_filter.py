@@ -0,0 +1,114 @@
+"""Negative lookups for unknown tokens on the public fakts endpoints (fakts.services.token_filter)."""
+
+import json
+import uuid
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fakts.services import token_filter
+from tests import factories
+
+
+def _claim(client, token):
+    return client.post(reverse("fakts:claim"), data=json.dumps({"token": token, "secure": False}), content_type="application/json").json()
+
+
+@pytest.mark.django_db
+def test_unknown_token_is_rejected_from_the_negative_cache(client):
+    assert _claim(client, "dead-token")["status"] == "error"
+
+    with CaptureQueriesContext(connection) as queries:
+        body = _claim(client, "dead-token")
+
+    assert body == {"status": "error", "message": "No Client found for this token"}
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_token_created_after_a_miss_is_accepted(client, django_capture_on_commit_callbacks):
+    token = uuid.uuid4().hex
+    assert _claim(client, token)["status"] == "error"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        factories.make_client(token=token)
+
+    assert _claim(client, token)["status"] == "granted"
+
+
+@pytest.mark.django_db
+def test_negative_cache_disabled_with_zero_ttl(client, settings):
+    settings.FAKTS_NEGATIVE_LOOKUP_TTL = 0
+    _claim(client, "dead-token")
+
+    with CaptureQueriesContext(connection) as queries:
+        _claim(client, "dead-token")
+
+    assert len(queries) > 0
+
+
+@pytest.mark.django_db
+def test_bloom_filter_rejects_unseen_tokens_without_queries(client, settings):
+    settings.FAKTS_TOKEN_BLOOM_FILTER = True
+    settings.FAKTS_NEGATIVE_LOOKUP_TTL = 0
+    known = factories.make_client()
+    assert _claim(client, known.token)["status"] == "granted"  # loads the filter
+
+    with CaptureQueriesContext(connection) as queries:
+        body = _claim(client, "never-issued")
+
+    assert body["status"] == "error"
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_other_processes_replay_new_tokens(settings, django_capture_on_commit_callbacks):
+    settings.FAKTS_TOKEN_BLOOM_FILTER = True
+    other_process = token_filter.KnownTokens("client")
+    other_process.load()
+    token = uuid.uuid4().hex
+
+    with django_capture_on_commit_callbacks(execute=True):
+        factories.make_client(token=token)
+
+    assert other_process.might_contain(token_filter._digest(token)) is True
+
+
+@pytest.mark.django_db
+def test_evicted_log_forces_a_reload(settings, django_capture_on_commit_callbacks):
+    from django.core.cache import cache
+
+    settings.FAKTS_TOKEN_BLOOM_FILTER = True
+    other_process = token_filter.KnownTokens("client")
+    other_process.load()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        factories.make_client(token="evicted")
+    cache.delete(token_filter._log_key("client", other_process.epoch, other_process.seq + 1))
+
+    assert other_process.might_contain(token_filter._digest("evicted")) is None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = token_filter.BloomFilter(1000)
+    digests = [token_filter._digest(str(n)) for n in range(1000)]
+    for digest in digests:
+        bloom.add(digest)
+
+    assert all(digest in bloom for digest in digests)
+    false_positives = sum(token_filter._digest(f"other-{n}") in bloom for n in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.django_db
+def test_per_process_cache_turns_the_bloom_filter_off(client, settings):
+    settings.FAKTS_SHARED_CACHE = False
+    settings.FAKTS_TOKEN_BLOOM_FILTER = True
+    settings.FAKTS_NEGATIVE_LOOKUP_TTL = 60
+
+    assert not token_filter._bloom_enabled()
+    assert token_filter._ttl() == token_filter.LOCAL_TTL
+    # tokens created by other workers must not be rejected from a stale filter
+    assert _claim(client, factories.make_client().token)["status"] == "granted"
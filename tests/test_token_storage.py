@@ -0,0 +1,94 @@
+"""Access-token storage modes of the OAuth2 server (authapp.server)."""
+
+import pytest
+from django.urls import reverse
+
+from authapp.models import OAuth2Token, token_digest
+from authapp import revocation
+from authapp.revocation import access_token_jti, is_revoked
+from tests import factories
+
+
+def _client_credentials(client, oauth2):
+    response = client.post(
+        reverse("token"),
+        data={"grant_type": "client_credentials", "client_id": oauth2.client_id, "client_secret": oauth2.client_secret, "scope": "profile"},
+        secure=True,
+    )
+    assert response.status_code == 200, response.content
+    return response.json()
+
+
+def _user_info(client, access_token):
+    return client.get(reverse("user_info"), HTTP_AUTHORIZATION=f"Bearer {access_token}", secure=True)
+
+
+@pytest.fixture
+def oauth2(db):
+    oauth2 = factories.make_client().oauth2_client
+    oauth2.scope = "openid profile email"
+    oauth2.save()
+    return oauth2
+
+
+def test_persisted_access_tokens_are_stored_with_their_jti(client, oauth2):
+    token = _client_credentials(client, oauth2)
+
+    stored = OAuth2Token.objects.get()
+    assert stored.access_token_digest == token_digest(token["access_token"])
+    assert stored.access_token_jti == access_token_jti(token["access_token"])
+    assert _user_info(client, token["access_token"]).status_code == 200
+
+
+def test_stateless_access_tokens_are_not_stored_but_accepted(client, oauth2, settings):
+    settings.AUTHAPP_ACCESS_TOKEN_STORAGE = "stateless"
+
+    token = _client_credentials(client, oauth2)
+
+    assert not OAuth2Token.objects.exists()
+    response = _user_info(client, token["access_token"])
+    assert response.status_code == 200
+    assert response.json()["active_org"] == oauth2.client.organization.slug
+
+
+def test_stateless_refresh_stores_only_the_refresh_token_and_revokes_the_old_access_token(client, oauth2, settings, django_capture_on_commit_callbacks):
+    settings.AUTHAPP_ACCESS_TOKEN_STORAGE = "stateless"
+    old = _client_credentials(client, oauth2)
+    old_jti = access_token_jti(old["access_token"])
+    OAuth2Token.objects.create(user=oauth2.client.membership, client_id=oauth2.client_id, token_type="Bearer", access_token_jti=old_jti, refresh_token_digest=token_digest("refresh-me"), scope="profile", expires_in=3600)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            reverse("token"),
+            data={"grant_type": "refresh_token", "refresh_token": "refresh-me", "client_id": oauth2.client_id, "client_secret": oauth2.client_secret},
+            secure=True,
+        )
+    assert response.status_code == 200, response.content
+
+    new = OAuth2Token.objects.get(revoked=False)
+    assert new.access_token_digest is None
+    assert new.refresh_token_digest == token_digest(response.json()["refresh_token"])
+    assert new.access_token_jti == access_token_jti(response.json()["access_token"])
+
+    assert is_revoked(old_jti)
+    assert _user_info(client, old["access_token"]).status_code == 401
+    assert _user_info(client, response.json()["access_token"]).status_code == 200
+
+
+def test_stateless_rejects_tampered_tokens(client, oauth2, settings):
+    settings.AUTHAPP_ACCESS_TOKEN_STORAGE = "stateless"
+    token = _client_credentials(client, oauth2)["access_token"]
+    header, payload, signature = token.split(".")
+
+    assert _user_info(client, f"{header}.{payload}.{signature[::-1]}").status_code == 401
+
+
+def test_revocation_list_is_cached_briefly_without_a_shared_cache(settings):
+    now = 1_000_000
+    settings.AUTHAPP_SHARED_GENERATIONS = False
+    assert revocation.cache_ttl({}, now) == revocation.LOCAL_TTL
+    assert revocation.cache_ttl({"jti": now + 3600}, now) == revocation.LOCAL_TTL
+
+    settings.AUTHAPP_SHARED_GENERATIONS = True
+    assert revocation.cache_ttl({}, now) == revocation.SHARED_TTL
+    assert revocation.cache_ttl({"jti": now + 60}, now) == 60
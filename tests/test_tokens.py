@@ -1,10 +1,18 @@
 """Tests for authapp JWT/OIDC token generation, including the client_role claim."""
 
 import pytest
+from authlib.oauth2.rfc6749.errors import InvalidClientError
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
+from authapp import claims_profile
+from authapp.models import OAuth2Client
 from authapp.token_generators import MyJWTBearerTokenGenerator
 from fakts.enums import ClientRoleChoices
+from karakter.models import Role
 from tests import factories
 
 
@@ -45,7 +53,7 @@ def test_get_audiences_is_rekuest():
 
 
 def test_get_jwks_exposes_signing_key():
-    jwks = _generator().get_jwks()
+    jwks = _generator().get_jwks().as_dict(private=False)
     # get_jwks returns a JWK *set* so joserfc can stamp the key's kid into the
     # JWT header; the signing key is the sole entry under "keys".
     key = jwks["keys"][0]
@@ -65,3 +73,105 @@ def test_openid_user_info_contains_subject():
 
     assert info["sub"] == str(membership.user.id)
     assert info["active_org"] == membership.organization.slug
+
+
+@pytest.mark.django_db
+def test_client_credentials_claims_are_one_query_then_cached():
+    fakts_client = factories.make_client()
+    role = Role.objects.create(identifier="claims-test", organization=fakts_client.organization)
+    fakts_client.membership.roles.add(role)
+    oauth2 = OAuth2Client.objects.get(pk=fakts_client.oauth2_client_id)
+
+    with CaptureQueriesContext(connection) as queries:
+        claims = _generator().get_extra_claims(oauth2, "client_credentials", None, None)
+    assert len(queries) == 1
+    assert claims["roles"] == ["claims-test"]
+    assert claims["sub"] == str(fakts_client.user.id)
+    assert claims["client_app"] == fakts_client.release.app.identifier
+    assert claims["client_release"] == fakts_client.release.version
+    assert claims["scope"] == oauth2.scope
+
+    with CaptureQueriesContext(connection) as queries:
+        assert _generator().get_extra_claims(oauth2, "client_credentials", None, None) == claims
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_role_change_invalidates_cached_claims(django_capture_on_commit_callbacks):
+    fakts_client = factories.make_client()
+    oauth2 = OAuth2Client.objects.get(pk=fakts_client.oauth2_client_id)
+    assert _generator().get_extra_claims(oauth2, "client_credentials", None, None)["roles"] == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        fakts_client.membership.roles.add(Role.objects.create(identifier="claims-test", organization=fakts_client.organization))
+
+    assert _generator().get_extra_claims(oauth2, "client_credentials", None, None)["roles"] == ["claims-test"]
+
+
+@pytest.mark.django_db
+def test_client_rebinding_invalidates_cached_claims(django_capture_on_commit_callbacks):
+    fakts_client = factories.make_client()
+    oauth2 = OAuth2Client.objects.get(pk=fakts_client.oauth2_client_id)
+    _generator().get_extra_claims(oauth2, "client_credentials", None, None)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        fakts_client.role = ClientRoleChoices.AGENT.value
+        fakts_client.save()
+
+    assert _generator().get_extra_claims(oauth2, "client_credentials", None, None)["client_role"] == "agent"
+
+
+@pytest.mark.django_db
+def test_evicted_version_invalidates_cached_claims():
+    fakts_client = factories.make_client()
+    oauth2 = OAuth2Client.objects.get(pk=fakts_client.oauth2_client_id)
+    _generator().get_extra_claims(oauth2, "client_credentials", None, None)
+
+    cache.delete(claims_profile._version_key("membership", fakts_client.membership_id))
+    with CaptureQueriesContext(connection) as queries:
+        _generator().get_extra_claims(oauth2, "client_credentials", None, None)
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_claims_are_not_cached_without_shared_generations(settings):
+    settings.AUTHAPP_SHARED_GENERATIONS = False
+    fakts_client = factories.make_client()
+    oauth2 = OAuth2Client.objects.get(pk=fakts_client.oauth2_client_id)
+    _generator().get_extra_claims(oauth2, "client_credentials", None, None)
+
+    with CaptureQueriesContext(connection) as queries:
+        _generator().get_extra_claims(oauth2, "client_credentials", None, None)
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_get_extra_claims_without_membership_is_invalid_client():
+    oauth2 = OAuth2Client.objects.create(client_id="orphan", client_secret="secret")
+
+    with pytest.raises(InvalidClientError):
+        _generator().get_extra_claims(oauth2, "client_credentials", None, None)
+
+
+@pytest.mark.django_db
+def test_authorization_code_id_token_is_signed_with_the_published_key(client):
+    from joserfc import jwt
+    from joserfc.jwk import KeySet
+
+    from authapp.models import AuthorizationCode
+
+    fakts_client = factories.make_client()
+    oauth2 = fakts_client.oauth2_client
+    AuthorizationCode.objects.create(membership=fakts_client.membership, client_id=oauth2.client_id, code="code", redirect_uri="http://localhost/cb", scope="openid profile", nonce="n")
+
+    response = client.post(
+        reverse("token"),
+        data={"grant_type": "authorization_code", "code": "code", "redirect_uri": "http://localhost/cb", "client_id": oauth2.client_id, "client_secret": oauth2.client_secret},
+        secure=True,
+    )
+    assert response.status_code == 200, response.content
+
+    published = KeySet.import_key_set(client.get(reverse("jwks")).json())
+    id_token = jwt.decode(response.json()["id_token"], published)
+    assert id_token.header["kid"] == settings.KEY_ID
+    assert id_token.claims["nonce"] == "n"